@@ -0,0 +1,154 @@
+# app/bulk_ingest.py
+from __future__ import annotations
+
+import csv
+import json
+import os
+import tempfile
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from db_connection import DB
+from trigger_signals import INGESTED_TOTAL, bump_counter
+
+SOURCE_TYPES = {"CLAIM_DESCRIPTION", "CUSTOMER_REVIEW", "SUPPORT_CHAT", "OTHER"}
+
+Record = Tuple[int, str, str]  # (customer_id, source_type, raw_text)
+
+
+def _to_record(obj: Dict[str, Any]) -> Optional[Record]:
+    try:
+        customer_id = int(str(obj.get("customer_id", "")).strip())
+    except ValueError:
+        return None
+    source_type = str(obj.get("source_type") or "OTHER").strip().upper()
+    raw_text = obj.get("raw_text")
+    if customer_id <= 0 or source_type not in SOURCE_TYPES or raw_text is None or not str(raw_text).strip():
+        return None
+    return customer_id, source_type, str(raw_text)
+
+
+def iter_records(path: str, fmt: str = "auto") -> Iterator[Optional[Record]]:
+    """Stream (customer_id, source_type, raw_text) from CSV or JSONL; malformed rows yield None."""
+    if fmt == "auto":
+        fmt = "jsonl" if path.lower().endswith((".jsonl", ".ndjson", ".json")) else "csv"
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            for row in csv.DictReader(f):
+                yield _to_record(row)
+        elif fmt == "jsonl":
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    yield _to_record(json.loads(line))
+                except (ValueError, AttributeError):
+                    yield None
+        else:
+            raise ValueError(f"Unsupported input format: {fmt}")
+
+
+def _valid_customer_ids(db: DB, customer_ids: List[int]) -> set:
+    # one lookup per chunk instead of one FK check per row
+    placeholders = ",".join(["%s"] * len(customer_ids))
+    rows = db.fetchall(f"SELECT customer_id FROM customer WHERE customer_id IN ({placeholders})", tuple(customer_ids))
+    return {int(r[0]) for r in rows}
+
+
+def _escape_tsv(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+
+
+def _insert_rows(db: DB, rows: List[Record]) -> int:
+    values = ",".join(["(%s, %s, %s, 0)"] * len(rows))
+    params: List[Any] = []
+    for r in rows:
+        params.extend(r)
+    return db.execute(
+        f"INSERT INTO unstructured_text(customer_id, source_type, raw_text, is_processed) VALUES {values}",
+        tuple(params),
+    )
+
+
+def _load_data_rows(db: DB, rows: List[Record]) -> int:
+    # LOAD DATA LOCAL INFILE fast path (needs local_infile=1 on the server and DB_ALLOW_LOCAL_INFILE=1)
+    fd, path = tempfile.mkstemp(prefix="ingest_", suffix=".tsv")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            for customer_id, source_type, raw_text in rows:
+                f.write(f"{customer_id}\t{source_type}\t{_escape_tsv(raw_text)}\n")
+        return db.execute(
+            """
+            LOAD DATA LOCAL INFILE %s
+            INTO TABLE unstructured_text
+            CHARACTER SET utf8mb4
+            FIELDS TERMINATED BY '\\t' ESCAPED BY '\\\\'
+            LINES TERMINATED BY '\\n'
+            (customer_id, source_type, raw_text)
+            SET is_processed = 0
+            """,
+            (path,),
+        )
+    finally:
+        os.unlink(path)
+
+
+def ingest_chunk(db: DB, records: List[Record], use_load_data: bool = False) -> Tuple[int, int]:
+    """Validate customers in bulk, insert the chunk, log one summary event and commit. Returns (inserted, rejected)."""
+    t0 = time.perf_counter()
+    known = _valid_customer_ids(db, sorted({r[0] for r in records}))
+    rows = [r for r in records if r[0] in known]
+    rejected = len(records) - len(rows)
+    inserted = 0
+    if rows:
+        inserted = _load_data_rows(db, rows) if use_load_data else _insert_rows(db, rows)
+    bump_counter(db, INGESTED_TOTAL, inserted)
+    db.log_event(
+        "INGEST_BULK",
+        "SYSTEM",
+        None,
+        f"Bulk ingested chunk: rows={inserted}, rejected_unknown_customer={rejected}, "
+        f"customers={len({r[0] for r in rows})}, method={'load_data' if use_load_data else 'multi_row_insert'}",
+        duration_ms=(time.perf_counter() - t0) * 1000.0,
+        rows_in=len(records),
+        rows_out=inserted,
+    )
+    db.commit()
+    return inserted, rejected
+
+
+def ingest_file(db: DB, path: str, fmt: str = "auto", chunk_size: int = 5000, use_load_data: bool = False) -> Dict[str, Any]:
+    """Stream a CSV/JSONL file into unstructured_text, one transaction per chunk (never the whole file in memory)."""
+    start = time.perf_counter()
+    inserted = rejected = malformed = chunks = 0
+    chunk: List[Record] = []
+
+    def flush():
+        nonlocal inserted, rejected, chunks, chunk
+        ins, rej = ingest_chunk(db, chunk, use_load_data)
+        inserted += ins
+        rejected += rej
+        chunks += 1
+        chunk = []
+        elapsed = time.perf_counter() - start
+        print(f"[ingest] chunk={chunks} inserted={inserted} rejected={rejected + malformed} rate={inserted / elapsed:.0f} rows/sec")
+
+    for rec in iter_records(path, fmt):
+        if rec is None:
+            malformed += 1
+            continue
+        chunk.append(rec)
+        if len(chunk) >= chunk_size:
+            flush()
+    if chunk:
+        flush()
+
+    elapsed = time.perf_counter() - start
+    return {
+        "inserted": inserted,
+        "rejected_unknown_customer": rejected,
+        "malformed": malformed,
+        "chunks": chunks,
+        "elapsed_s": elapsed,
+        "rows_per_sec": (inserted / elapsed) if elapsed > 0 else 0.0,
+    }
@@ -1,70 +1,17 @@
 # app/db_connection.py
+# The CLI uses the shared, pooled data-access layer in ml/db.py.
 from __future__ import annotations
-import os
-import mysql.connector
-from dataclasses import dataclass
-from typing import Any, Dict, List, Optional, Sequence, Tuple
 
+import sys
+from pathlib import Path
 
-@dataclass
-class DBConfig:
-    host: str
-    port: int
-    user: str
-    password: str
-    database: str
+ML_DIR = Path(__file__).resolve().parent.parent / "ml"
+if str(ML_DIR) not in sys.path:
+    sys.path.insert(0, str(ML_DIR))
 
-    @staticmethod
-    def from_env() -> "DBConfig":
-        return DBConfig(
-            host=os.getenv("DB_HOST", "127.0.0.1"),
-            port=int(os.getenv("DB_PORT", "3306")),
-            user=os.getenv("DB_USER", "root"),
-            password=os.getenv("DB_PASSWORD", ""),
-            database=os.getenv("DB_NAME", "insurance_ods"),
-        )
+from db import DBConfig, MySQL, connect_for_read, get_pool, health_check, replica_lag_s  # noqa: E402
 
+# Kept for existing callers: the app-side connection class is the shared one
+DB = MySQL
 
-class DB:
-    def __init__(self, cfg: DBConfig):
-        self.conn = mysql.connector.connect(
-            host=cfg.host,
-            port=cfg.port,
-            user=cfg.user,
-            password=cfg.password,
-            database=cfg.database,
-            autocommit=False,
-        )
-
-    def close(self):
-        try:
-            self.conn.close()
-        except Exception:
-            pass
-
-    def commit(self):
-        self.conn.commit()
-
-    def rollback(self):
-        self.conn.rollback()
-
-    def execute(self, sql: str, params: Optional[Sequence[Any]] = None) -> int:
-        cur = self.conn.cursor()
-        cur.execute(sql, params or ())
-        rc = cur.rowcount
-        cur.close()
-        return rc
-
-    def fetchall(self, sql: str, params: Optional[Sequence[Any]] = None) -> List[Tuple[Any, ...]]:
-        cur = self.conn.cursor()
-        cur.execute(sql, params or ())
-        rows = cur.fetchall()
-        cur.close()
-        return rows
-
-    def fetchall_dict(self, sql: str, params: Optional[Sequence[Any]] = None) -> List[Dict[str, Any]]:
-        cur = self.conn.cursor(dictionary=True)
-        cur.execute(sql, params or ())
-        rows = cur.fetchall()
-        cur.close()
-        return rows
+__all__ = ["DB", "DBConfig", "MySQL", "connect_for_read", "get_pool", "health_check", "replica_lag_s"]
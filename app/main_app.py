@@ -5,19 +5,21 @@ import argparse
 import subprocess
 import sys
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Dict, List, Optional, Tuple
 
-from db_connection import DB, DBConfig
+from db_connection import DB, DBConfig, connect_for_read, health_check, replica_lag_s
+from dashboard_cache import default_dashboard_cache, invalidate_snapshots
+from event_report import print_report, stage_latency
+from top_risk import default_topk, fetch_top_page, next_cursor
+from trigger_signals import INGESTED_TOTAL, bump_counter
+
+
+# actions that never write; routed to the DB_READ_* replica when one is configured
+READ_ONLY_ACTIONS = {"show_model", "dashboard", "top", "risk_dist", "event_report"}
 
 
 def log_event(db: DB, event_type: str, msg: str):
-    db.execute(
-        """
-        INSERT INTO pipeline_event(event_type, entity_type, entity_id, message)
-        VALUES (%s, 'SYSTEM', NULL, %s)
-        """,
-        (event_type, msg[:2000]),
-    )
+    db.log_event(event_type, "SYSTEM", None, msg)
 
 
 def show_active_model(db: DB):
@@ -75,20 +77,75 @@ def ingest_text(db: DB, customer_id: int, source_type: str, raw_text: str):
         """,
         (customer_id, source_type, raw_text),
     )
+    bump_counter(db, INGESTED_TOTAL, 1)
+    invalidate_snapshots(db, [customer_id])
     log_event(db, "INGEST", f"Ingested text for customer_id={customer_id}, source_type={source_type}")
     db.commit()
     print("✅ Ingested unstructured text into DB.")
 
 
-def run_inference(batch_size: int = 50):
+def run_inference(batch_size: int = 50, drain: bool = False, max_seconds: float = 0.0, max_rows: int = 0, workers: int = 0):
     # call your existing ML script
     cmd = [sys.executable, "ml/risk_model_inference.py", "--batch_size", str(batch_size)]
+    if drain or workers > 0:
+        cmd += ["--max_seconds", str(float(max_seconds)), "--max_rows", str(int(max_rows))]
+    if workers > 0:
+        cmd += ["--workers", str(int(workers))]
+    elif drain:
+        cmd.append("--drain")
     print("Running:", " ".join(cmd))
     subprocess.check_call(cmd)
     print("✅ Inference completed (risk + premium suggestion written back).")
 
 
-def customer_dashboard(db: DB, customer_id: int):
+def run_pipeline(train_csv: str, threshold_new_texts: int, batch_size: int, rescore_recent_days: int):
+    # Non-interactive orchestration, in-process on one connection:
+    # 1) optional retrain trigger (if train_csv provided)
+    # 2) run inference on unprocessed texts
+    # 3) optional rescore of recent texts after (re)training/model activation
+    from pipeline import run_pipeline as run_ml_pipeline
+
+    db = DB(DBConfig.from_env())
+    try:
+        run_ml_pipeline(db, train_csv, int(threshold_new_texts), int(batch_size), int(rescore_recent_days))
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+    print("✅ Pipeline completed.")
+
+
+def show_health(cfg: DBConfig):
+    h = health_check(cfg)
+    ok = h["ok"]
+    if ok:
+        print(
+            f"DB ok=True {h['host']}:{h['port']}/{h['database']} version={h['server_version']} "
+            f"ping={h['ping_ms']}ms pool_size={h['pool_size']} idle={h['idle']} opened={h['opened']}"
+        )
+    else:
+        print(f"DB ok=False {h['host']}:{h['port']}/{h['database']} error={h['error']}")
+    read_cfg = DBConfig.read_from_env()
+    if read_cfg is not None:
+        h = health_check(read_cfg)
+        if h["ok"]:
+            db = DB(read_cfg)
+            try:
+                lag = replica_lag_s(db)
+            finally:
+                db.close()
+            print(
+                f"Replica ok=True {h['host']}:{h['port']}/{h['database']} version={h['server_version']} "
+                f"ping={h['ping_ms']}ms lag={'not a replica' if lag is None else f'{lag:g}s'}"
+            )
+        else:
+            print(f"Replica ok=False {h['host']}:{h['port']}/{h['database']} error={h['error']}")
+    if not ok:
+        raise SystemExit(1)
+
+
+def fetch_customer_dashboard(db: DB, customer_id: int) -> Optional[Dict[str, Any]]:
     # Latest risk record + join to text + policy + latest adjustment
     rows = db.fetchall_dict(
         """
@@ -117,11 +174,24 @@ def customer_dashboard(db: DB, customer_id: int):
         """,
         (customer_id,),
     )
-    if not rows:
+    return rows[0] if rows else None
+
+
+def customer_dashboard(db: DB, customer_id: int, use_cache: bool = True, write_db: Optional[DB] = None):
+    # read-through snapshot cache; write-back/ingest invalidate the affected customers.
+    # write_db: primary for snapshot refreshes when db is a read replica
+    if use_cache:
+        r = default_dashboard_cache.get(db, customer_id, fetch_customer_dashboard, write_db)
+    else:
+        r = fetch_customer_dashboard(db, customer_id)
+    if not r:
         print("Customer not found.")
         return
 
-    r = rows[0]
+    _print_dashboard(r)
+
+
+def _print_dashboard(r):
     print("\n=== Customer Risk Dashboard ===")
     print(f"Customer: {r['customer_id']} | {r['full_name']}")
     print(f"Latest Text: text_id={r['text_id']} source={r['source_type']} ingested={r['ingested_at']} processed={r['processed_at']}")
@@ -132,117 +202,164 @@ def customer_dashboard(db: DB, customer_id: int):
     print("==============================\n")
 
 
-def customer_dashboard_orm(customer_id: int):
+def risk_distribution(db: DB, model_id: Optional[int] = None, days: int = 0, rebuild: bool = False):
+    # served from risk_label_latest_agg / risk_label_daily_agg (maintained by write-back), not GROUP BY over the score tables
+    import risk_agg
+
+    if rebuild:
+        n = risk_agg.rebuild(db)
+        db.commit()
+        print(f"✅ Rebuilt risk_label_latest_agg and risk_label_daily_agg ({n} daily rows).")
+
+    dist = risk_agg.latest_distribution(db, model_id)
+    total = sum(dist.values())
+    scope = f"model_id={model_id}" if model_id else "all models"
+    print(f"\nLatest risk distribution ({scope}, {total} customers):")
+    for label, cnt in dist.items():
+        pct = 100.0 * cnt / total if total else 0.0
+        print(f"- {label:<6} {cnt:>10} ({pct:.1f}%)")
+
+    print(f"\nScored texts per model ({f'last {days} days' if days else 'all time'}):")
+    for r in risk_agg.scored_by_model(db, days):
+        print(f"- model_id={r['model_id']} {r['model_version']} | {r['risk_label']} {int(r['scored_cnt'])}")
+    print()
+
+
+def _orm_imports():
     try:
-        from sqlalchemy import and_, desc, func, select
+        import sqlalchemy  # noqa: F401
 
+        import models
         from orm import get_session
-        from models import (
-            Customer,
-            CustomerRiskScoreLatest,
-            MlModelMetadata,
-            Policy,
-            PolicyPremiumAdjustment,
-            UnstructuredText,
-        )
     except Exception as e:
         raise SystemExit(f"ORM dependencies not available. Install requirements.txt (SQLAlchemy, PyMySQL). Details: {e}")
+    return models, get_session
 
-    with get_session() as s:
-        # Latest premium adjustment per customer (if any)
-        latest_adj = (
-            select(
-                PolicyPremiumAdjustment.customer_id.label("customer_id"),
-                func.max(PolicyPremiumAdjustment.created_at).label("max_created_at"),
-            )
-            .group_by(PolicyPremiumAdjustment.customer_id)
-            .subquery()
+
+def _dashboard_orm_stmt(models, customer_ids: List[int]):
+    from sqlalchemy import and_, func, select
+
+    Customer = models.Customer
+    CustomerRiskScoreLatest = models.CustomerRiskScoreLatest
+    MlModelMetadata = models.MlModelMetadata
+    Policy = models.Policy
+    PolicyPremiumAdjustment = models.PolicyPremiumAdjustment
+    UnstructuredText = models.UnstructuredText
+
+    # Latest premium adjustment per customer (if any), restricted to the requested customers
+    latest_adj = (
+        select(
+            PolicyPremiumAdjustment.customer_id.label("customer_id"),
+            func.max(PolicyPremiumAdjustment.created_at).label("max_created_at"),
         )
+        .where(PolicyPremiumAdjustment.customer_id.in_(customer_ids))
+        .group_by(PolicyPremiumAdjustment.customer_id)
+        .subquery()
+    )
 
-        stmt = (
-            select(
-                Customer.customer_id,
-                Customer.full_name,
-                UnstructuredText.text_id,
-                UnstructuredText.source_type,
-                UnstructuredText.ingested_at,
-                UnstructuredText.processed_at,
-                func.left(UnstructuredText.raw_text, 160).label("text_preview"),
-                CustomerRiskScoreLatest.risk_score_id,
-                CustomerRiskScoreLatest.risk_label,
-                CustomerRiskScoreLatest.risk_score,
-                CustomerRiskScoreLatest.scored_at,
-                MlModelMetadata.model_version,
-                Policy.policy_id,
-                Policy.product_type,
-                Policy.base_premium,
-                Policy.status,
-                PolicyPremiumAdjustment.adjustment_pct,
-                PolicyPremiumAdjustment.suggested_premium,
-                PolicyPremiumAdjustment.decision_status,
-                PolicyPremiumAdjustment.created_at.label("adjustment_time"),
-            )
-            .select_from(Customer)
-            .outerjoin(CustomerRiskScoreLatest, CustomerRiskScoreLatest.customer_id == Customer.customer_id)
-            .outerjoin(UnstructuredText, UnstructuredText.text_id == CustomerRiskScoreLatest.text_id)
-            .outerjoin(MlModelMetadata, MlModelMetadata.model_id == CustomerRiskScoreLatest.model_id)
-            .outerjoin(Policy, Policy.customer_id == Customer.customer_id)
-            .outerjoin(latest_adj, latest_adj.c.customer_id == Customer.customer_id)
-            .outerjoin(
-                PolicyPremiumAdjustment,
-                and_(
-                    PolicyPremiumAdjustment.customer_id == Customer.customer_id,
-                    PolicyPremiumAdjustment.created_at == latest_adj.c.max_created_at,
-                ),
-            )
-            .where(Customer.customer_id == customer_id)
-            .limit(1)
+    return (
+        select(
+            Customer.customer_id,
+            Customer.full_name,
+            UnstructuredText.text_id,
+            UnstructuredText.source_type,
+            UnstructuredText.ingested_at,
+            UnstructuredText.processed_at,
+            func.left(UnstructuredText.raw_text, 160).label("text_preview"),
+            CustomerRiskScoreLatest.risk_score_id,
+            CustomerRiskScoreLatest.risk_label,
+            CustomerRiskScoreLatest.risk_score,
+            CustomerRiskScoreLatest.scored_at,
+            MlModelMetadata.model_version,
+            Policy.policy_id,
+            Policy.product_type,
+            Policy.base_premium,
+            Policy.status,
+            PolicyPremiumAdjustment.adjustment_pct,
+            PolicyPremiumAdjustment.suggested_premium,
+            PolicyPremiumAdjustment.decision_status,
+            PolicyPremiumAdjustment.created_at.label("adjustment_time"),
+        )
+        .select_from(Customer)
+        .outerjoin(CustomerRiskScoreLatest, CustomerRiskScoreLatest.customer_id == Customer.customer_id)
+        .outerjoin(UnstructuredText, UnstructuredText.text_id == CustomerRiskScoreLatest.text_id)
+        .outerjoin(MlModelMetadata, MlModelMetadata.model_id == CustomerRiskScoreLatest.model_id)
+        .outerjoin(Policy, Policy.customer_id == Customer.customer_id)
+        .outerjoin(latest_adj, latest_adj.c.customer_id == Customer.customer_id)
+        .outerjoin(
+            PolicyPremiumAdjustment,
+            and_(
+                PolicyPremiumAdjustment.customer_id == Customer.customer_id,
+                PolicyPremiumAdjustment.created_at == latest_adj.c.max_created_at,
+            ),
         )
+        .where(Customer.customer_id.in_(customer_ids))
+    )
+
+
+def customer_dashboard_orm(customer_id: int):
+    models, get_session = _orm_imports()
 
-        row = s.execute(stmt).first()
+    with get_session() as s:
+        row = s.execute(_dashboard_orm_stmt(models, [customer_id]).limit(1)).first()
         if not row:
             print("Customer not found.")
             return
+        _print_dashboard(row._mapping)
 
-        r = row._mapping
-        print("\n=== Customer Risk Dashboard ===")
-        print(f"Customer: {r['customer_id']} | {r['full_name']}")
-        print(f"Latest Text: text_id={r['text_id']} source={r['source_type']} ingested={r['ingested_at']} processed={r['processed_at']}")
-        print(f"Text Preview: {r['text_preview']}")
-        print(f"Risk: risk_score_id={r['risk_score_id']} label={r['risk_label']} score={r['risk_score']} scored_at={r['scored_at']} model={r['model_version']}")
-        print(f"Policy: policy_id={r['policy_id']} type={r['product_type']} base={r['base_premium']} status={r['status']}")
-        print(f"Premium Suggestion: pct={r['adjustment_pct']} suggested={r['suggested_premium']} status={r['decision_status']} at={r['adjustment_time']}")
-        print("==============================\n")
 
+def customer_dashboards_orm(customer_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    """Batch dashboard: one query for many customers, first row per customer (as the single variant)."""
+    models, get_session = _orm_imports()
+    if not customer_ids:
+        return {}
 
-def top_high_risk(db: DB, top_n: int = 5):
-    rows = db.fetchall_dict(
-        """
-        SELECT
-          c.customer_id, c.full_name,
-          crs.risk_label, crs.risk_score, crs.scored_at
-        FROM customer c
-        JOIN customer_risk_score_latest crs ON crs.customer_id=c.customer_id
-        WHERE crs.scored_at >= DATE_SUB(CURDATE(), INTERVAL 2 YEAR)
-        ORDER BY crs.risk_score DESC
-        LIMIT %s
-        """,
-        (top_n,),
-    )
-    print(f"\nTop {top_n} high-risk customers (last 2 years):")
+    out: Dict[int, Dict[str, Any]] = {}
+    with get_session() as s:
+        for row in s.execute(_dashboard_orm_stmt(models, list(customer_ids))):
+            r = row._mapping
+            out.setdefault(int(r["customer_id"]), dict(r))
+    return out
+
+
+def fetch_top_high_risk(
+    db: DB,
+    top_n: int = 5,
+    risk_label: Optional[str] = None,
+    product_type: Optional[str] = None,
+    after: Optional[Tuple[float, int]] = None,
+    use_cache: bool = True,
+) -> List[Dict[str, Any]]:
+    # first unfiltered/label-filtered page comes from the in-process top-K (TOPK_CACHE=1) when enabled
+    if use_cache and default_topk is not None and after is None and not product_type:
+        return default_topk.top(db, top_n, risk_label)
+    return fetch_top_page(db, top_n, after=after, risk_label=risk_label, product_type=product_type)
+
+
+def top_high_risk(
+    db: DB,
+    top_n: int = 5,
+    risk_label: Optional[str] = None,
+    product_type: Optional[str] = None,
+    after: Optional[Tuple[float, int]] = None,
+    use_cache: bool = True,
+):
+    rows = fetch_top_high_risk(db, top_n, risk_label, product_type, after, use_cache)
+    filters = ", ".join(f for f in (risk_label and f"label={risk_label}", product_type and f"product={product_type}") if f)
+    print(f"\nTop {top_n} high-risk customers (last 2 years{', ' + filters if filters else ''}):")
     for r in rows:
         print(f"- {r['customer_id']} {r['full_name']} | {r['risk_label']} {r['risk_score']} @ {r['scored_at']}")
+    cur = next_cursor(rows)
+    if cur and len(rows) == top_n:
+        print(f"Next page: --after {cur[0]}:{cur[1]}")
     print()
 
 
 def top_high_risk_orm(top_n: int = 5):
-    try:
-        from sqlalchemy import desc, select
+    from sqlalchemy import desc, select
 
-        from orm import get_session
-        from models import Customer, CustomerRiskScoreLatest
-    except Exception as e:
-        raise SystemExit(f"ORM dependencies not available. Install requirements.txt (SQLAlchemy, PyMySQL). Details: {e}")
+    models, get_session = _orm_imports()
+    Customer, CustomerRiskScoreLatest = models.Customer, models.CustomerRiskScoreLatest
 
     cutoff = datetime.now() - timedelta(days=365 * 2)
 
@@ -268,58 +385,129 @@ def top_high_risk_orm(top_n: int = 5):
         print()
 
 
+def top_high_risk_by_segment_orm(segments: List[str], top_n: int = 5, segment_by: str = "product_type") -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Batch top-N: one windowed query returns the top_n customers of every requested segment.
+    segment_by is "product_type" (customers holding a policy of that type) or "risk_label".
+    """
+    from sqlalchemy import desc, func, select
+
+    models, get_session = _orm_imports()
+    Customer, CustomerRiskScoreLatest, Policy = models.Customer, models.CustomerRiskScoreLatest, models.Policy
+    if not segments:
+        return {}
+
+    cutoff = datetime.now() - timedelta(days=365 * 2)
+
+    if segment_by == "product_type":
+        holders = (
+            select(Policy.customer_id.label("customer_id"), Policy.product_type.label("segment"))
+            .where(Policy.product_type.in_(segments))
+            .distinct()
+            .subquery()
+        )
+        segment_col = holders.c.segment
+        base = (
+            select(CustomerRiskScoreLatest, segment_col)
+            .join(holders, holders.c.customer_id == CustomerRiskScoreLatest.customer_id)
+        )
+    elif segment_by == "risk_label":
+        segment_col = CustomerRiskScoreLatest.risk_label
+        base = select(CustomerRiskScoreLatest, segment_col.label("segment")).where(segment_col.in_(segments))
+    else:
+        raise ValueError(f"Unsupported segment_by: {segment_by}")
+
+    ranked = (
+        base.add_columns(
+            func.row_number().over(
+                partition_by=segment_col,
+                order_by=(desc(CustomerRiskScoreLatest.risk_score), CustomerRiskScoreLatest.customer_id),
+            ).label("rn")
+        )
+        .where(CustomerRiskScoreLatest.scored_at >= cutoff)
+        .subquery()
+    )
+
+    out: Dict[str, List[Dict[str, Any]]] = {seg: [] for seg in segments}
+    with get_session() as s:
+        rows = s.execute(
+            select(
+                ranked.c.segment,
+                ranked.c.customer_id,
+                Customer.full_name,
+                ranked.c.risk_label,
+                ranked.c.risk_score,
+                ranked.c.scored_at,
+            )
+            .join(Customer, Customer.customer_id == ranked.c.customer_id)
+            .where(ranked.c.rn <= top_n)
+            .order_by(ranked.c.segment, ranked.c.rn)
+        ).all()
+    for r in rows:
+        out.setdefault(r.segment, []).append(dict(r._mapping))
+    return out
+
+
 def main():
     ap = argparse.ArgumentParser()
-    ap.add_argument("--action", required=True, choices=["show_model", "ingest", "infer", "dashboard", "top", "pipeline"])
+    ap.add_argument("--action", required=True, choices=["show_model", "ingest", "ingest_bulk", "infer", "dashboard", "top", "risk_dist", "event_report", "pipeline", "health"])
     ap.add_argument("--customer_id", type=int, default=0)
     ap.add_argument("--source_type", default="SUPPORT_CHAT",
                     choices=["CLAIM_DESCRIPTION", "CUSTOMER_REVIEW", "SUPPORT_CHAT", "OTHER"])
     ap.add_argument("--text", default="")
+    ap.add_argument("--input_file", default="", help="For ingest_bulk: CSV/JSONL with customer_id,source_type,raw_text")
+    ap.add_argument("--input_format", default="auto", choices=["auto", "csv", "jsonl"])
+    ap.add_argument("--chunk_size", type=int, default=5000, help="For ingest_bulk: rows per insert/commit")
+    ap.add_argument("--load_data_local", action="store_true", help="For ingest_bulk: use LOAD DATA LOCAL INFILE (needs DB_ALLOW_LOCAL_INFILE=1)")
     ap.add_argument("--batch_size", type=int, default=50)
     ap.add_argument("--top_n", type=int, default=5)
+    ap.add_argument("--customer_ids", default="", help="For dashboard --use_orm: comma-separated customer ids, served by one batch query")
+    ap.add_argument("--segments", default="", help="For top --use_orm: comma-separated segments, top N of each in one query")
+    ap.add_argument("--segment_by", default="product_type", choices=["product_type", "risk_label"])
+    ap.add_argument("--no_cache", action="store_true", help="For dashboard/top: bypass the snapshot / top-K caches")
+    ap.add_argument("--risk_label", default="", choices=["", "LOW", "MEDIUM", "HIGH"], help="For top: only this label")
+    ap.add_argument("--product_type", default="", help="For top: only customers holding a policy of this product type")
+    ap.add_argument("--after", default="", help="For top: keyset cursor 'risk_score:customer_id' printed by the previous page")
     ap.add_argument("--use_orm", action="store_true", help="Use SQLAlchemy ORM for app read queries (show_model/dashboard/top)")
-    ap.add_argument("--threshold_new_texts", type=int, default=20, help="For pipeline: trigger retrain if unprocessed texts >= threshold")
+    ap.add_argument("--model_id", type=int, default=0, help="For risk_dist: restrict the latest distribution to one model")
+    ap.add_argument("--days", type=int, default=0, help="For risk_dist: scored counts over the last N days (0 = all); for event_report: window (default 7)")
+    ap.add_argument("--rebuild", action="store_true", help="For risk_dist: recompute the risk aggregate tables from the score tables first")
+    ap.add_argument("--bucket", default="day", choices=["hour", "day"], help="For event_report: trend granularity")
+    ap.add_argument("--event_type", default="", help="For event_report: only this stage (e.g. INFER)")
+    ap.add_argument("--threshold_new_texts", type=int, default=20, help="For pipeline: trigger retrain if texts ingested since last training >= threshold")
     ap.add_argument("--train_csv", default="", help="For pipeline: labeled training csv path used for retraining")
     ap.add_argument("--rescore_recent_days", type=int, default=0, help="For pipeline: after retrain, rescore texts ingested within last N days")
+    ap.add_argument("--drain", action="store_true", help="For infer: keep scoring batches until no unprocessed texts remain")
+    ap.add_argument("--max_seconds", type=float, default=0.0, help="For infer --drain: time budget in seconds (0 = no limit)")
+    ap.add_argument("--max_rows", type=int, default=0, help="For infer --drain: row budget (0 = no limit)")
+    ap.add_argument("--workers", type=int, default=0, help="For infer: drain with N parallel workers (SKIP LOCKED claiming)")
+    ap.add_argument("--read_from", default="auto", choices=["auto", "primary"],
+                    help="Read-only actions use the DB_READ_* replica when configured (auto) or always the primary")
+    ap.add_argument("--max_replica_lag_s", type=float, default=None,
+                    help="Fall back to the primary when the replica is further behind (default DB_READ_MAX_LAG_S, 0 = unchecked)")
     args = ap.parse_args()
 
     if args.action == "infer":
-        run_inference(args.batch_size)
+        run_inference(args.batch_size, args.drain, args.max_seconds, args.max_rows, args.workers)
+        return
+
+    if args.action == "health":
+        show_health(DBConfig.from_env())
         return
 
     if args.action == "pipeline":
-        # Non-interactive orchestration:
-        # 1) optional retrain trigger (if train_csv provided)
-        # 2) run inference on unprocessed texts
-        # 3) optional rescore of recent texts after (re)training/model activation
-        if args.train_csv.strip():
-            cmd = [
-                sys.executable, "ml/retrain_trigger.py",
-                "--threshold_new_texts", str(int(args.threshold_new_texts)),
-                "--train_csv", args.train_csv.strip(),
-                "--activate",
-            ]
-            print("Running:", " ".join(cmd))
-            subprocess.check_call(cmd)
-        else:
-            print("Skipping retrain trigger (no --train_csv provided).")
-
-        # Always score new/unprocessed texts
-        run_inference(args.batch_size)
-
-        # Optionally rescore recent window to refresh scores with the active model
-        if args.rescore_recent_days and args.rescore_recent_days > 0:
-            cmd = [
-                sys.executable, "ml/risk_model_inference.py",
-                "--batch_size", str(int(args.batch_size)),
-                "--rescore_recent_days", str(int(args.rescore_recent_days)),
-            ]
-            print("Running:", " ".join(cmd))
-            subprocess.check_call(cmd)
-            print("✅ Rescore completed.")
+        run_pipeline(args.train_csv, args.threshold_new_texts, args.batch_size, args.rescore_recent_days)
         return
 
-    db = DB(DBConfig.from_env())
+    read_only = args.action in READ_ONLY_ACTIONS and not (args.action == "risk_dist" and args.rebuild)
+    route = "primary"
+    if read_only and args.read_from == "auto":
+        db, route = connect_for_read(args.max_replica_lag_s)
+        if DBConfig.read_from_env() is not None:
+            print(f"(reads: {route})")
+    else:
+        db = DB(DBConfig.from_env())
+    write_db: Optional[DB] = None
     try:
         if args.action == "show_model":
             if args.use_orm:
@@ -332,25 +520,71 @@ def main():
                 raise SystemExit("ingest requires --customer_id and --text")
             ingest_text(db, args.customer_id, args.source_type, args.text)
 
+        elif args.action == "ingest_bulk":
+            if not args.input_file.strip():
+                raise SystemExit("ingest_bulk requires --input_file")
+            from bulk_ingest import ingest_file
+
+            st = ingest_file(db, args.input_file.strip(), args.input_format, max(1, args.chunk_size), args.load_data_local)
+            print(
+                f"✅ Bulk ingest done: inserted={st['inserted']} rejected_unknown_customer={st['rejected_unknown_customer']} "
+                f"malformed={st['malformed']} chunks={st['chunks']} {st['rows_per_sec']:.0f} rows/sec"
+            )
+
         elif args.action == "dashboard":
-            if args.customer_id <= 0:
+            if args.use_orm and args.customer_ids.strip():
+                ids = [int(x) for x in args.customer_ids.split(",") if x.strip()]
+                found = customer_dashboards_orm(ids)
+                for cid in ids:
+                    if cid in found:
+                        _print_dashboard(found[cid])
+                    else:
+                        print(f"Customer {cid} not found.")
+            elif args.customer_id <= 0:
                 raise SystemExit("dashboard requires --customer_id")
-            if args.use_orm:
+            elif args.use_orm:
                 customer_dashboard_orm(args.customer_id)
             else:
-                customer_dashboard(db, args.customer_id)
+                if route == "replica" and not args.no_cache and default_dashboard_cache.use_snapshot_table:
+                    write_db = DB(DBConfig.from_env())
+                customer_dashboard(db, args.customer_id, use_cache=not args.no_cache, write_db=write_db)
 
         elif args.action == "top":
-            if args.use_orm:
+            if args.use_orm and args.segments.strip():
+                segs = [x.strip().upper() for x in args.segments.split(",") if x.strip()]
+                for seg, rows in top_high_risk_by_segment_orm(segs, args.top_n, args.segment_by).items():
+                    print(f"\nTop {args.top_n} high-risk customers in {args.segment_by}={seg} (last 2 years):")
+                    for r in rows:
+                        print(f"- {r['customer_id']} {r['full_name']} | {r['risk_label']} {r['risk_score']} @ {r['scored_at']}")
+                print()
+            elif args.use_orm:
                 top_high_risk_orm(args.top_n)
             else:
-                top_high_risk(db, args.top_n)
-
+                after = None
+                if args.after.strip():
+                    score, cid = args.after.split(":", 1)
+                    after = (float(score), int(cid))
+                top_high_risk(
+                    db, args.top_n, args.risk_label or None, args.product_type or None, after, use_cache=not args.no_cache
+                )
+
+        elif args.action == "risk_dist":
+            risk_distribution(db, args.model_id or None, args.days, args.rebuild)
+
+        elif args.action == "event_report":
+            print_report(stage_latency(db, args.days or 7, args.bucket, args.event_type or None))
+
+        if write_db is not None:
+            write_db.commit()
         db.commit()
     except Exception:
+        if write_db is not None:
+            write_db.rollback()
         db.rollback()
         raise
     finally:
+        if write_db is not None:
+            write_db.close()
         db.close()
 
 
@@ -80,6 +80,7 @@ class PolicyPremiumAdjustment(Base):
     customer_id: Mapped[int | None] = mapped_column(Integer, ForeignKey("customer.customer_id"), nullable=True)
     model_id: Mapped[int | None] = mapped_column(Integer, ForeignKey("ml_model_metadata.model_id"), nullable=True)
     risk_score_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    rule_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
     adjustment_pct: Mapped[object | None] = mapped_column(Numeric(6, 2), nullable=True)
     suggested_premium: Mapped[object | None] = mapped_column(Numeric(12, 2), nullable=True)
     decision_status: Mapped[str | None] = mapped_column(String(20), nullable=True)
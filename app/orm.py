@@ -1,10 +1,11 @@
 from __future__ import annotations
 
 import os
-from typing import Optional
+import threading
+from typing import Dict
 
 from sqlalchemy import create_engine
-from sqlalchemy.engine import Engine
+from sqlalchemy.engine import URL, Engine
 from sqlalchemy.orm import Session, sessionmaker
 
 
@@ -16,21 +17,57 @@ def get_engine_from_env(echo: bool = False) -> Engine:
     """
     SQLAlchemy engine for MySQL using PyMySQL.
     Uses the same DB_* env vars as the rest of the project.
+    Pool and statement-cache sizes are tunable via ORM_POOL_SIZE, ORM_MAX_OVERFLOW,
+    ORM_POOL_RECYCLE_S and ORM_QUERY_CACHE_SIZE.
     """
-    host = _env("DB_HOST", "127.0.0.1")
-    port = int(_env("DB_PORT", "3306"))
-    user = _env("DB_USER", "root")
-    password = _env("DB_PASSWORD", "")
-    db = _env("DB_NAME", "insurance_ods")
+    url = URL.create(
+        "mysql+pymysql",
+        username=_env("DB_USER", "root"),
+        password=_env("DB_PASSWORD", ""),
+        host=_env("DB_HOST", "127.0.0.1"),
+        port=int(_env("DB_PORT", "3306")),
+        database=_env("DB_NAME", "insurance_ods"),
+        query={"charset": "utf8mb4"},
+    )
+    return create_engine(
+        url,
+        echo=echo,
+        pool_pre_ping=True,
+        pool_size=int(_env("ORM_POOL_SIZE", "5")),
+        max_overflow=int(_env("ORM_MAX_OVERFLOW", "10")),
+        pool_recycle=int(_env("ORM_POOL_RECYCLE_S", "1800")),
+        # compiled-statement cache: repeated ORM queries skip SQL compilation
+        query_cache_size=int(_env("ORM_QUERY_CACHE_SIZE", "500")),
+        future=True,
+    )
 
-    # Note: password may contain special chars; SQLAlchemy will handle URL escaping.
-    url = f"mysql+pymysql://{user}:{password}@{host}:{port}/{db}?charset=utf8mb4"
-    return create_engine(url, echo=echo, pool_pre_ping=True, future=True)
+
+_ENGINES: Dict[bool, Engine] = {}
+_SESSIONMAKERS: Dict[bool, sessionmaker] = {}
+_LOCK = threading.Lock()
+
+
+def get_engine(echo: bool = False) -> Engine:
+    # one engine (and connection pool) per process
+    with _LOCK:
+        engine = _ENGINES.get(echo)
+        if engine is None:
+            engine = _ENGINES[echo] = get_engine_from_env(echo=echo)
+        return engine
 
 
 def get_session(echo: bool = False) -> Session:
-    engine = get_engine_from_env(echo=echo)
-    SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
-    return SessionLocal()
+    factory = _SESSIONMAKERS.get(echo)
+    if factory is None:
+        factory = sessionmaker(bind=get_engine(echo), autoflush=False, autocommit=False, future=True)
+        _SESSIONMAKERS[echo] = factory
+    return factory()
 
 
+def dispose_engines():
+    # e.g. after fork: child processes must not reuse the parent's pooled connections
+    with _LOCK:
+        for engine in _ENGINES.values():
+            engine.dispose()
+        _ENGINES.clear()
+        _SESSIONMAKERS.clear()
@@ -0,0 +1,190 @@
+# bench/run_benchmark.py
+# End-to-end benchmark: synthetic data -> bulk ingest -> inference/write-back -> read queries.
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Sequence
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+for _d in (ROOT / "ml", ROOT / "app"):
+    if str(_d) not in sys.path:
+        sys.path.insert(0, str(_d))
+
+from db import DBConfig, MySQL  # noqa: E402
+from bulk_ingest import ingest_file  # noqa: E402
+from main_app import fetch_customer_dashboard, fetch_top_high_risk  # noqa: E402
+from risk_model_inference import fetch_unprocessed, load_active_model  # noqa: E402
+from prediction_cache import default_pred_cache  # noqa: E402
+from synth_data import generate_customers, write_texts_jsonl  # noqa: E402
+from writeback import write_back  # noqa: E402
+
+
+def _pcts(samples_ms: Sequence[float]) -> Dict[str, float]:
+    if not samples_ms:
+        return {"n": 0}
+    a = np.asarray(samples_ms, dtype=np.float64)
+    return {
+        "n": int(a.size),
+        "mean_ms": round(float(a.mean()), 3),
+        "p50_ms": round(float(np.percentile(a, 50)), 3),
+        "p99_ms": round(float(np.percentile(a, 99)), 3),
+        "max_ms": round(float(a.max()), 3),
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def bench_inference(db: MySQL, batch_size: int, max_rows: int) -> Dict[str, Any]:
+    model_id, artifact_path, model = load_active_model(db)
+    db.commit()
+    fetch_ms: List[float] = []
+    score_ms: List[float] = []
+    writeback_ms: List[float] = []
+    commit_ms: List[float] = []
+    total = 0
+    cursor = None
+    t_start = time.perf_counter()
+    while not max_rows or total < max_rows:
+        t0 = time.perf_counter()
+        texts = fetch_unprocessed(db, batch_size, after=cursor)
+        t1 = time.perf_counter()
+        if not texts:
+            break
+        scored = default_pred_cache.score(db, model_id, model, [t["raw_text"] for t in texts])
+        t2 = time.perf_counter()
+        write_back(db, model_id, artifact_path, texts, scored.labels, scored.scores)
+        t3 = time.perf_counter()
+        db.commit()
+        t4 = time.perf_counter()
+        fetch_ms.append((t1 - t0) * 1000)
+        score_ms.append((t2 - t1) * 1000)
+        writeback_ms.append((t3 - t2) * 1000)
+        commit_ms.append((t4 - t3) * 1000)
+        cursor = (texts[-1]["ingested_at"], int(texts[-1]["text_id"]))
+        total += len(texts)
+    elapsed = time.perf_counter() - t_start
+    return {
+        "texts_scored": total,
+        "batch_size": batch_size,
+        "elapsed_s": round(elapsed, 3),
+        "texts_per_sec": round(total / elapsed, 1) if elapsed > 0 else 0.0,
+        "fetch": _pcts(fetch_ms),
+        "score": _pcts(score_ms),
+        "writeback": _pcts(writeback_ms),
+        "commit": _pcts(commit_ms),
+        "prediction_cache": default_pred_cache.stats(),
+    }
+
+
+def bench_query(fn: Callable[[], Any], samples: int) -> Dict[str, Any]:
+    lat: List[float] = []
+    for _ in range(samples):
+        t0 = time.perf_counter()
+        fn()
+        lat.append((time.perf_counter() - t0) * 1000)
+    return _pcts(lat)
+
+
+def compare(current: Dict[str, Any], baseline_path: str):
+    base = json.loads(Path(baseline_path).read_text())
+    print(f"\nComparison vs {baseline_path} (commit {base.get('commit')}):")
+    pairs = [
+        ("ingest rows/sec", ("ingest", "rows_per_sec")),
+        ("inference texts/sec", ("inference", "texts_per_sec")),
+        ("write-back p50 ms", ("inference", "writeback", "p50_ms")),
+        ("dashboard p50 ms", ("dashboard", "p50_ms")),
+        ("dashboard p99 ms", ("dashboard", "p99_ms")),
+        ("top p50 ms", ("top", "p50_ms")),
+        ("top p99 ms", ("top", "p99_ms")),
+    ]
+    for name, path in pairs:
+        a, b = current, base
+        for k in path:
+            a = a.get(k, {}) if isinstance(a, dict) else {}
+            b = b.get(k, {}) if isinstance(b, dict) else {}
+        if isinstance(a, (int, float)) and isinstance(b, (int, float)) and b:
+            print(f"- {name}: {b} -> {a} ({(a - b) / b * 100:+.1f}%)")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--customers", type=int, default=10000, help="Synthetic customers to generate (0 = reuse existing data)")
+    ap.add_argument("--texts", type=int, default=10000, help="Synthetic texts to ingest")
+    ap.add_argument("--chunk_size", type=int, default=5000)
+    ap.add_argument("--batch_size", type=int, default=1000)
+    ap.add_argument("--max_infer_rows", type=int, default=0, help="Cap on texts scored (0 = drain everything)")
+    ap.add_argument("--query_samples", type=int, default=200)
+    ap.add_argument("--top_n", type=int, default=20)
+    ap.add_argument("--out_dir", default="bench/results")
+    ap.add_argument("--compare", default="", help="Earlier results JSON to diff against")
+    args = ap.parse_args()
+
+    run_tag = datetime.now().strftime("%Y%m%d%H%M%S")
+    db = MySQL(DBConfig.from_env())
+    result: Dict[str, Any] = {
+        "commit": _git_commit(),
+        "run_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "params": vars(args),
+    }
+    try:
+        result["mysql_version"] = db.fetchall("SELECT VERSION()")[0][0]
+
+        # 1) synthetic data
+        if args.customers > 0:
+            t0 = time.perf_counter()
+            ids = generate_customers(db, args.customers, run_tag)
+            result["generate"] = {"customers": len(ids), "elapsed_s": round(time.perf_counter() - t0, 3)}
+        else:
+            ids = [int(r[0]) for r in db.fetchall("SELECT customer_id FROM customer")]
+        if not ids:
+            raise SystemExit("No customers available; run with --customers > 0")
+
+        # 2) ingest
+        if args.texts > 0:
+            path = write_texts_jsonl(str(ROOT / "bench" / "data" / f"texts_{run_tag}.jsonl"), ids, args.texts, run_tag)
+            st = ingest_file(db, path, "jsonl", args.chunk_size)
+            result["ingest"] = {k: (round(v, 3) if isinstance(v, float) else v) for k, v in st.items()}
+            Path(path).unlink()
+
+        # 3) inference + write-back
+        result["inference"] = bench_inference(db, args.batch_size, args.max_infer_rows)
+
+        # 4) read path latency
+        rng = random.Random(run_tag)
+        result["dashboard"] = bench_query(lambda: fetch_customer_dashboard(db, rng.choice(ids)), args.query_samples)
+        result["top"] = bench_query(lambda: fetch_top_high_risk(db, args.top_n), args.query_samples)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    out_dir = Path(args.out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    out = out_dir / f"bench_{result['commit']}_{run_tag}.json"
+    out.write_text(json.dumps(result, indent=2, default=str))
+    print(json.dumps({k: result.get(k) for k in ("ingest", "inference", "dashboard", "top")}, indent=2, default=str))
+    print(f"Results written to {out}")
+    if args.compare:
+        compare(result, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+# bench/synth_data.py
+# Synthetic customers / policies / texts for benchmarking (never run against production data).
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import time
+from array import array
+from pathlib import Path
+from typing import Any, Iterator, List, Sequence
+
+ROOT = Path(__file__).resolve().parent.parent
+for _d in (ROOT / "ml", ROOT / "app"):
+    if str(_d) not in sys.path:
+        sys.path.insert(0, str(_d))
+
+from db import DBConfig, MySQL  # noqa: E402
+
+PRODUCT_TYPES = ["AUTO", "HOME", "HEALTH", "LIFE", "TRAVEL"]
+SOURCE_TYPES = ["CLAIM_DESCRIPTION", "CUSTOMER_REVIEW", "SUPPORT_CHAT", "OTHER"]
+
+# phrase pools per label, in the same register as ml/sample_unstructured_data_labeled.csv
+PHRASES = {
+    "LOW": [
+        "service was smooth and fast", "very satisfied with claim handling", "policy terms were clear",
+        "no issues so far", "friendly agent resolved my question", "renewal was simple",
+    ],
+    "MEDIUM": [
+        "rear ended at traffic light minor damage", "conflicting answers from support", "agent promised call back",
+        "waiting for an update on my claim", "want escalation", "documents submitted twice",
+    ],
+    "HIGH": [
+        "multiple incidents this year", "lost receipts need urgent payout", "suspected fraud missing documents",
+        "terrible experience unfair", "urgent investigation required", "threatening legal action",
+    ],
+}
+# a share of texts are exact re-submissions of templates (exercises duplicate-heavy paths)
+TEMPLATES = [
+    "agent never called back very frustrated",
+    "service was smooth and fast",
+    "multiple incidents and missing documents",
+]
+
+
+def synth_text(rng: random.Random, template_share: float = 0.2) -> str:
+    if rng.random() < template_share:
+        return rng.choice(TEMPLATES)
+    label = rng.choices(["LOW", "MEDIUM", "HIGH"], weights=[0.5, 0.3, 0.2])[0]
+    words = rng.sample(PHRASES[label], k=rng.randint(1, 3))
+    if rng.random() < 0.3:
+        other = rng.choice(["LOW", "MEDIUM", "HIGH"])
+        words.append(rng.choice(PHRASES[other]))
+    return " ".join(words)
+
+
+def _multi_insert(db: MySQL, table_cols: str, row_sql: str, rows: List[tuple]) -> int:
+    values = ",".join([row_sql] * len(rows))
+    params: List[Any] = []
+    for r in rows:
+        params.extend(r)
+    return db.execute(f"INSERT INTO {table_cols} VALUES {values}", tuple(params))
+
+
+def generate_customers(db: MySQL, n_customers: int, run_tag: str, chunk: int = 10000) -> Sequence[int]:
+    """Insert customers + one or two policies each; returns the generated customer ids."""
+    rng = random.Random(run_tag)
+    lo = int(db.fetchall("SELECT COALESCE(MAX(customer_id), 0) FROM customer")[0][0])
+    for start in range(0, n_customers, chunk):
+        rows = [
+            (f"Bench Customer {run_tag}-{i}", f"bench+{run_tag}-{i}@example.com")
+            for i in range(start, min(start + chunk, n_customers))
+        ]
+        _multi_insert(db, "customer (full_name, email)", "(%s, %s)", rows)
+        db.commit()
+
+    # compact int64 array, fetched in keyset pages (10M ids stay ~80MB)
+    ids = array("q")
+    last = lo
+    while True:
+        page = db.fetchall(
+            "SELECT customer_id FROM customer WHERE customer_id > %s AND email LIKE %s ORDER BY customer_id LIMIT %s",
+            (last, f"bench+{run_tag}-%", chunk),
+        )
+        if not page:
+            break
+        ids.extend(int(r[0]) for r in page)
+        last = ids[-1]
+
+    for start in range(0, len(ids), chunk):
+        rows = []
+        for cid in ids[start:start + chunk]:
+            for _ in range(1 if rng.random() < 0.8 else 2):
+                rows.append((
+                    cid,
+                    rng.choice(PRODUCT_TYPES),
+                    round(rng.uniform(400, 4000), 2),
+                    "ACTIVE" if rng.random() < 0.85 else rng.choice(["PENDING", "CANCELLED"]),
+                ))
+        _multi_insert(db, "policy (customer_id, product_type, base_premium, status)", "(%s, %s, %s, %s)", rows)
+        db.commit()
+    return ids
+
+
+def iter_text_records(customer_ids: Sequence[int], n_texts: int, seed: str) -> Iterator[dict]:
+    rng = random.Random(seed)
+    for _ in range(n_texts):
+        yield {
+            "customer_id": rng.choice(customer_ids),
+            "source_type": rng.choice(SOURCE_TYPES),
+            "raw_text": synth_text(rng),
+        }
+
+
+def write_texts_jsonl(path: str, customer_ids: Sequence[int], n_texts: int, seed: str) -> str:
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        for rec in iter_text_records(customer_ids, n_texts, seed):
+            f.write(json.dumps(rec) + "\n")
+    return path
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--customers", type=int, default=10000)
+    ap.add_argument("--texts", type=int, default=10000)
+    ap.add_argument("--run_tag", default=time.strftime("%Y%m%d%H%M%S"))
+    ap.add_argument("--texts_out", default="bench/data/texts.jsonl", help="JSONL file for main_app.py --action ingest_bulk")
+    args = ap.parse_args()
+
+    db = MySQL(DBConfig.from_env())
+    try:
+        t0 = time.perf_counter()
+        ids = generate_customers(db, args.customers, args.run_tag)
+        print(f"Generated {len(ids)} customers (+policies) in {time.perf_counter() - t0:.1f}s")
+        write_texts_jsonl(args.texts_out, ids, args.texts, args.run_tag)
+        print(f"Wrote {args.texts} synthetic texts to {args.texts_out}")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
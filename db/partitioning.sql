@@ -0,0 +1,136 @@
+-- ============================================================
+-- OPT-IN: monthly range partitioning for the append-only history tables
+-- ============================================================
+--
+-- Run once, after db/schema.sql (and after loading data, if any):
+--   SOURCE db/partitioning.sql;
+--
+-- What changes
+-- - customer_risk_score (scored_at), policy_premium_adjustment (created_at) and
+--   pipeline_event (event_time) are partitioned by month, so retention drops or exchanges
+--   whole partitions instead of running large DELETEs (see ml/retention.py).
+-- - MySQL requires the partitioning column in every unique key: the primary keys become
+--   (id, time column) and the time columns become NOT NULL. Ids stay AUTO_INCREMENT and unique.
+-- - Partitioned InnoDB tables cannot have foreign keys, so the FKs of customer_risk_score
+--   are dropped (write-back only inserts ids it has just read from the parent tables).
+--   The names below are the ones MySQL generates for db/schema.sql; check
+--   SHOW CREATE TABLE customer_risk_score if the table was created differently.
+-- - Lookups by risk_score_id alone probe every partition's primary key; keep the number of
+--   hot partitions small with the retention job.
+--
+-- Partitions: p_old (< 2025-01), one per month through 2026-12, and pmax (MAXVALUE).
+-- `python ml/retention.py extend --months_ahead 3` splits pmax before new months arrive.
+-- ============================================================
+
+USE insurance_ods;
+
+-- Risk history
+ALTER TABLE customer_risk_score DROP FOREIGN KEY customer_risk_score_ibfk_1;
+ALTER TABLE customer_risk_score DROP FOREIGN KEY customer_risk_score_ibfk_2;
+ALTER TABLE customer_risk_score DROP FOREIGN KEY customer_risk_score_ibfk_3;
+UPDATE customer_risk_score SET scored_at = '1970-01-01' WHERE scored_at IS NULL;
+ALTER TABLE customer_risk_score
+  MODIFY scored_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  DROP PRIMARY KEY,
+  ADD PRIMARY KEY (risk_score_id, scored_at);
+ALTER TABLE customer_risk_score
+PARTITION BY RANGE COLUMNS (scored_at) (
+  PARTITION p_old VALUES LESS THAN ('2025-01-01'),
+  PARTITION p202501 VALUES LESS THAN ('2025-02-01'),
+  PARTITION p202502 VALUES LESS THAN ('2025-03-01'),
+  PARTITION p202503 VALUES LESS THAN ('2025-04-01'),
+  PARTITION p202504 VALUES LESS THAN ('2025-05-01'),
+  PARTITION p202505 VALUES LESS THAN ('2025-06-01'),
+  PARTITION p202506 VALUES LESS THAN ('2025-07-01'),
+  PARTITION p202507 VALUES LESS THAN ('2025-08-01'),
+  PARTITION p202508 VALUES LESS THAN ('2025-09-01'),
+  PARTITION p202509 VALUES LESS THAN ('2025-10-01'),
+  PARTITION p202510 VALUES LESS THAN ('2025-11-01'),
+  PARTITION p202511 VALUES LESS THAN ('2025-12-01'),
+  PARTITION p202512 VALUES LESS THAN ('2026-01-01'),
+  PARTITION p202601 VALUES LESS THAN ('2026-02-01'),
+  PARTITION p202602 VALUES LESS THAN ('2026-03-01'),
+  PARTITION p202603 VALUES LESS THAN ('2026-04-01'),
+  PARTITION p202604 VALUES LESS THAN ('2026-05-01'),
+  PARTITION p202605 VALUES LESS THAN ('2026-06-01'),
+  PARTITION p202606 VALUES LESS THAN ('2026-07-01'),
+  PARTITION p202607 VALUES LESS THAN ('2026-08-01'),
+  PARTITION p202608 VALUES LESS THAN ('2026-09-01'),
+  PARTITION p202609 VALUES LESS THAN ('2026-10-01'),
+  PARTITION p202610 VALUES LESS THAN ('2026-11-01'),
+  PARTITION p202611 VALUES LESS THAN ('2026-12-01'),
+  PARTITION p202612 VALUES LESS THAN ('2027-01-01'),
+  PARTITION pmax VALUES LESS THAN (MAXVALUE)
+);
+
+-- Premium suggestions
+UPDATE policy_premium_adjustment SET created_at = '1970-01-01' WHERE created_at IS NULL;
+ALTER TABLE policy_premium_adjustment
+  MODIFY created_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  DROP PRIMARY KEY,
+  ADD PRIMARY KEY (adjustment_id, created_at);
+ALTER TABLE policy_premium_adjustment
+PARTITION BY RANGE COLUMNS (created_at) (
+  PARTITION p_old VALUES LESS THAN ('2025-01-01'),
+  PARTITION p202501 VALUES LESS THAN ('2025-02-01'),
+  PARTITION p202502 VALUES LESS THAN ('2025-03-01'),
+  PARTITION p202503 VALUES LESS THAN ('2025-04-01'),
+  PARTITION p202504 VALUES LESS THAN ('2025-05-01'),
+  PARTITION p202505 VALUES LESS THAN ('2025-06-01'),
+  PARTITION p202506 VALUES LESS THAN ('2025-07-01'),
+  PARTITION p202507 VALUES LESS THAN ('2025-08-01'),
+  PARTITION p202508 VALUES LESS THAN ('2025-09-01'),
+  PARTITION p202509 VALUES LESS THAN ('2025-10-01'),
+  PARTITION p202510 VALUES LESS THAN ('2025-11-01'),
+  PARTITION p202511 VALUES LESS THAN ('2025-12-01'),
+  PARTITION p202512 VALUES LESS THAN ('2026-01-01'),
+  PARTITION p202601 VALUES LESS THAN ('2026-02-01'),
+  PARTITION p202602 VALUES LESS THAN ('2026-03-01'),
+  PARTITION p202603 VALUES LESS THAN ('2026-04-01'),
+  PARTITION p202604 VALUES LESS THAN ('2026-05-01'),
+  PARTITION p202605 VALUES LESS THAN ('2026-06-01'),
+  PARTITION p202606 VALUES LESS THAN ('2026-07-01'),
+  PARTITION p202607 VALUES LESS THAN ('2026-08-01'),
+  PARTITION p202608 VALUES LESS THAN ('2026-09-01'),
+  PARTITION p202609 VALUES LESS THAN ('2026-10-01'),
+  PARTITION p202610 VALUES LESS THAN ('2026-11-01'),
+  PARTITION p202611 VALUES LESS THAN ('2026-12-01'),
+  PARTITION p202612 VALUES LESS THAN ('2027-01-01'),
+  PARTITION pmax VALUES LESS THAN (MAXVALUE)
+);
+
+-- Pipeline log
+UPDATE pipeline_event SET event_time = '1970-01-01' WHERE event_time IS NULL;
+ALTER TABLE pipeline_event
+  MODIFY event_time DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  DROP PRIMARY KEY,
+  ADD PRIMARY KEY (event_id, event_time);
+ALTER TABLE pipeline_event
+PARTITION BY RANGE COLUMNS (event_time) (
+  PARTITION p_old VALUES LESS THAN ('2025-01-01'),
+  PARTITION p202501 VALUES LESS THAN ('2025-02-01'),
+  PARTITION p202502 VALUES LESS THAN ('2025-03-01'),
+  PARTITION p202503 VALUES LESS THAN ('2025-04-01'),
+  PARTITION p202504 VALUES LESS THAN ('2025-05-01'),
+  PARTITION p202505 VALUES LESS THAN ('2025-06-01'),
+  PARTITION p202506 VALUES LESS THAN ('2025-07-01'),
+  PARTITION p202507 VALUES LESS THAN ('2025-08-01'),
+  PARTITION p202508 VALUES LESS THAN ('2025-09-01'),
+  PARTITION p202509 VALUES LESS THAN ('2025-10-01'),
+  PARTITION p202510 VALUES LESS THAN ('2025-11-01'),
+  PARTITION p202511 VALUES LESS THAN ('2025-12-01'),
+  PARTITION p202512 VALUES LESS THAN ('2026-01-01'),
+  PARTITION p202601 VALUES LESS THAN ('2026-02-01'),
+  PARTITION p202602 VALUES LESS THAN ('2026-03-01'),
+  PARTITION p202603 VALUES LESS THAN ('2026-04-01'),
+  PARTITION p202604 VALUES LESS THAN ('2026-05-01'),
+  PARTITION p202605 VALUES LESS THAN ('2026-06-01'),
+  PARTITION p202606 VALUES LESS THAN ('2026-07-01'),
+  PARTITION p202607 VALUES LESS THAN ('2026-08-01'),
+  PARTITION p202608 VALUES LESS THAN ('2026-09-01'),
+  PARTITION p202609 VALUES LESS THAN ('2026-10-01'),
+  PARTITION p202610 VALUES LESS THAN ('2026-11-01'),
+  PARTITION p202611 VALUES LESS THAN ('2026-12-01'),
+  PARTITION p202612 VALUES LESS THAN ('2027-01-01'),
+  PARTITION pmax VALUES LESS THAN (MAXVALUE)
+);
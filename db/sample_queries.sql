@@ -28,6 +28,15 @@ WHERE crs.scored_at >= DATE_SUB(CURDATE(), INTERVAL 2 YEAR)
 ORDER BY crs.risk_score DESC
 LIMIT 5;
 
+-- Q2c (Keyset): index-ordered pages (ix_crsl_score_customer), next page continues after the last row
+SELECT c.customer_id, c.full_name, crs.risk_label, crs.risk_score
+FROM customer_risk_score_latest crs
+JOIN customer c ON c.customer_id = crs.customer_id
+WHERE crs.scored_at >= DATE_SUB(CURDATE(), INTERVAL 2 YEAR)
+  AND (crs.risk_score < 0.912345 OR (crs.risk_score = 0.912345 AND crs.customer_id > 42))
+ORDER BY crs.risk_score DESC, crs.customer_id ASC
+LIMIT 50;
+
 -- Q3: Risk distribution
 SELECT risk_label, COUNT(*) AS cnt
 FROM customer_risk_score
@@ -38,6 +47,15 @@ SELECT risk_label, COUNT(*) AS cnt
 FROM customer_risk_score_latest
 GROUP BY risk_label;
 
+-- Q3c (Aggregate): same answers from risk_label_latest_agg / risk_label_daily_agg, maintained by write-back
+SELECT risk_label, SUM(latest_cnt) AS cnt
+FROM risk_label_latest_agg
+GROUP BY risk_label;
+
+SELECT risk_label, SUM(scored_cnt) AS cnt
+FROM risk_label_daily_agg
+GROUP BY risk_label;
+
 -- Q4: End-to-end join
 SELECT
   c.full_name,
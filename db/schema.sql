@@ -100,12 +100,32 @@ CREATE TABLE policy_premium_adjustment (
   customer_id BIGINT,
   model_id BIGINT,
   risk_score_id BIGINT,
+  rule_id BIGINT NULL,
   adjustment_pct DECIMAL(6,2),
   suggested_premium DECIMAL(12,2),
   decision_status ENUM('SUGGESTED','APPROVED','REJECTED') DEFAULT 'SUGGESTED',
   created_at DATETIME DEFAULT CURRENT_TIMESTAMP
 );
 
+-- Premium suggestion rules: most specific match wins (product_type NULL = any product),
+-- then priority; score band is [score_min, score_max), score_max NULL = unbounded
+CREATE TABLE premium_adjustment_rule (
+  rule_id BIGINT AUTO_INCREMENT PRIMARY KEY,
+  risk_label ENUM('LOW','MEDIUM','HIGH') NOT NULL,
+  product_type VARCHAR(100) NULL,
+  score_min DECIMAL(10,6) NOT NULL DEFAULT 0,
+  score_max DECIMAL(10,6) NULL,
+  adjustment_pct DECIMAL(6,2) NOT NULL,
+  priority INT NOT NULL DEFAULT 0,
+  is_active TINYINT NOT NULL DEFAULT 1,
+  created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+);
+
+INSERT INTO premium_adjustment_rule (risk_label, product_type, adjustment_pct) VALUES
+  ('HIGH', NULL, 15.00),
+  ('MEDIUM', NULL, 5.00),
+  ('LOW', NULL, 0.00);
+
 -- =========================
 -- Pipeline Log
 -- =========================
@@ -116,7 +136,113 @@ CREATE TABLE pipeline_event (
   entity_type VARCHAR(50),
   entity_id BIGINT,
   message VARCHAR(2000),
-  event_time DATETIME DEFAULT CURRENT_TIMESTAMP
+  event_time DATETIME DEFAULT CURRENT_TIMESTAMP,
+  -- structured fields for latency/throughput reports (NULL for plain events)
+  duration_ms DECIMAL(12,3) NULL,
+  rows_in INT NULL,
+  rows_out INT NULL,
+  model_id BIGINT NULL,
+  batch_id VARCHAR(32) NULL
+);
+
+-- Risk aggregates maintained by write-back (label distribution without scanning score tables)
+CREATE TABLE risk_label_daily_agg (
+  risk_label ENUM('LOW','MEDIUM','HIGH') NOT NULL,
+  model_id BIGINT NOT NULL,
+  score_day DATE NOT NULL,
+  slot SMALLINT UNSIGNED NOT NULL DEFAULT 0,  -- writer shard (CONNECTION_ID() mod AGG_SLOTS); readers SUM
+  scored_cnt BIGINT NOT NULL DEFAULT 0,
+  PRIMARY KEY (risk_label, model_id, score_day, slot),
+  FOREIGN KEY (model_id) REFERENCES ml_model_metadata(model_id)
+);
+
+-- Current label distribution: customers whose latest score has this label/model (no day, so it stays small)
+CREATE TABLE risk_label_latest_agg (
+  risk_label ENUM('LOW','MEDIUM','HIGH') NOT NULL,
+  model_id BIGINT NOT NULL,
+  slot SMALLINT UNSIGNED NOT NULL DEFAULT 0,  -- writer shard (CONNECTION_ID() mod AGG_SLOTS); readers SUM
+  latest_cnt BIGINT NOT NULL DEFAULT 0,
+  PRIMARY KEY (risk_label, model_id, slot),
+  FOREIGN KEY (model_id) REFERENCES ml_model_metadata(model_id)
+);
+
+-- Denormalized dashboard rows (read-through cache); write-back and ingest delete affected customers
+CREATE TABLE customer_dashboard_snapshot (
+  customer_id BIGINT PRIMARY KEY,
+  full_name VARCHAR(200),
+  text_id BIGINT,
+  source_type ENUM('CLAIM_DESCRIPTION','CUSTOMER_REVIEW','SUPPORT_CHAT','OTHER'),
+  ingested_at DATETIME,
+  processed_at DATETIME,
+  text_preview VARCHAR(160),
+  risk_score_id BIGINT,
+  risk_label ENUM('LOW','MEDIUM','HIGH'),
+  risk_score DECIMAL(10,6),
+  scored_at DATETIME,
+  model_version VARCHAR(100),
+  policy_id BIGINT,
+  product_type VARCHAR(100),
+  base_premium DECIMAL(12,2),
+  status ENUM('ACTIVE','PENDING','CANCELLED'),
+  adjustment_pct DECIMAL(6,2),
+  suggested_premium DECIMAL(12,2),
+  decision_status ENUM('SUGGESTED','APPROVED','REJECTED'),
+  adjustment_time DATETIME,
+  refreshed_at DATETIME NOT NULL,
+  FOREIGN KEY (customer_id) REFERENCES customer(customer_id)
+);
+
+-- Content-hash prediction cache: sha256(normalize_text(raw_text)) per model version
+CREATE TABLE prediction_cache (
+  model_id BIGINT NOT NULL,
+  text_hash BINARY(32) NOT NULL,
+  risk_label ENUM('LOW','MEDIUM','HIGH') NOT NULL,
+  risk_score DECIMAL(10,6) NOT NULL,
+  created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (model_id, text_hash),
+  FOREIGN KEY (model_id) REFERENCES ml_model_metadata(model_id)
+);
+
+-- Resumable rescoring: one keyset cursor per (model, window) pass
+CREATE TABLE rescore_checkpoint (
+  model_id BIGINT NOT NULL,
+  window_days INT NOT NULL,
+  window_start DATETIME NOT NULL,
+  window_end DATETIME NOT NULL,
+  last_ingested_at DATETIME NULL,
+  last_text_id BIGINT NULL,
+  rows_todo BIGINT NOT NULL DEFAULT 0,
+  rows_done BIGINT NOT NULL DEFAULT 0,
+  started_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+  updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  finished_at DATETIME NULL,
+  PRIMARY KEY (model_id, window_days),
+  FOREIGN KEY (model_id) REFERENCES ml_model_metadata(model_id)
+);
+
+-- Retrain trigger counters, updated in the same transaction as the rows they count
+CREATE TABLE pipeline_counter (
+  counter_name VARCHAR(100) NOT NULL,
+  slot SMALLINT UNSIGNED NOT NULL DEFAULT 0,  -- writer shard (CONNECTION_ID() mod COUNTER_SLOTS); readers SUM
+  counter_value BIGINT NOT NULL DEFAULT 0,
+  updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+  PRIMARY KEY (counter_name, slot)
+);
+
+INSERT INTO pipeline_counter (counter_name, counter_value) VALUES
+  ('texts_ingested_total', 0),
+  ('texts_ingested_at_last_train', 0);
+
+-- Score/label histogram per model and day (risk_score deciles), maintained by write-back
+CREATE TABLE model_score_histogram (
+  model_id BIGINT NOT NULL,
+  window_start DATE NOT NULL,
+  risk_label ENUM('LOW','MEDIUM','HIGH') NOT NULL,
+  score_bucket TINYINT NOT NULL,
+  slot SMALLINT UNSIGNED NOT NULL DEFAULT 0,  -- writer shard (CONNECTION_ID() mod COUNTER_SLOTS); readers SUM
+  cnt BIGINT NOT NULL DEFAULT 0,
+  PRIMARY KEY (model_id, window_start, risk_label, score_bucket, slot),
+  FOREIGN KEY (model_id) REFERENCES ml_model_metadata(model_id)
 );
 
 -- =========================
@@ -127,6 +253,10 @@ CREATE TABLE pipeline_event (
 CREATE INDEX ix_unstructured_text_processed_ingested
   ON unstructured_text (is_processed, ingested_at);
 
+-- Rescoring: keyset walk of an ingestion window regardless of processed flag
+CREATE INDEX ix_unstructured_text_ingested
+  ON unstructured_text (ingested_at, text_id);
+
 -- Model lookup: find active model quickly
 CREATE INDEX ix_mlm_name_active_trained
   ON ml_model_metadata (model_name, is_active, trained_at);
@@ -145,10 +275,29 @@ CREATE INDEX ix_crs_label_scored
 CREATE INDEX ix_crsl_label_scored
   ON customer_risk_score_latest (risk_label, scored_at);
 
+-- Top-N by score: index order matches ORDER BY risk_score DESC, customer_id ASC (keyset pages)
+CREATE INDEX ix_crsl_score_customer
+  ON customer_risk_score_latest (risk_score DESC, customer_id);
+
+CREATE INDEX ix_crsl_label_score_customer
+  ON customer_risk_score_latest (risk_label, risk_score DESC, customer_id);
+
 -- Policies: lookup active policy for a customer
 CREATE INDEX ix_policy_customer_status
   ON policy (customer_id, status);
 
+-- Event report: per-stage latency over a time window
+CREATE INDEX ix_pipeline_event_time_type
+  ON pipeline_event (event_time, event_type);
+
+-- Premium rules: candidate rules for a label
+CREATE INDEX ix_par_label_active
+  ON premium_adjustment_rule (risk_label, is_active);
+
+-- Premium adjustments: open-suggestion dedup probe per policy
+CREATE INDEX ix_ppa_policy_status
+  ON policy_premium_adjustment (policy_id, decision_status);
+
 -- Premium adjustments: fetch latest adjustment for a customer
 CREATE INDEX ix_ppa_customer_created
   ON policy_premium_adjustment (customer_id, created_at);
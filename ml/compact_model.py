@@ -0,0 +1,212 @@
+# ml/compact_model.py
+# Compact, sklearn-free scoring format for TF-IDF + LogisticRegression pipelines:
+# an .npz with vocabulary terms, IDF weights and float32 coefficients, scored with NumPy only.
+from __future__ import annotations
+
+import argparse
+import json
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+
+from text_prep import normalize_text
+
+FORMAT_VERSION = 1
+
+
+def export_compact(pipe: Any, path: str, prune_below: float = 0.0) -> Dict[str, Any]:
+    """
+    Write a fitted Pipeline(tfidf, clf) as arrays. Only attributes are read, so sklearn is not imported here.
+    prune_below > 0 drops n-grams whose largest |coefficient| across classes is below it; this also drops
+    them from the L2 norm, so pruned models are approximate and should be checked with verify().
+    """
+    steps = getattr(pipe, "steps", None)
+    if not steps or len(steps) != 2:
+        raise ValueError("Compact export expects Pipeline([tfidf, clf])")
+    vec, clf = steps[0][1], steps[1][1]
+    if not hasattr(vec, "vocabulary_") or not hasattr(vec, "idf_"):
+        raise ValueError(f"Compact export needs a fitted TfidfVectorizer, got {type(vec).__name__}")
+    if getattr(vec, "analyzer", "word") != "word" or vec.tokenizer is not None or vec.stop_words:
+        raise ValueError("Compact export supports analyzer='word' without custom tokenizer/stop_words")
+    if vec.preprocessor not in (None, normalize_text) or (vec.preprocessor is None and vec.strip_accents):
+        raise ValueError("Compact export supports preprocessor=normalize_text or plain lowercasing")
+    if not hasattr(clf, "coef_") or not hasattr(clf, "predict_proba"):
+        raise ValueError(f"Compact export needs a linear classifier with predict_proba, got {type(clf).__name__}")
+
+    n_terms = len(vec.vocabulary_)
+    terms = np.empty(n_terms, dtype=object)
+    for term, idx in vec.vocabulary_.items():
+        terms[idx] = term
+    coef = np.asarray(clf.coef_, dtype=np.float64)
+    keep = np.ones(n_terms, dtype=bool)
+    if prune_below > 0:
+        keep = np.abs(coef).max(axis=0) >= prune_below
+
+    classes = np.asarray(clf.classes_).astype(str)
+    if len(classes) == 2:
+        link = "binary"
+    elif getattr(clf, "multi_class", "auto") == "ovr" or getattr(clf, "solver", "") == "liblinear":
+        link = "ovr"
+    else:
+        link = "softmax"
+    config = {
+        "format_version": FORMAT_VERSION,
+        "preprocessor": "normalize_text" if vec.preprocessor is normalize_text else None,
+        "lowercase": bool(vec.lowercase),
+        "token_pattern": vec.token_pattern,
+        "ngram_range": list(vec.ngram_range),
+        "binary": bool(vec.binary),
+        "sublinear_tf": bool(vec.sublinear_tf),
+        "norm": vec.norm,
+        "link": link,
+    }
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    np.savez(
+        path,
+        terms=terms[keep].astype(str),
+        idf=np.asarray(vec.idf_, dtype=np.float32)[keep],
+        coef=coef[:, keep].T.astype(np.float32),  # (n_terms, n_classes): one gather per token
+        intercept=np.asarray(clf.intercept_, dtype=np.float32),
+        classes=classes,
+        config=np.array(json.dumps(config)),
+    )
+    return {"terms": n_terms, "kept": int(keep.sum()), "bytes": Path(path).stat().st_size, "link": link}
+
+
+class CompactModel:
+    """NumPy-only stand-in for the fitted pipeline: exposes classes_, predict_proba and predict."""
+
+    def __init__(self, path: str):
+        with np.load(path, allow_pickle=False) as z:
+            self.config = json.loads(str(z["config"]))
+            terms = z["terms"]
+            self.idf = z["idf"].astype(np.float64)
+            self.coef = z["coef"]
+            self.intercept = z["intercept"].astype(np.float64)
+            self.classes_ = z["classes"].astype(object)
+        if self.config.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported compact model format: {self.config.get('format_version')}")
+        self.vocabulary = {str(t): i for i, t in enumerate(terms)}
+        self._token_re = re.compile(self.config["token_pattern"])
+        self.min_n, self.max_n = self.config["ngram_range"]
+
+    def _analyze(self, doc: str) -> List[str]:
+        # mirrors TfidfVectorizer's word analyzer: preprocess -> token_pattern -> n-grams
+        if self.config["preprocessor"] == "normalize_text":
+            doc = normalize_text(doc)
+        elif self.config["lowercase"]:
+            doc = doc.lower()
+        tokens = self._token_re.findall(doc)
+        if self.max_n == 1:
+            return tokens
+        grams = list(tokens) if self.min_n == 1 else []
+        for n in range(max(self.min_n, 2), self.max_n + 1):
+            grams.extend(" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1))
+        return grams
+
+    def decision_function(self, raw_list: Sequence[str]) -> np.ndarray:
+        n = len(raw_list)
+        indptr = np.zeros(n + 1, dtype=np.int64)
+        indices: List[int] = []
+        counts: List[float] = []
+        vocab = self.vocabulary
+        for row, doc in enumerate(raw_list):
+            tf: Dict[int, int] = {}
+            for g in self._analyze(str(doc)):
+                j = vocab.get(g)
+                if j is not None:
+                    tf[j] = tf.get(j, 0) + 1
+            indices.extend(tf.keys())
+            counts.extend(tf.values())
+            indptr[row + 1] = len(indices)
+
+        idx = np.asarray(indices, dtype=np.int64)
+        w = np.asarray(counts, dtype=np.float64)
+        if self.config["binary"]:
+            w = np.ones_like(w)
+        elif self.config["sublinear_tf"]:
+            w = 1.0 + np.log(w)
+        w *= self.idf[idx]
+
+        rows = np.repeat(np.arange(n), np.diff(indptr))
+        if self.config["norm"] in ("l2", "l1"):
+            sq = w * w if self.config["norm"] == "l2" else np.abs(w)
+            norms = np.bincount(rows, weights=sq, minlength=n)
+            if self.config["norm"] == "l2":
+                norms = np.sqrt(norms)
+            norms[norms == 0] = 1.0
+            w /= norms[rows]
+
+        logits = np.zeros((n, self.coef.shape[1]), dtype=np.float64)
+        np.add.at(logits, rows, self.coef[idx].astype(np.float64) * w[:, None])
+        logits += self.intercept
+        return logits
+
+    def predict_proba(self, raw_list: Sequence[str]) -> np.ndarray:
+        z = self.decision_function(raw_list)
+        link = self.config["link"]
+        if link == "binary":
+            p1 = 1.0 / (1.0 + np.exp(-z[:, 0]))
+            return np.column_stack([1.0 - p1, p1])
+        if link == "ovr":
+            p = 1.0 / (1.0 + np.exp(-z))
+            return p / p.sum(axis=1, keepdims=True)
+        z = z - z.max(axis=1, keepdims=True)
+        e = np.exp(z)
+        return e / e.sum(axis=1, keepdims=True)
+
+    def predict(self, raw_list: Sequence[str]) -> np.ndarray:
+        return self.classes_[self.predict_proba(raw_list).argmax(axis=1)]
+
+
+def load_compact(path: str) -> CompactModel:
+    return CompactModel(path)
+
+
+def compact_path_for(artifact_path: str) -> str:
+    return str(Path(artifact_path).with_suffix(".npz"))
+
+
+def verify(pipe: Any, compact: CompactModel, raw_list: Sequence[str]) -> Dict[str, Any]:
+    """Label agreement and probability error of the compact model against the original pipeline."""
+    p_ref = np.asarray(pipe.predict_proba(list(raw_list)), dtype=np.float64)
+    p_new = compact.predict_proba(list(raw_list))
+    diff = np.abs(p_ref - p_new)
+    return {
+        "n": len(raw_list),
+        "label_agreement": float((p_ref.argmax(axis=1) == p_new.argmax(axis=1)).mean()) if len(raw_list) else 1.0,
+        "max_abs_proba_diff": float(diff.max()) if diff.size else 0.0,
+        "mean_abs_proba_diff": float(diff.mean()) if diff.size else 0.0,
+    }
+
+
+def main():
+    # Export an existing .joblib artifact and check it against a labeled/unlabeled CSV (raw_text column)
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--artifact", required=True, help="Path to a TF-IDF + LogisticRegression .joblib artifact")
+    ap.add_argument("--out", default="", help="Output .npz (default: next to the artifact)")
+    ap.add_argument("--prune_below", type=float, default=0.0, help="Drop n-grams with max |coef| below this")
+    ap.add_argument("--verify_csv", default="", help="CSV with a raw_text column to compare predictions on")
+    args = ap.parse_args()
+
+    import joblib
+
+    pipe = joblib.load(args.artifact)
+    out = args.out or compact_path_for(args.artifact)
+    st = export_compact(pipe, out, args.prune_below)
+    print(f"✅ Exported {out}: kept {st['kept']}/{st['terms']} terms, {st['bytes'] / 1024:.1f} KiB, link={st['link']}")
+    if args.verify_csv:
+        import pandas as pd
+
+        texts = pd.read_csv(args.verify_csv)["raw_text"].astype(str).tolist()
+        v = verify(pipe, load_compact(out), texts)
+        print(
+            f"Verify on {v['n']} texts: label_agreement={v['label_agreement']:.4f}, "
+            f"max_abs_proba_diff={v['max_abs_proba_diff']:.2e}, mean_abs_proba_diff={v['mean_abs_proba_diff']:.2e}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+# ml/dashboard_cache.py
+# Read-through cache for customer dashboards: in-process TTL/LRU -> customer_dashboard_snapshot table -> loader.
+# Writers (write-back, ingest) invalidate the affected customer ids in their own transaction.
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from db import MySQL
+
+SNAPSHOT_COLUMNS = [
+    "customer_id", "full_name",
+    "text_id", "source_type", "ingested_at", "processed_at", "text_preview",
+    "risk_score_id", "risk_label", "risk_score", "scored_at", "model_version",
+    "policy_id", "product_type", "base_premium", "status",
+    "adjustment_pct", "suggested_premium", "decision_status", "adjustment_time",
+]
+
+Loader = Callable[[MySQL, int], Optional[Dict[str, Any]]]
+
+
+def invalidate_snapshots(db: MySQL, customer_ids: Iterable[int]):
+    """Drop shared snapshots for these customers (caller's transaction) and the local LRU entries."""
+    ids = sorted({int(c) for c in customer_ids})
+    if not ids:
+        return
+    default_dashboard_cache.forget(ids)
+    db.execute(
+        f"DELETE FROM customer_dashboard_snapshot WHERE customer_id IN ({','.join(['%s'] * len(ids))})",
+        tuple(ids),
+    )
+
+
+def invalidate_staged(db: MySQL, stage_table: str, customer_ids: Iterable[int]):
+    # set-based variant for write-back: one DELETE joined to the staged batch
+    default_dashboard_cache.forget(customer_ids)
+    db.execute(
+        f"""
+        DELETE ds FROM customer_dashboard_snapshot ds
+        JOIN (SELECT DISTINCT customer_id FROM {stage_table}) s ON s.customer_id = ds.customer_id
+        """
+    )
+
+
+class DashboardCache:
+    """
+    ttl_s bounds how long a process may serve an entry another process has invalidated;
+    snapshot_max_age_s bounds staleness from writers that do not invalidate (e.g. manual policy edits).
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_s: float = 30.0, use_snapshot_table: bool = True,
+                 snapshot_max_age_s: int = 3600):
+        self.max_entries = max(1, int(max_entries))
+        self.ttl_s = float(ttl_s)
+        self.use_snapshot_table = use_snapshot_table
+        self.snapshot_max_age_s = int(snapshot_max_age_s)
+        self._lru: "OrderedDict[int, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.lru_hits = 0
+        self.snapshot_hits = 0
+        self.misses = 0
+
+    def forget(self, customer_ids: Iterable[int]):
+        with self._lock:
+            for cid in customer_ids:
+                self._lru.pop(int(cid), None)
+
+    def _lru_get(self, cid: int) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            hit = self._lru.get(cid)
+            if hit is None:
+                return None
+            if hit[0] < time.monotonic():
+                del self._lru[cid]
+                return None
+            self._lru.move_to_end(cid)
+            return hit[1]
+
+    def _lru_put(self, cid: int, row: Dict[str, Any]):
+        if self.ttl_s <= 0:
+            return
+        with self._lock:
+            self._lru[cid] = (time.monotonic() + self.ttl_s, row)
+            self._lru.move_to_end(cid)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+
+    def _snapshot_get(self, db: MySQL, cid: int) -> Optional[Dict[str, Any]]:
+        rows = db.fetchall_dict(
+            f"""
+            SELECT {', '.join(SNAPSHOT_COLUMNS)}
+            FROM customer_dashboard_snapshot
+            WHERE customer_id = %s AND refreshed_at >= NOW() - INTERVAL %s SECOND
+            """,
+            (cid, self.snapshot_max_age_s),
+        )
+        return rows[0] if rows else None
+
+    def _snapshot_put(self, db: MySQL, row: Dict[str, Any]):
+        # Guarded upsert: only store the snapshot if the customer's latest score is still the one we loaded.
+        # INSERT ... SELECT reads the guard with a locking read, so a write-back that committed (or is
+        # committing) after our load cannot be overwritten by this older row.
+        cols = ", ".join(SNAPSHOT_COLUMNS)
+        updates = ", ".join(f"{c}=VALUES({c})" for c in SNAPSHOT_COLUMNS[1:])
+        db.execute(
+            f"""
+            INSERT INTO customer_dashboard_snapshot ({cols}, refreshed_at)
+            SELECT {', '.join(['%s'] * len(SNAPSHOT_COLUMNS))}, NOW()
+            FROM DUAL
+            WHERE (SELECT l.risk_score_id FROM customer_risk_score_latest l WHERE l.customer_id = %s) <=> %s
+            ON DUPLICATE KEY UPDATE {updates}, refreshed_at=NOW()
+            """,
+            (*(row.get(c) for c in SNAPSHOT_COLUMNS), int(row["customer_id"]), row.get("risk_score_id")),
+        )
+
+    def get(self, db: MySQL, customer_id: int, loader: Loader, write_db: Optional[MySQL] = None) -> Optional[Dict[str, Any]]:
+        """
+        Read-through: LRU, then snapshot row (PK lookup), then loader; a loader hit refreshes both tiers
+        (the snapshot write joins the caller's transaction; caller commits).
+        When `db` is a read replica, pass the primary as write_db: the guard there also rejects rows
+        loaded from a replica that has not yet applied the customer's latest score.
+        """
+        cid = int(customer_id)
+        row = self._lru_get(cid)
+        if row is not None:
+            self.lru_hits += 1
+            return row
+        if self.use_snapshot_table:
+            row = self._snapshot_get(db, cid)
+            if row is not None:
+                self.snapshot_hits += 1
+                self._lru_put(cid, row)
+                return row
+        self.misses += 1
+        row = loader(db, cid)
+        if row is None:
+            return None
+        if self.use_snapshot_table:
+            self._snapshot_put(write_db or db, row)
+        self._lru_put(cid, row)
+        return row
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.lru_hits + self.snapshot_hits + self.misses
+        return {
+            "lru_entries": len(self._lru),
+            "lru_hits": self.lru_hits,
+            "snapshot_hits": self.snapshot_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.lru_hits + self.snapshot_hits) / total, 4) if total else 0.0,
+        }
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).strip().lower() not in ("0", "false", "no", "off")
+
+
+default_dashboard_cache = DashboardCache(
+    max_entries=int(os.getenv("DASHBOARD_CACHE_SIZE", "10000")),
+    ttl_s=float(os.getenv("DASHBOARD_CACHE_TTL_S", "30")),
+    use_snapshot_table=_env_flag("DASHBOARD_SNAPSHOT", "1"),
+    snapshot_max_age_s=int(os.getenv("DASHBOARD_SNAPSHOT_MAX_AGE_S", "3600")),
+)
+
@@ -1,12 +1,19 @@
 # ml/db.py
+# Shared data-access layer for ml/ and app/ (app/db_connection.py re-exports it).
 from __future__ import annotations
 
+import atexit
 import os
-from dataclasses import dataclass
-from typing import Any, Iterable, Optional, Sequence, Tuple, List, Dict
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Sequence, Tuple, List
 
 import mysql.connector
 
+from metrics import default_metrics
+
 
 @dataclass
 class DBConfig:
@@ -15,6 +22,7 @@ class DBConfig:
     user: str
     password: str
     database: str
+    allow_local_infile: bool = False
 
     @staticmethod
     def from_env() -> "DBConfig":
@@ -24,28 +32,190 @@ class DBConfig:
             user=os.getenv("DB_USER", "root"),
             password=os.getenv("DB_PASSWORD", ""),
             database=os.getenv("DB_NAME", "insurance_ods"),
+            allow_local_infile=os.getenv("DB_ALLOW_LOCAL_INFILE", "0") == "1",
         )
 
+    @staticmethod
+    def read_from_env() -> Optional["DBConfig"]:
+        # read replica (DB_READ_HOST set); unset DB_READ_* values default to the primary's
+        host = os.getenv("DB_READ_HOST", "").strip()
+        if not host:
+            return None
+        primary = DBConfig.from_env()
+        return DBConfig(
+            host=host,
+            port=int(os.getenv("DB_READ_PORT", str(primary.port))),
+            user=os.getenv("DB_READ_USER", primary.user),
+            password=os.getenv("DB_READ_PASSWORD", primary.password),
+            database=os.getenv("DB_READ_NAME", primary.database),
+        )
 
-class MySQL:
-    def __init__(self, cfg: DBConfig):
+    def pool_key(self) -> Tuple[Any, ...]:
+        return (self.host, self.port, self.user, self.database, self.allow_local_infile)
+
+
+# ---------- Connection pool ----------
+
+@dataclass
+class _PooledConnection:
+    conn: Any
+    last_used: float = field(default_factory=time.monotonic)
+    # prepared cursors survive check-in, so hot statements are parsed once per physical connection
+    prepared: Dict[str, Any] = field(default_factory=dict)
+
+
+def _connect(cfg: DBConfig) -> _PooledConnection:
+    conn = mysql.connector.connect(
+        host=cfg.host,
+        port=cfg.port,
+        user=cfg.user,
+        password=cfg.password,
+        database=cfg.database,
+        autocommit=False,
+        allow_local_infile=cfg.allow_local_infile,
+    )
+    return _PooledConnection(conn)
+
+
+class ConnectionPool:
+    """
+    Small lazy pool of physical connections for one DBConfig.
+    Connections are opened on demand (up to pool_size kept idle), pinged before reuse
+    when they have been idle for ping_after_s, and rolled back on check-in.
+    """
+
+    def __init__(self, cfg: DBConfig, pool_size: int = 4, ping_after_s: float = 30.0):
         self.cfg = cfg
-        self.conn = mysql.connector.connect(
-            host=cfg.host,
-            port=cfg.port,
-            user=cfg.user,
-            password=cfg.password,
-            database=cfg.database,
-            autocommit=False,
-        )
+        self.pool_size = max(1, int(pool_size))
+        self.ping_after_s = float(ping_after_s)
+        self._idle: List[_PooledConnection] = []
+        self._lock = threading.Lock()
+        self.opened = 0
+        self.reused = 0
 
-    def close(self):
+    def _connect(self) -> _PooledConnection:
+        self.opened += 1
+        return _connect(self.cfg)
+
+    def acquire(self) -> _PooledConnection:
+        with self._lock:
+            pc = self._idle.pop() if self._idle else None
+        if pc is None:
+            return self._connect()
+        # health check: only connections idle long enough to have been dropped pay a ping
+        if time.monotonic() - pc.last_used >= self.ping_after_s:
+            try:
+                pc.conn.ping(reconnect=True, attempts=2, delay=0)
+                if not pc.conn.is_connected():
+                    raise mysql.connector.Error("connection lost")
+            except mysql.connector.Error:
+                _close_quietly(pc)
+                return self._connect()
+            # a reconnect drops server-side prepared statements; close the cursors before forgetting them
+            for cur in pc.prepared.values():
+                try:
+                    cur.close()
+                except Exception:
+                    pass
+            pc.prepared.clear()
+        self.reused += 1
+        return pc
+
+    def release(self, pc: _PooledConnection):
+        try:
+            pc.conn.rollback()
+        except Exception:
+            _close_quietly(pc)
+            return
+        pc.last_used = time.monotonic()
+        with self._lock:
+            if len(self._idle) < self.pool_size:
+                self._idle.append(pc)
+                return
+        _close_quietly(pc)
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for pc in idle:
+            _close_quietly(pc)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"pool_size": self.pool_size, "idle": len(self._idle), "opened": self.opened, "reused": self.reused}
+
+
+def _close_quietly(pc: _PooledConnection):
+    for cur in pc.prepared.values():
         try:
-            self.conn.close()
+            cur.close()
         except Exception:
             pass
+    pc.prepared.clear()
+    try:
+        pc.conn.close()
+    except Exception:
+        pass
+
+
+_POOLS: Dict[Tuple[Any, ...], ConnectionPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def get_pool(cfg: DBConfig) -> ConnectionPool:
+    # one pool per process and target (pools are not shared across fork/spawn)
+    key = cfg.pool_key()
+    with _POOLS_LOCK:
+        pool = _POOLS.get(key)
+        if pool is None:
+            pool = ConnectionPool(
+                cfg,
+                pool_size=int(os.getenv("DB_POOL_SIZE", "4")),
+                ping_after_s=float(os.getenv("DB_POOL_PING_AFTER_S", "30")),
+            )
+            _POOLS[key] = pool
+        return pool
+
+
+@atexit.register
+def close_all_pools():
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+    for pool in pools:
+        pool.close_all()
+
+
+# ---------- Connection wrapper ----------
+
+class MySQL:
+    def __init__(self, cfg: DBConfig, pooled: bool = True):
+        self.cfg = cfg
+        self._pool = get_pool(cfg) if pooled else None
+        self._pc = self._pool.acquire() if self._pool else _connect(cfg)
+        self.conn = self._pc.conn
+        self._after_commit: List[Callable[[], None]] = []
+        # buffered pipeline_event rows, written with one multi-row INSERT (see log_event)
+        self._events: List[Tuple[Any, ...]] = []
+        self._events_since = 0.0
+        self.event_buffer_size = max(1, int(os.getenv("EVENT_BUFFER_SIZE", "100")))
+        self.event_flush_interval_s = float(os.getenv("EVENT_FLUSH_INTERVAL_S", "5"))
+
+    def close(self):
+        if self._pc is None:
+            return
+        pc, self._pc = self._pc, None
+        if self._pool is not None:
+            self._pool.release(pc)
+        else:
+            _close_quietly(pc)
+
+    def ping(self) -> float:
+        # round-trip latency in ms; reconnects a dropped connection
+        t0 = time.perf_counter()
+        self.conn.ping(reconnect=True, attempts=2, delay=0)
+        return (time.perf_counter() - t0) * 1000.0
 
     def execute(self, sql: str, params: Optional[Sequence[Any]] = None) -> int:
+        default_metrics.inc("db_round_trips")
         cur = self.conn.cursor()
         cur.execute(sql, params or ())
         rowcount = cur.rowcount
@@ -53,6 +223,7 @@ class MySQL:
         return rowcount
 
     def executemany(self, sql: str, seq_params: Iterable[Sequence[Any]]) -> int:
+        default_metrics.inc("db_round_trips")
         cur = self.conn.cursor()
         cur.executemany(sql, list(seq_params))
         rowcount = cur.rowcount
@@ -60,6 +231,7 @@ class MySQL:
         return rowcount
 
     def fetchall(self, sql: str, params: Optional[Sequence[Any]] = None) -> List[Tuple[Any, ...]]:
+        default_metrics.inc("db_round_trips")
         cur = self.conn.cursor()
         cur.execute(sql, params or ())
         rows = cur.fetchall()
@@ -67,22 +239,58 @@ class MySQL:
         return rows
 
     def fetchall_dict(self, sql: str, params: Optional[Sequence[Any]] = None) -> List[Dict[str, Any]]:
+        default_metrics.inc("db_round_trips")
         cur = self.conn.cursor(dictionary=True)
         cur.execute(sql, params or ())
         rows = cur.fetchall()
         cur.close()
         return rows
 
+    def iter_rows(self, sql: str, params: Optional[Sequence[Any]] = None, chunk_size: int = 10000) -> Iterator[List[Tuple[Any, ...]]]:
+        # unbuffered cursor: rows stream from the server in chunks (consume fully before reusing the connection)
+        default_metrics.inc("db_round_trips")
+        cur = self.conn.cursor(buffered=False)
+        try:
+            cur.execute(sql, params or ())
+            while True:
+                rows = cur.fetchmany(chunk_size)
+                if not rows:
+                    break
+                yield rows
+        finally:
+            cur.close()
+
+    def fetchall_prepared(self, sql: str, params: Sequence[Any] = ()) -> List[Tuple[Any, ...]]:
+        # server-side prepared statement, cached per physical connection and reused across check-outs
+        cur = self._pc.prepared.get(sql)
+        if cur is None:
+            cur = self.conn.cursor(prepared=True)
+            self._pc.prepared[sql] = cur
+        default_metrics.inc("db_round_trips")
+        cur.execute(sql, tuple(params))
+        return cur.fetchall()
+
+    def after_commit(self, fn: Callable[[], None]):
+        # in-process side effects (e.g. cache updates) that must only happen if the transaction commits
+        self._after_commit.append(fn)
+
     def commit(self):
+        self.flush_events()
+        default_metrics.inc("db_round_trips")
         self.conn.commit()
+        hooks, self._after_commit = self._after_commit, []
+        for fn in hooks:
+            fn()
 
     def rollback(self):
+        self._after_commit = []
+        self._events = []
         self.conn.rollback()
 
     # ---------- Project-specific helpers ----------
 
     def get_active_model_id(self, model_name: str = "risk_classifier") -> Optional[int]:
-        rows = self.fetchall(
+        rows = self.fetchall_prepared(
             """
             SELECT model_id
             FROM ml_model_metadata
@@ -94,11 +302,125 @@ class MySQL:
         )
         return int(rows[0][0]) if rows else None
 
-    def log_event(self, event_type: str, entity_type: str = "SYSTEM", entity_id: Optional[int] = None, message: str = ""):
+    def get_model_artifact_path(self, model_id: int) -> Optional[str]:
+        rows = self.fetchall_prepared(
+            "SELECT artifact_path FROM ml_model_metadata WHERE model_id=%s",
+            (int(model_id),),
+        )
+        return rows[0][0] if rows else None
+
+    def log_event(
+        self,
+        event_type: str,
+        entity_type: str = "SYSTEM",
+        entity_id: Optional[int] = None,
+        message: str = "",
+        duration_ms: Optional[float] = None,
+        rows_in: Optional[int] = None,
+        rows_out: Optional[int] = None,
+        model_id: Optional[int] = None,
+        batch_id: Optional[str] = None,
+    ):
+        """
+        Buffer one pipeline_event row. The buffer is written (in the current transaction) when it reaches
+        EVENT_BUFFER_SIZE rows, when its oldest row is EVENT_FLUSH_INTERVAL_S old, and always before commit;
+        rollback discards it, like an unbuffered INSERT in the same transaction.
+        """
+        if not self._events:
+            self._events_since = time.monotonic()
+        self._events.append((
+            event_type, entity_type, entity_id, message[:2000],
+            None if duration_ms is None else round(float(duration_ms), 3),
+            rows_in, rows_out, model_id, batch_id,
+        ))
+        if (len(self._events) >= self.event_buffer_size
+                or time.monotonic() - self._events_since >= self.event_flush_interval_s):
+            self.flush_events()
+
+    def flush_events(self) -> int:
+        if not self._events:
+            return 0
+        events, self._events = self._events, []
+        values = ",".join(["(%s, %s, %s, %s, %s, %s, %s, %s, %s)"] * len(events))
         self.execute(
-            """
-            INSERT INTO pipeline_event(event_type, entity_type, entity_id, message)
-            VALUES (%s, %s, %s, %s)
+            f"""
+            INSERT INTO pipeline_event
+              (event_type, entity_type, entity_id, message, duration_ms, rows_in, rows_out, model_id, batch_id)
+            VALUES {values}
             """,
-            (event_type, entity_type, entity_id, message[:2000]),
+            tuple(v for e in events for v in e),
         )
+        return len(events)
+
+
+def new_batch_id() -> str:
+    # correlates the events of one batch across stages and processes
+    return uuid.uuid4().hex[:16]
+
+
+# ---------- Read/write splitting ----------
+
+def replica_lag_s(db: MySQL) -> Optional[float]:
+    """
+    Seconds_Behind_Source of the connected server (worst channel); None if it is not a replica.
+    Stopped replication (NULL) or a status we cannot read counts as infinitely behind.
+    """
+    for stmt, col in (("SHOW REPLICA STATUS", "Seconds_Behind_Source"), ("SHOW SLAVE STATUS", "Seconds_Behind_Master")):
+        try:
+            rows = db.fetchall_dict(stmt)
+        except mysql.connector.Error:
+            continue  # pre-8.0.22 syntax or missing REPLICATION CLIENT privilege
+        if not rows:
+            return None
+        lags = [r.get(col) for r in rows]
+        return float("inf") if any(v is None for v in lags) else float(max(lags))
+    return float("inf")
+
+
+def connect_for_read(max_lag_s: Optional[float] = None) -> Tuple[MySQL, str]:
+    """
+    Connection for read-only work and where it points ("primary", "replica" or the fallback reason).
+    Uses the DB_READ_* replica when configured, reachable and, if max_lag_s > 0 (default
+    DB_READ_MAX_LAG_S), no further behind than that; otherwise the primary. Replica sessions are
+    READ ONLY, so writes that slip onto them fail instead of diverging from the primary.
+    """
+    primary = DBConfig.from_env()
+    replica = DBConfig.read_from_env()
+    if replica is None or replica.pool_key() == primary.pool_key():
+        return MySQL(primary), "primary"
+    if max_lag_s is None:
+        max_lag_s = float(os.getenv("DB_READ_MAX_LAG_S", "0"))
+    try:
+        db = MySQL(replica)
+    except mysql.connector.Error as e:
+        return MySQL(primary), f"primary (replica unreachable: {e})"
+    if max_lag_s and max_lag_s > 0:
+        lag = replica_lag_s(db)
+        if lag is not None and lag > max_lag_s:
+            db.close()
+            behind = "replication stopped or unreadable" if lag == float("inf") else f"lag {lag:g}s"
+            return MySQL(primary), f"primary (replica {behind} > {max_lag_s:g}s)"
+    db.execute("SET SESSION TRANSACTION READ ONLY")
+    return db, "replica"
+
+
+def health_check(cfg: DBConfig) -> Dict[str, Any]:
+    # ok=False with the driver's message instead of a traceback when the server can't be reached
+    target = {"host": cfg.host, "port": cfg.port, "database": cfg.database}
+    db = None
+    try:
+        db = MySQL(cfg)
+        latency_ms = db.ping()
+        version = db.fetchall("SELECT VERSION()")[0][0]
+        return {
+            "ok": True,
+            **target,
+            "server_version": version,
+            "ping_ms": round(latency_ms, 3),
+            **get_pool(cfg).stats(),
+        }
+    except mysql.connector.Error as e:
+        return {"ok": False, **target, "error": str(e)}
+    finally:
+        if db is not None:
+            db.close()
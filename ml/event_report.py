@@ -0,0 +1,79 @@
+# ml/event_report.py
+# Per-stage latency/throughput trends from the structured pipeline_event fields.
+from __future__ import annotations
+
+import argparse
+from typing import Any, Dict, List, Optional
+
+from db import DBConfig, MySQL
+
+BUCKET_FORMATS = {
+    "hour": "%Y-%m-%d %H:00",
+    "day": "%Y-%m-%d",
+}
+
+
+def stage_latency(db: MySQL, days: int = 7, bucket: str = "day", event_type: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    One row per (event_type, time bucket) over events that carry duration_ms:
+    count, rows_out, avg/p50/p95/max duration and rows_out per second of stage time.
+    Percentiles come from CUME_DIST within each group (served by ix_pipeline_event_time_type).
+    """
+    fmt = BUCKET_FORMATS[bucket]
+    where = ["event_time >= NOW() - INTERVAL %s DAY", "duration_ms IS NOT NULL"]
+    params: List[Any] = [fmt, fmt, int(days)]
+    if event_type:
+        where.append("event_type = %s")
+        params.append(event_type)
+    return db.fetchall_dict(
+        f"""
+        SELECT event_type, bucket,
+               COUNT(*) AS events,
+               SUM(rows_out) AS rows_out,
+               ROUND(AVG(duration_ms), 1) AS avg_ms,
+               MIN(CASE WHEN cd >= 0.5 THEN duration_ms END) AS p50_ms,
+               MIN(CASE WHEN cd >= 0.95 THEN duration_ms END) AS p95_ms,
+               MAX(duration_ms) AS max_ms,
+               ROUND(SUM(rows_out) / NULLIF(SUM(duration_ms) / 1000, 0), 1) AS rows_per_s
+        FROM (
+          SELECT event_type, DATE_FORMAT(event_time, %s) AS bucket, duration_ms, rows_out,
+                 CUME_DIST() OVER (PARTITION BY event_type, DATE_FORMAT(event_time, %s) ORDER BY duration_ms) AS cd
+          FROM pipeline_event
+          WHERE {' AND '.join(where)}
+        ) e
+        GROUP BY event_type, bucket
+        ORDER BY event_type, bucket
+        """,
+        tuple(params),
+    )
+
+
+def print_report(rows: List[Dict[str, Any]]):
+    if not rows:
+        print("No timed pipeline events in this window.")
+        return
+    print(f"{'stage':<16} {'bucket':<17} {'events':>7} {'rows':>9} {'avg_ms':>9} {'p50_ms':>9} {'p95_ms':>9} {'max_ms':>9} {'rows/s':>9}")
+    for r in rows:
+        print(
+            f"{r['event_type']:<16} {r['bucket']:<17} {r['events']:>7} {int(r['rows_out'] or 0):>9} "
+            f"{float(r['avg_ms'] or 0):>9.1f} {float(r['p50_ms'] or 0):>9.1f} {float(r['p95_ms'] or 0):>9.1f} "
+            f"{float(r['max_ms'] or 0):>9.1f} {float(r['rows_per_s'] or 0):>9.1f}"
+        )
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--days", type=int, default=7)
+    ap.add_argument("--bucket", choices=list(BUCKET_FORMATS), default="day")
+    ap.add_argument("--event_type", default=None, help="Only this stage, e.g. INFER")
+    args = ap.parse_args()
+
+    db = MySQL(DBConfig.from_env())
+    try:
+        print_report(stage_latency(db, args.days, args.bucket, args.event_type))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# ml/incremental_training.py
+# Out-of-core training: stateless hashing features + partial_fit linear classifier.
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Any, Iterator, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import HashingVectorizer
+from sklearn.linear_model import SGDClassifier
+from sklearn.metrics import f1_score
+from sklearn.pipeline import Pipeline
+
+from db import MySQL
+from model_cache import default_cache
+from risk_model_training import LABELS, TrainResult, register_model, save_artifact
+from text_prep import normalize_text
+
+ALGORITHM = "HASH+SGD"
+CLASSES = np.array(sorted(LABELS), dtype=object)
+
+
+def build_incremental_pipeline(n_features: int = 2 ** 20) -> Pipeline:
+    return Pipeline(
+        steps=[
+            ("hash", HashingVectorizer(
+                preprocessor=normalize_text,
+                ngram_range=(1, 2),
+                n_features=n_features,
+                alternate_sign=False,
+                norm="l2",
+            )),
+            ("clf", SGDClassifier(
+                loss="log_loss",  # keeps predict_proba for risk_score
+                alpha=1e-5,
+                random_state=42,
+            )),
+        ]
+    )
+
+
+def _clean_chunk(df: pd.DataFrame) -> Tuple[pd.Series, pd.Series]:
+    if "raw_text" not in df.columns or "label" not in df.columns:
+        raise ValueError("Training data must have columns: raw_text,label")
+    labels = df["label"].astype(str).str.upper()
+    bad = sorted(set(labels[~labels.isin(LABELS)]))
+    if bad:
+        raise ValueError(f"Invalid labels found: {bad}. Allowed: {sorted(LABELS)}")
+    return df["raw_text"].astype(str), labels
+
+
+def iter_csv_chunks(train_csv: str, chunksize: int) -> Iterator[Tuple[pd.Series, pd.Series]]:
+    for df in pd.read_csv(train_csv, chunksize=chunksize):
+        yield _clean_chunk(df)
+
+
+def iter_db_chunks(db: MySQL, train_query: str, chunksize: int) -> Iterator[Tuple[pd.Series, pd.Series]]:
+    # the query must return (raw_text, label) columns, e.g. from a labeled review table
+    for rows in db.iter_rows(train_query, chunk_size=chunksize):
+        yield _clean_chunk(pd.DataFrame(rows, columns=["raw_text", "label"]))
+
+
+def _warm_start_pipeline(db: MySQL, model_name: str) -> Tuple[Optional[Pipeline], Optional[int]]:
+    # continue from the active artifact when it is an incremental (hashing + partial_fit) pipeline
+    model_id = db.get_active_model_id(model_name)
+    if model_id is None:
+        return None, None
+    path = db.get_model_artifact_path(model_id)
+    if not path or not Path(path).exists():
+        return None, None
+    # mmap_mode=None: partial_fit updates coef_ in place, so the arrays must be writable
+    import joblib
+
+    prev: Any = joblib.load(path)
+    steps = dict(getattr(prev, "steps", []))
+    if isinstance(steps.get("hash"), HashingVectorizer) and hasattr(steps.get("clf"), "partial_fit"):
+        return prev, model_id
+    return None, None
+
+
+def train_incremental(
+    db: MySQL,
+    train_csv: str = "",
+    train_query: str = "",
+    model_name: str = "risk_classifier",
+    artifacts_dir: str = "artifacts",
+    activate: bool = False,
+    chunksize: int = 50000,
+    warm_start: bool = True,
+) -> TrainResult:
+    """
+    Stream labeled chunks into partial_fit (memory bounded by chunksize, not dataset size).
+    The reported F1 is progressive validation: each chunk is scored before the model learns from it.
+    """
+    pipe, parent_id = _warm_start_pipeline(db, model_name) if warm_start else (None, None)
+    if pipe is None:
+        pipe = build_incremental_pipeline()
+    vec, clf = pipe.named_steps["hash"], pipe.named_steps["clf"]
+    fitted = parent_id is not None
+
+    chunks = iter_db_chunks(db, train_query, chunksize) if train_query else iter_csv_chunks(train_csv, chunksize)
+    rows = 0
+    y_true, y_pred = [], []
+    for X_raw, y in chunks:
+        X = vec.transform(X_raw)
+        if fitted:
+            y_true.append(y.to_numpy())
+            y_pred.append(clf.predict(X))
+        clf.partial_fit(X, y.to_numpy(), classes=CLASSES)
+        fitted = True
+        rows += len(y)
+        print(f"[incremental] rows={rows}")
+    if rows == 0:
+        raise ValueError("No training rows found")
+
+    # progressive-validation macro-F1 (0 when a single chunk without warm start leaves nothing held out)
+    f1 = float(f1_score(np.concatenate(y_true), np.concatenate(y_pred), average="macro")) if y_true else 0.0
+
+    version, artifact_path = save_artifact(pipe, artifacts_dir, model_name)
+    source = "query" if train_query else f"CSV={os.path.basename(train_csv)}"
+    model_id = register_model(
+        db,
+        model_name,
+        version,
+        ALGORITHM,
+        f1,
+        activate,
+        artifact_path,
+        f"Incremental from {source}; rows={rows}; warm_start_model_id={parent_id}",
+    )
+    default_cache.put(model_id, artifact_path, pipe)
+    return TrainResult(model_id, model_name, version, artifact_path, f1, activate, pipe)
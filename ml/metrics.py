@@ -0,0 +1,168 @@
+# ml/metrics.py
+# Process-wide stage timings and counters for the inference pipeline, exported as JSON or as a
+# Prometheus textfile (node_exporter textfile collector), plus opt-in cProfile/tracemalloc capture.
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+
+
+class Metrics:
+    """
+    span(name) accumulates calls / total / max seconds per stage (spans nest, times are inclusive);
+    inc(name, n) adds to a counter. Cheap enough to stay on for every batch.
+    """
+
+    def __init__(self, namespace: str = "risk_pipeline"):
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self.spans: Dict[str, Dict[str, float]] = {}
+        self.counters: Dict[str, float] = {}
+        self.started_at = time.time()
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            dt = time.perf_counter() - t0
+            with self._lock:
+                s = self.spans.get(name)
+                if s is None:
+                    s = self.spans[name] = {"calls": 0, "total_s": 0.0, "max_s": 0.0}
+                s["calls"] += 1
+                s["total_s"] += dt
+                s["max_s"] = max(s["max_s"], dt)
+
+    def inc(self, name: str, n: float = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def merge(self, snap: Dict[str, Any]):
+        # fold in a snapshot from another process (e.g. a scoring worker)
+        with self._lock:
+            for name, s in snap.get("spans", {}).items():
+                mine = self.spans.setdefault(name, {"calls": 0, "total_s": 0.0, "max_s": 0.0})
+                mine["calls"] += s["calls"]
+                mine["total_s"] += s["total_s"]
+                mine["max_s"] = max(mine["max_s"], s["max_s"])
+            for name, v in snap.get("counters", {}).items():
+                self.counters[name] = self.counters.get(name, 0) + v
+
+    def reset(self):
+        with self._lock:
+            self.spans.clear()
+            self.counters.clear()
+            self.started_at = time.time()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "started_at": self.started_at,
+                "elapsed_s": round(time.time() - self.started_at, 3),
+                "spans": {
+                    k: {"calls": int(v["calls"]), "total_s": round(v["total_s"], 6), "max_s": round(v["max_s"], 6)}
+                    for k, v in self.spans.items()
+                },
+                "counters": dict(self.counters),
+            }
+
+    def report(self) -> str:
+        snap = self.snapshot()
+        lines = [f"{'stage':<22} {'calls':>7} {'total_s':>10} {'avg_ms':>9} {'max_ms':>9}"]
+        for name, s in sorted(snap["spans"].items(), key=lambda kv: -kv[1]["total_s"]):
+            avg_ms = 1000.0 * s["total_s"] / s["calls"] if s["calls"] else 0.0
+            lines.append(f"{name:<22} {s['calls']:>7} {s['total_s']:>10.3f} {avg_ms:>9.2f} {1000.0 * s['max_s']:>9.2f}")
+        if snap["counters"]:
+            lines.append("counters: " + ", ".join(f"{k}={int(v)}" for k, v in sorted(snap["counters"].items())))
+        return "\n".join(lines)
+
+    def write_json(self, path: str, extra: Optional[Dict[str, Any]] = None):
+        _write_atomic(path, json.dumps({**self.snapshot(), **(extra or {})}, indent=2, default=str))
+
+    def to_prometheus(self, labels: Optional[Dict[str, str]] = None) -> str:
+        snap = self.snapshot()
+        ns = self.namespace
+        base = dict(labels or {})
+
+        def fmt(extra: Dict[str, str]) -> str:
+            items = {**base, **extra}
+            if not items:
+                return ""
+            return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in items.items()) + "}"
+
+        out = [
+            f"# HELP {ns}_stage_seconds_total Wall time spent in each pipeline stage (inclusive of nested stages).",
+            f"# TYPE {ns}_stage_seconds_total counter",
+        ]
+        out += [f"{ns}_stage_seconds_total{fmt({'stage': k})} {v['total_s']:.6f}" for k, v in sorted(snap["spans"].items())]
+        out += [f"# HELP {ns}_stage_calls_total Number of times each stage ran.", f"# TYPE {ns}_stage_calls_total counter"]
+        out += [f"{ns}_stage_calls_total{fmt({'stage': k})} {v['calls']}" for k, v in sorted(snap["spans"].items())]
+        out += [f"# HELP {ns}_stage_max_seconds Slowest single run of each stage.", f"# TYPE {ns}_stage_max_seconds gauge"]
+        out += [f"{ns}_stage_max_seconds{fmt({'stage': k})} {v['max_s']:.6f}" for k, v in sorted(snap["spans"].items())]
+        for name, v in sorted(snap["counters"].items()):
+            out += [f"# TYPE {ns}_{name}_total counter", f"{ns}_{name}_total{fmt({})} {v:g}"]
+        out += [
+            f"# TYPE {ns}_last_run_timestamp_seconds gauge",
+            f"{ns}_last_run_timestamp_seconds{fmt({})} {time.time():.0f}",
+        ]
+        return "\n".join(out) + "\n"
+
+    def write_prometheus(self, path: str, labels: Optional[Dict[str, str]] = None):
+        # the textfile collector may read at any time: write a temp file and rename over the target
+        _write_atomic(path, self.to_prometheus(labels))
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _write_atomic(path: str, text: str):
+    p = Path(path)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    tmp = p.with_name(f".{p.name}.{os.getpid()}.tmp")
+    tmp.write_text(text, encoding="utf-8")
+    os.replace(tmp, p)
+
+
+@contextmanager
+def profiled(out_dir: str, name: str, top: int = 40) -> Iterator[None]:
+    """
+    cProfile + tracemalloc around a block. Writes <name>_<ts>.prof (load with pstats/snakeviz) and
+    <name>_<ts>.txt (top functions by cumulative time, top allocation sites, peak traced memory).
+    """
+    import cProfile
+    import io
+    import pstats
+    import tracemalloc
+
+    out = Path(out_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    stem = out / f"{name}_{time.strftime('%Y%m%d%H%M%S')}"
+    prof = cProfile.Profile()
+    tracemalloc.start(25)
+    prof.enable()
+    try:
+        yield
+    finally:
+        prof.disable()
+        snap = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        prof.dump_stats(str(stem.with_suffix(".prof")))
+        buf = io.StringIO()
+        pstats.Stats(prof, stream=buf).sort_stats("cumulative").print_stats(top)
+        lines = [f"traced memory: current={current / 1e6:.1f}MB peak={peak / 1e6:.1f}MB", "", "top allocation sites:"]
+        lines += [str(s) for s in snap.statistics("lineno")[:top]]
+        stem.with_suffix(".txt").write_text(buf.getvalue() + "\n" + "\n".join(lines) + "\n", encoding="utf-8")
+        print(f"✅ Profile written to {stem}.prof / {stem}.txt (peak traced memory {peak / 1e6:.1f}MB)")
+
+
+default_metrics = Metrics()
@@ -0,0 +1,145 @@
+# ml/model_cache.py
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+CacheKey = Tuple[int, str, int, int]
+
+
+def current_rss_mb() -> float:
+    # Current resident set size; /proc is exact on Linux, ru_maxrss (peak) is the fallback elsewhere,
+    # 0.0 where neither exists (Windows)
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024.0
+    except OSError:
+        pass
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024.0 * 1024.0) if sys.platform == "darwin" else peak / 1024.0
+
+
+def artifact_key(model_id: int, artifact_path: str) -> CacheKey:
+    # model_id + file identity: a re-written artifact under the same path gets a new key
+    p = Path(artifact_path).resolve()
+    st = p.stat()
+    return (int(model_id), str(p), int(st.st_mtime_ns), int(st.st_size))
+
+
+class ModelCache:
+    """
+    Bounded LRU of loaded model artifacts keyed by (model_id, path, mtime, size).
+    Artifacts are loaded with joblib mmap_mode so the NumPy arrays inside them
+    (IDF weights, coefficients) are backed by the page cache and shared between
+    worker processes on the same host instead of copied into each heap.
+    """
+
+    def __init__(self, max_models: int = 2, mmap_mode: Optional[str] = "r"):
+        self.max_models = max(1, int(max_models))
+        self.mmap_mode = mmap_mode
+        self._models: "OrderedDict[CacheKey, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.last_load_s = 0.0
+        self.last_rss_delta_mb = 0.0
+
+    def get(self, model_id: int, artifact_path: str) -> Any:
+        key = artifact_key(model_id, artifact_path)
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                self.hits += 1
+                return self._models[key]
+            self.misses += 1
+
+        rss0 = current_rss_mb()
+        t0 = time.perf_counter()
+        if str(artifact_path).endswith(".npz"):
+            # compact NumPy-only export: no sklearn/joblib import on this path
+            from compact_model import load_compact
+
+            model = load_compact(artifact_path)
+        else:
+            import joblib
+
+            model = joblib.load(artifact_path, mmap_mode=self.mmap_mode)
+        self.last_load_s = time.perf_counter() - t0
+        self.last_rss_delta_mb = current_rss_mb() - rss0
+        self._store(key, model)
+        return model
+
+    def put(self, model_id: int, artifact_path: str, model: Any):
+        # e.g. a freshly trained pipeline that is already in memory
+        self._store(artifact_key(model_id, artifact_path), model)
+
+    def _store(self, key: CacheKey, model: Any):
+        with self._lock:
+            # drop stale entries for the same model_id (artifact rewritten)
+            for k in [k for k in self._models if k[0] == key[0] and k != key]:
+                del self._models[k]
+            self._models[key] = model
+            self._models.move_to_end(key)
+            while len(self._models) > self.max_models:
+                self._models.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._models.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "cached_models": len(self._models),
+            "hits": self.hits,
+            "misses": self.misses,
+            "last_load_s": round(self.last_load_s, 4),
+            "last_rss_delta_mb": round(self.last_rss_delta_mb, 2),
+            "mmap_mode": self.mmap_mode,
+        }
+
+
+_mmap_env = os.getenv("MODEL_MMAP_MODE", "r").strip()
+default_cache = ModelCache(
+    max_models=int(os.getenv("MODEL_CACHE_SIZE", "2")),
+    mmap_mode=None if _mmap_env.lower() in ("", "none") else _mmap_env,
+)
+
+
+def main():
+    # Measure cold-start time and RSS for one artifact, with and without mmap
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--artifact", required=True, help="Path to a .joblib artifact")
+    ap.add_argument("--mmap_mode", default="r", help="joblib mmap_mode ('r', 'c', or 'none' for a full in-heap load)")
+    args = ap.parse_args()
+
+    mmap_mode = None if args.mmap_mode.lower() == "none" else args.mmap_mode
+    cache = ModelCache(max_models=1, mmap_mode=mmap_mode)
+    rss_before = current_rss_mb()
+    cache.get(0, args.artifact)
+    t0 = time.perf_counter()
+    cache.get(0, args.artifact)
+    warm_s = time.perf_counter() - t0
+
+    st = cache.stats()
+    print(f"artifact={args.artifact} mmap_mode={mmap_mode}")
+    print(f"cold_load_s={st['last_load_s']:.4f} warm_get_s={warm_s:.6f}")
+    print(f"rss_before_mb={rss_before:.1f} rss_after_mb={current_rss_mb():.1f} load_rss_delta_mb={st['last_rss_delta_mb']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+# ml/model_search.py
+# Cross-validated hyperparameter search over build_pipeline() settings, in parallel, under a wall-clock budget.
+from __future__ import annotations
+
+import itertools
+import json
+import multiprocessing as mp
+import os
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from joblib import Memory
+from sklearn.metrics import f1_score
+from sklearn.model_selection import StratifiedKFold
+
+from db import MySQL
+from model_cache import default_cache
+from risk_model_training import TrainResult, build_pipeline, load_training_data, register_model, save_artifact
+
+ALGORITHM = "TFIDF+LogReg"
+METRIC_NAME = "F1_MACRO_CV"
+
+DEFAULT_GRID: Dict[str, List[Any]] = {
+    "ngram_range": [(1, 1), (1, 2)],
+    "max_features": [5000, 20000],
+    "C": [0.5, 1.0, 4.0],
+}
+
+# per-worker state, set once by _init_worker so tasks only ship fold indices
+_X: Optional[np.ndarray] = None
+_Y: Optional[np.ndarray] = None
+_MEMORY: Optional[Memory] = None
+
+
+def candidate_params(grid: Dict[str, Sequence[Any]]) -> List[Dict[str, Any]]:
+    # vectorizer settings vary slowest, so candidates that differ only in C run back to back
+    # and reuse the cached TF-IDF fit of each fold
+    keys = ["ngram_range", "max_features", "C"]
+    return [dict(zip(keys, combo)) for combo in itertools.product(*(grid[k] for k in keys))]
+
+
+def _init_worker(texts: List[str], labels: List[str], cache_dir: str):
+    global _X, _Y, _MEMORY
+    _X = np.asarray(texts, dtype=object)
+    _Y = np.asarray(labels, dtype=object)
+    _MEMORY = Memory(cache_dir, verbose=0)
+
+
+def _vectorizer_key(params: Dict[str, Any]) -> str:
+    # candidates with equal vectorizer settings share one cached TF-IDF fit per fold
+    return json.dumps([params["ngram_range"], params["max_features"]])
+
+
+def _terminate(ex: ProcessPoolExecutor):
+    # hard stop for the budget: kill fits that are still running instead of waiting for them
+    stop = getattr(ex, "terminate_workers", None)  # Python 3.14+
+    if stop is not None:
+        stop()
+        return
+    for p in list((getattr(ex, "_processes", None) or {}).values()):
+        if p.is_alive():
+            p.terminate()
+
+
+def _fit_fold(cand: int, fold: int, params: Dict[str, Any], train_idx: np.ndarray, test_idx: np.ndarray) -> Tuple[int, int, float, float]:
+    t0 = time.perf_counter()
+    pipe = build_pipeline(memory=_MEMORY, **params)
+    pipe.fit(_X[train_idx], _Y[train_idx])
+    pred = pipe.predict(_X[test_idx])
+    f1 = float(f1_score(_Y[test_idx], pred, average="macro"))
+    return cand, fold, f1, time.perf_counter() - t0
+
+
+def search(
+    texts: List[str],
+    labels: List[str],
+    grid: Dict[str, Sequence[Any]],
+    cv_folds: int = 5,
+    n_jobs: int = 0,
+    max_seconds: float = 300.0,
+    cache_dir: str = "",
+) -> Dict[str, Any]:
+    """
+    Evaluate every candidate on the same stratified folds in a process pool.
+    Per fold, the first candidate of each vectorizer setting builds the cached TF-IDF fit; the others
+    are submitted only after it finishes, so parallel workers never build the same cache entry twice.
+    max_seconds is a hard wall-clock cutoff: when it passes, queued fits are cancelled, running ones are
+    terminated, and only candidates with all folds finished are ranked.
+    """
+    counts = np.unique(np.asarray(labels, dtype=object), return_counts=True)[1]
+    folds = min(int(cv_folds), int(counts.min()))
+    if folds < 2:
+        raise ValueError("Stratified CV needs at least 2 examples of every label")
+    splits = list(StratifiedKFold(n_splits=folds, shuffle=True, random_state=42).split(texts, labels))
+    cands = candidate_params(grid)
+    n_jobs = n_jobs if n_jobs > 0 else (os.cpu_count() or 1)
+
+    tmp = None
+    if not cache_dir:
+        tmp = tempfile.TemporaryDirectory(prefix="tfidf_cache_")
+        cache_dir = tmp.name
+
+    scores: Dict[int, Dict[int, float]] = {i: {} for i in range(len(cands))}
+    fit_s = 0.0
+    timed_out = False
+    start = time.perf_counter()
+    ex = ProcessPoolExecutor(
+        max_workers=n_jobs,
+        mp_context=mp.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(list(texts), list(labels), cache_dir),
+    )
+    try:
+        # (vectorizer, fold) -> candidates waiting for the cache-building fit of that fold
+        waiting: Dict[Tuple[str, int], List[int]] = {}
+        pending = set()
+        for ci, params in enumerate(cands):
+            for fi, (tr, te) in enumerate(splits):
+                key = (_vectorizer_key(params), fi)
+                if key in waiting:
+                    waiting[key].append(ci)
+                else:
+                    waiting[key] = []
+                    pending.add(ex.submit(_fit_fold, ci, fi, params, tr, te))
+        while pending:
+            remaining = max_seconds - (time.perf_counter() - start) if max_seconds > 0 else None
+            if remaining is not None and remaining <= 0:
+                timed_out = True
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for fut in done:
+                ci, fi, f1, secs = fut.result()
+                scores[ci][fi] = f1
+                fit_s += secs
+                tr, te = splits[fi]
+                for cj in waiting.pop((_vectorizer_key(cands[ci]), fi), []):
+                    pending.add(ex.submit(_fit_fold, cj, fi, cands[cj], tr, te))
+    finally:
+        if timed_out:
+            _terminate(ex)
+        ex.shutdown(wait=True, cancel_futures=True)
+        if tmp is not None:
+            tmp.cleanup()
+
+    ranked = []
+    for ci, per_fold in scores.items():
+        if len(per_fold) == folds:
+            vals = [per_fold[f] for f in range(folds)]
+            ranked.append({"params": cands[ci], "mean_f1": float(np.mean(vals)), "std_f1": float(np.std(vals))})
+    if not ranked:
+        raise TimeoutError(f"No candidate finished all {folds} folds within {max_seconds}s; raise --max_seconds")
+    ranked.sort(key=lambda r: r["mean_f1"], reverse=True)
+    return {
+        "best": ranked[0],
+        "ranked": ranked,
+        "folds": folds,
+        "candidates": len(cands),
+        "completed": len(ranked),
+        "timed_out": timed_out,
+        "elapsed_s": round(time.perf_counter() - start, 3),
+        "fit_s": round(fit_s, 3),
+        "n_jobs": n_jobs,
+    }
+
+
+def train_cv(
+    db: MySQL,
+    train_csv: str,
+    model_name: str = "risk_classifier",
+    artifacts_dir: str = "artifacts",
+    activate: bool = False,
+    grid: Optional[Dict[str, Sequence[Any]]] = None,
+    cv_folds: int = 5,
+    n_jobs: int = 0,
+    max_seconds: float = 300.0,
+    cache_dir: str = "",
+) -> TrainResult:
+    """Search, refit the best candidate on all rows, save and register it with its CV macro-F1 (caller commits)."""
+    X, y = load_training_data(train_csv)
+    res = search(X.tolist(), y.tolist(), grid or DEFAULT_GRID, cv_folds, n_jobs, max_seconds, cache_dir)
+    best = res["best"]
+    for r in res["ranked"][:5]:
+        print(f"[cv] f1={r['mean_f1']:.4f}±{r['std_f1']:.4f} params={r['params']}")
+    print(
+        f"[cv] {res['completed']}/{res['candidates']} candidates x {res['folds']} folds in {res['elapsed_s']}s "
+        f"(n_jobs={res['n_jobs']}, timed_out={res['timed_out']})"
+    )
+
+    # final refit without the feature cache, so the artifact does not point at a cache directory
+    pipe = build_pipeline(**best["params"])
+    pipe.fit(X, y)
+    f1 = best["mean_f1"]
+    version, artifact_path = save_artifact(pipe, artifacts_dir, model_name)
+    notes = json.dumps({
+        "csv": os.path.basename(train_csv),
+        "params": best["params"],
+        "cv_folds": res["folds"],
+        "f1_std": round(best["std_f1"], 6),
+        "candidates": f"{res['completed']}/{res['candidates']}",
+        "timed_out": res["timed_out"],
+    })
+    model_id = register_model(
+        db, model_name, version, ALGORITHM, f1, activate, artifact_path, notes[:1000], metric_name=METRIC_NAME
+    )
+    default_cache.put(model_id, artifact_path, pipe)
+    return TrainResult(model_id, model_name, version, artifact_path, f1, activate, pipe)
@@ -0,0 +1,142 @@
+# ml/pipeline.py
+from __future__ import annotations
+
+import argparse
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+
+from db import DBConfig, MySQL, new_batch_id
+from model_cache import default_cache
+from prediction_cache import default_pred_cache
+from rescore import rescore_window
+from retrain_trigger import check_retrain
+from risk_model_inference import load_active_model, run_inference
+
+
+@contextmanager
+def _stage(timings: Dict[str, float], name: str) -> Iterator[None]:
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[name] = round(time.perf_counter() - t0, 4)
+
+
+def run_pipeline(
+    db: MySQL,
+    train_csv: str = "",
+    threshold_new_texts: int = 20,
+    batch_size: int = 50,
+    rescore_recent_days: int = 0,
+    model_name: str = "risk_classifier",
+    artifacts_dir: str = "artifacts",
+) -> Dict[str, Any]:
+    """
+    In-process orchestration on one connection:
+    1) optional retrain trigger + training (if train_csv provided)
+    2) inference on unprocessed texts
+    3) optional checkpointed rescore of recent texts the active model has not scored yet
+    A freshly trained and activated model is scored straight from memory (no artifact reload).
+    """
+    timings: Dict[str, float] = {}
+    model_id: Optional[int] = None
+    artifact_path = ""
+    model: Any = None
+    retrained = False
+
+    if train_csv.strip():
+        with _stage(timings, "retrain_trigger"):
+            triggered, _ = check_retrain(db, threshold_new_texts, model_name)
+            db.commit()
+        if triggered:
+            # imported here so runs without retraining skip pandas/sklearn imports
+            from risk_model_training import train_model
+
+            with _stage(timings, "train"):
+                res = train_model(db, train_csv.strip(), model_name, artifacts_dir, activate=True)
+                db.commit()
+            model_id, artifact_path, model = res.model_id, res.artifact_path, res.pipeline
+            default_cache.put(model_id, artifact_path, model)
+            retrained = True
+            print(f"✅ Retrain finished. model_id={model_id} version={res.version}")
+    else:
+        print("Skipping retrain trigger (no --train_csv provided).")
+
+    if model is None:
+        with _stage(timings, "load_model"):
+            model_id, artifact_path, model = load_active_model(db, model_name)
+
+    # Always score new/unprocessed texts
+    with _stage(timings, "infer"):
+        scored = run_inference(db, model_id, artifact_path, model, batch_size)
+
+    # Optionally rescore recent window to refresh scores with the active model
+    rescored = 0
+    if rescore_recent_days and rescore_recent_days > 0:
+        with _stage(timings, "rescore"):
+            st = rescore_window(db, model_id, artifact_path, model, rescore_recent_days, batch_size)
+            rescored = st["texts_scored"]
+        print(f"✅ Rescore completed ({st['rows_done']}/{st['rows_todo']} texts in window on model_id={model_id}).")
+
+    total = round(sum(timings.values()), 4)
+    stage_msg = ", ".join(f"{k}={v:.3f}s" for k, v in timings.items())
+    # one timed event per stage, correlated by the run's batch_id (see ml/event_report.py)
+    run_id = new_batch_id()
+    for name, secs in timings.items():
+        db.log_event(f"PIPELINE_{name.upper()}", "SYSTEM", None, f"Pipeline stage {name}",
+                     duration_ms=secs * 1000.0, model_id=model_id, batch_id=run_id)
+    db.log_event(
+        "PIPELINE_END",
+        "SYSTEM",
+        None,
+        f"Pipeline completed: model_id={model_id}, retrained={retrained}, scored={scored}, "
+        f"rescored={rescored}, total={total:.3f}s, stages: {stage_msg}",
+        duration_ms=total * 1000.0,
+        rows_out=scored + rescored,
+        model_id=model_id,
+        batch_id=run_id,
+    )
+    db.commit()
+    print(f"Pipeline stage timings: {stage_msg} (total={total:.3f}s)")
+    print(default_pred_cache.report())
+    return {
+        "model_id": model_id,
+        "retrained": retrained,
+        "scored": scored,
+        "rescored": rescored,
+        "timings": timings,
+        "prediction_cache": default_pred_cache.stats(),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--train_csv", default="", help="Labeled training csv path used for retraining")
+    ap.add_argument("--threshold_new_texts", type=int, default=20, help="Trigger retrain if texts ingested since last training >= threshold")
+    ap.add_argument("--batch_size", type=int, default=50)
+    ap.add_argument("--rescore_recent_days", type=int, default=0, help="After inference, rescore texts ingested within last N days not yet scored by the active model")
+    ap.add_argument("--model_name", default="risk_classifier")
+    ap.add_argument("--artifacts_dir", default="artifacts")
+    args = ap.parse_args()
+
+    db = MySQL(DBConfig.from_env())
+    try:
+        run_pipeline(
+            db,
+            args.train_csv,
+            args.threshold_new_texts,
+            args.batch_size,
+            args.rescore_recent_days,
+            args.model_name,
+            args.artifacts_dir,
+        )
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
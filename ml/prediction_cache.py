@@ -0,0 +1,220 @@
+# ml/prediction_cache.py
+# Content-hash prediction cache: (sha256(normalize_text(raw)), model_id) -> (label, score).
+# In-process LRU in front of the prediction_cache table; only misses reach the model.
+from __future__ import annotations
+
+import argparse
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from db import DBConfig, MySQL
+from metrics import default_metrics
+from scoring import ScoreBatch, score_batch
+from text_prep import normalize_text
+
+Entry = Tuple[str, float]
+
+
+def text_hash(raw_text: str) -> bytes:
+    # hash of the same normalization the model's TF-IDF preprocessor sees
+    return hashlib.sha256(normalize_text(str(raw_text)).encode("utf-8")).digest()
+
+
+class PredictionCache:
+    """
+    Per-model memo of predictions for duplicate texts (templated chats, resubmitted claims).
+    Keys include model_id, so a new model version never sees another version's entries;
+    invalidate() drops a version from both tiers.
+    """
+
+    def __init__(self, max_entries: int = 100000, enabled: bool = True):
+        self.max_entries = max(1, int(max_entries))
+        self.enabled = enabled
+        self._lru: "OrderedDict[Tuple[int, bytes], Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.lru_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+        self.batch_dups = 0
+
+    def _lru_get(self, key: Tuple[int, bytes]) -> Optional[Entry]:
+        with self._lock:
+            hit = self._lru.get(key)
+            if hit is not None:
+                self._lru.move_to_end(key)
+            return hit
+
+    def _lru_put(self, key: Tuple[int, bytes], entry: Entry):
+        with self._lock:
+            self._lru[key] = entry
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.max_entries:
+                self._lru.popitem(last=False)
+
+    def _db_get(self, db: MySQL, model_id: int, hashes: List[bytes]) -> Dict[bytes, Entry]:
+        if not hashes:
+            return {}
+        placeholders = ",".join(["%s"] * len(hashes))
+        rows = db.fetchall(
+            f"""
+            SELECT text_hash, risk_label, risk_score
+            FROM prediction_cache
+            WHERE model_id = %s AND text_hash IN ({placeholders})
+            """,
+            (int(model_id), *hashes),
+        )
+        return {bytes(h): (str(label), float(score)) for h, label, score in rows}
+
+    def _db_put(self, db: MySQL, model_id: int, entries: Dict[bytes, Entry]):
+        if not entries:
+            return
+        # sorted keys: concurrent workers lock rows in the same order (no upsert deadlocks)
+        items = sorted(entries.items())
+        values = ",".join(["(%s, %s, %s, %s)"] * len(items))
+        params: List[Any] = []
+        for h, (label, score) in items:
+            params.extend((int(model_id), h, label, score))
+        db.execute(
+            f"""
+            INSERT INTO prediction_cache (model_id, text_hash, risk_label, risk_score)
+            VALUES {values}
+            ON DUPLICATE KEY UPDATE risk_label = VALUES(risk_label)
+            """,
+            tuple(params),
+        )
+
+    def score(self, db: MySQL, model_id: int, model: Any, raw_list: Sequence[str]) -> ScoreBatch:
+        """Split the batch into hits and misses; score only the unique misses (caller commits)."""
+        n = len(raw_list)
+        if not self.enabled or n == 0:
+            return score_batch(model, raw_list)
+
+        with default_metrics.span("pred_cache_lookup"):
+            hashes = [text_hash(r) for r in raw_list]
+            found: Dict[bytes, Entry] = {}
+            first_idx: Dict[bytes, int] = {}
+            for i, h in enumerate(hashes):
+                if h in found or h in first_idx:
+                    continue
+                hit = self._lru_get((model_id, h))
+                if hit is not None:
+                    found[h] = hit
+                    self.lru_hits += 1
+                else:
+                    first_idx[h] = i
+
+            from_db = self._db_get(db, model_id, list(first_idx))
+        self.db_hits += len(from_db)
+        for h, entry in from_db.items():
+            found[h] = entry
+            self._lru_put((model_id, h), entry)
+            del first_idx[h]
+
+        if first_idx:
+            miss_idx = list(first_idx.values())
+            scored = score_batch(model, [raw_list[i] for i in miss_idx])
+            new = {
+                hashes[i]: (str(label), round(float(score), 6))
+                for i, label, score in zip(miss_idx, scored.labels, scored.scores)
+            }
+            self.misses += len(new)
+            with default_metrics.span("pred_cache_store"):
+                self._db_put(db, model_id, new)
+            for h, entry in new.items():
+                found[h] = entry
+                self._lru_put((model_id, h), entry)
+
+        # repeats inside this batch are served by the first occurrence
+        self.batch_dups += n - len(found)
+        labels = np.array([found[h][0] for h in hashes], dtype=object)
+        scores = np.array([found[h][1] for h in hashes], dtype=np.float64)
+        return ScoreBatch(labels, scores, None)
+
+    def invalidate(self, db: Optional[MySQL] = None, model_id: Optional[int] = None) -> int:
+        """Drop one model version (or everything) from the LRU and, with a connection, from the table."""
+        with self._lock:
+            if model_id is None:
+                self._lru.clear()
+            else:
+                for k in [k for k in self._lru if k[0] == int(model_id)]:
+                    del self._lru[k]
+        if db is None:
+            return 0
+        if model_id is None:
+            return db.execute("DELETE FROM prediction_cache")
+        return db.execute("DELETE FROM prediction_cache WHERE model_id = %s", (int(model_id),))
+
+    def stats(self) -> Dict[str, Any]:
+        hits = self.lru_hits + self.db_hits + self.batch_dups
+        total = hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "lru_entries": len(self._lru),
+            "lru_hits": self.lru_hits,
+            "db_hits": self.db_hits,
+            "batch_dups": self.batch_dups,
+            "misses": self.misses,
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+        }
+
+    def report(self) -> str:
+        st = self.stats()
+        if not st["enabled"]:
+            return "Prediction cache: disabled"
+        return (
+            f"Prediction cache: hit_rate={st['hit_rate']:.1%} (lru={st['lru_hits']}, db={st['db_hits']}, "
+            f"in_batch={st['batch_dups']}, misses={st['misses']})"
+        )
+
+
+def invalidate_inactive(db: MySQL, model_name: str) -> int:
+    # called on activation: rows of the model_name's inactive versions are no longer served
+    return db.execute(
+        """
+        DELETE pc FROM prediction_cache pc
+        JOIN ml_model_metadata m ON m.model_id = pc.model_id
+        WHERE m.model_name = %s AND m.is_active = 0
+        """,
+        (model_name,),
+    )
+
+
+default_pred_cache = PredictionCache(
+    max_entries=int(os.getenv("PRED_CACHE_SIZE", "100000")),
+    enabled=os.getenv("PRED_CACHE", "1").strip().lower() not in ("0", "false", "no", "off"),
+)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--invalidate_model_id", type=int, default=0, help="Delete cached predictions of one model version")
+    ap.add_argument("--invalidate_all", action="store_true", help="Delete every cached prediction")
+    args = ap.parse_args()
+
+    db = MySQL(DBConfig.from_env())
+    try:
+        if args.invalidate_all:
+            n = default_pred_cache.invalidate(db)
+        elif args.invalidate_model_id:
+            n = default_pred_cache.invalidate(db, args.invalidate_model_id)
+        else:
+            rows = db.fetchall("SELECT model_id, COUNT(*) FROM prediction_cache GROUP BY model_id ORDER BY model_id")
+            for model_id, cnt in rows:
+                print(f"model_id={model_id} cached_predictions={cnt}")
+            return
+        db.commit()
+        print(f"✅ Removed {n} cached prediction(s).")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# ml/premium_rules.py
+# Table-driven premium suggestions: premium_adjustment_rule maps (risk label, product type, score band)
+# to an adjustment percentage; one INSERT ... SELECT applies the rules to a staged write-back batch.
+from __future__ import annotations
+
+import argparse
+from typing import Any, Dict, List, Optional
+
+from db import DBConfig, MySQL
+
+
+def suggest_premiums(db: MySQL, stage_table: str, model_id: int) -> int:
+    """
+    Write SUGGESTED adjustments for every ACTIVE policy of the batch customers (caller commits).
+    - Only each customer's last staged text counts (ROW_NUMBER over seq), so a batch with several texts
+      per customer yields one suggestion per policy.
+    - Rule choice per policy: product-specific before generic (product_type NULL), then priority,
+      then the newest rule; the score band is [score_min, score_max), score_max NULL = unbounded.
+    - A suggestion is skipped when the policy's most recent open (SUGGESTED) one has the same
+      percentage and premium, so rescoring with unchanged results adds no rows, while a return to an
+      earlier value (15% -> 5% -> 15%) is written again and becomes the newest suggestion.
+    Returns the number of suggestions written.
+    """
+    return db.execute(
+        f"""
+        INSERT INTO policy_premium_adjustment
+          (policy_id, customer_id, model_id, risk_score_id, rule_id, adjustment_pct, suggested_premium, decision_status)
+        SELECT c.policy_id, c.customer_id, %s, c.risk_score_id, c.rule_id, c.adjustment_pct, c.suggested_premium,
+               'SUGGESTED'
+        FROM (
+          SELECT p.policy_id, p.customer_id, s.risk_score_id, r.rule_id, r.adjustment_pct,
+                 ROUND(p.base_premium * (1 + r.adjustment_pct / 100), 2) AS suggested_premium,
+                 ROW_NUMBER() OVER (
+                   PARTITION BY p.policy_id
+                   ORDER BY (r.product_type IS NOT NULL) DESC, r.priority DESC, r.rule_id DESC
+                 ) AS rule_rank
+          FROM (
+            SELECT customer_id, risk_score_id, risk_label, risk_score,
+                   ROW_NUMBER() OVER (PARTITION BY customer_id ORDER BY seq DESC) AS text_rank
+            FROM {stage_table}
+            WHERE risk_score_id IS NOT NULL
+          ) s
+          JOIN policy p
+            ON p.customer_id = s.customer_id AND p.status = 'ACTIVE'
+          JOIN premium_adjustment_rule r
+            ON r.is_active = 1
+           AND r.risk_label = s.risk_label
+           AND (r.product_type IS NULL OR r.product_type = p.product_type)
+           AND s.risk_score >= r.score_min
+           AND (r.score_max IS NULL OR s.risk_score < r.score_max)
+          WHERE s.text_rank = 1
+        ) c
+        WHERE c.rule_rank = 1
+          AND NOT EXISTS (
+            SELECT 1 FROM policy_premium_adjustment o
+            WHERE o.adjustment_id = (
+                    SELECT MAX(o2.adjustment_id) FROM policy_premium_adjustment o2
+                    WHERE o2.policy_id = c.policy_id AND o2.decision_status = 'SUGGESTED'
+                  )
+              AND o.adjustment_pct = c.adjustment_pct
+              AND o.suggested_premium <=> c.suggested_premium
+          )
+        ORDER BY c.policy_id
+        """,
+        (int(model_id),),
+    )
+
+
+def list_rules(db: MySQL, include_inactive: bool = False) -> List[Dict[str, Any]]:
+    where = "" if include_inactive else "WHERE is_active = 1"
+    return db.fetchall_dict(
+        f"""
+        SELECT rule_id, risk_label, product_type, score_min, score_max, adjustment_pct, priority, is_active
+        FROM premium_adjustment_rule
+        {where}
+        ORDER BY risk_label, product_type IS NULL, product_type, score_min, priority DESC
+        """
+    )
+
+
+def add_rule(db: MySQL, risk_label: str, adjustment_pct: float, product_type: Optional[str] = None,
+             score_min: float = 0.0, score_max: Optional[float] = None, priority: int = 0) -> int:
+    db.execute(
+        """
+        INSERT INTO premium_adjustment_rule (risk_label, product_type, score_min, score_max, adjustment_pct, priority)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        """,
+        (risk_label.upper(), product_type.upper() if product_type else None, score_min, score_max,
+         adjustment_pct, int(priority)),
+    )
+    return int(db.fetchall("SELECT LAST_INSERT_ID()")[0][0])
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--add", action="store_true", help="Add a rule (needs --risk_label and --pct)")
+    ap.add_argument("--deactivate", type=int, default=0, help="Deactivate this rule_id")
+    ap.add_argument("--risk_label", default="", choices=["", "LOW", "MEDIUM", "HIGH"])
+    ap.add_argument("--product_type", default="", help="Empty = any product")
+    ap.add_argument("--score_min", type=float, default=0.0)
+    ap.add_argument("--score_max", type=float, default=None, help="Exclusive upper bound (default: none)")
+    ap.add_argument("--pct", type=float, default=None, help="Adjustment percentage")
+    ap.add_argument("--priority", type=int, default=0)
+    ap.add_argument("--all", action="store_true", help="List inactive rules too")
+    args = ap.parse_args()
+
+    db = MySQL(DBConfig.from_env())
+    try:
+        if args.add:
+            if not args.risk_label or args.pct is None:
+                raise SystemExit("--add requires --risk_label and --pct")
+            rule_id = add_rule(db, args.risk_label, args.pct, args.product_type or None,
+                               args.score_min, args.score_max, args.priority)
+            db.commit()
+            print(f"✅ Added rule_id={rule_id}")
+        elif args.deactivate:
+            db.execute("UPDATE premium_adjustment_rule SET is_active = 0 WHERE rule_id = %s", (args.deactivate,))
+            db.commit()
+            print(f"✅ Deactivated rule_id={args.deactivate}")
+        for r in list_rules(db, args.all):
+            band = f"[{r['score_min']}, {r['score_max'] if r['score_max'] is not None else '∞'})"
+            print(
+                f"rule_id={r['rule_id']} label={r['risk_label']} product={r['product_type'] or '*'} "
+                f"score={band} pct={r['adjustment_pct']} priority={r['priority']} active={r['is_active']}"
+            )
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+# ml/rescore.py
+# Model-aware rescoring of a recent window: only texts the active model has not scored yet,
+# walked with a keyset cursor that is checkpointed in MySQL so an interrupted job resumes.
+from __future__ import annotations
+
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from db import MySQL, new_batch_id
+from metrics import default_metrics
+from prediction_cache import default_pred_cache
+from writeback import write_back
+
+# texts with no customer_risk_score row from this model (served by ix_crs_customer_text_model_scored)
+_NOT_SCORED_BY_MODEL = """
+  NOT EXISTS (
+    SELECT 1 FROM customer_risk_score crs
+    WHERE crs.customer_id = ut.customer_id AND crs.text_id = ut.text_id AND crs.model_id = %s
+  )
+"""
+
+
+def fetch_stale(
+    db: MySQL,
+    model_id: int,
+    window_start: Any,
+    window_end: Any,
+    batch_size: int,
+    after: Optional[Tuple[Any, int]] = None,
+) -> List[Dict[str, Any]]:
+    # Keyset page over ix_unstructured_text_ingested (ingested_at + implicit PK text_id)
+    keyset = ""
+    params: List[Any] = [window_start, window_end]
+    if after is not None:
+        keyset = "AND (ut.ingested_at > %s OR (ut.ingested_at = %s AND ut.text_id > %s))"
+        params += [after[0], after[0], int(after[1])]
+    params += [int(model_id), int(batch_size)]
+    return db.fetchall_dict(
+        f"""
+        SELECT ut.text_id, ut.customer_id, ut.raw_text, ut.ingested_at
+        FROM unstructured_text ut
+        WHERE ut.ingested_at >= %s AND ut.ingested_at < %s
+          {keyset}
+          AND {_NOT_SCORED_BY_MODEL}
+        ORDER BY ut.ingested_at ASC, ut.text_id ASC
+        LIMIT %s
+        """,
+        tuple(params),
+    )
+
+
+def _open_checkpoint(db: MySQL, model_id: int, days: int) -> Dict[str, Any]:
+    # resume an unfinished pass for (model, window); otherwise start a new one with a frozen window
+    rows = db.fetchall_dict(
+        """
+        SELECT model_id, window_days, window_start, window_end, last_ingested_at, last_text_id,
+               rows_todo, rows_done, finished_at
+        FROM rescore_checkpoint
+        WHERE model_id = %s AND window_days = %s
+        FOR UPDATE
+        """,
+        (int(model_id), int(days)),
+    )
+    if rows and rows[0]["finished_at"] is None:
+        ck = rows[0]
+        ck["resumed"] = True
+        return ck
+
+    window_start, window_end = db.fetchall("SELECT DATE_SUB(NOW(), INTERVAL %s DAY), NOW()", (int(days),))[0]
+    # one-off count at job start for progress/ETA
+    todo = int(db.fetchall(
+        f"""
+        SELECT COUNT(*) FROM unstructured_text ut
+        WHERE ut.ingested_at >= %s AND ut.ingested_at < %s AND {_NOT_SCORED_BY_MODEL}
+        """,
+        (window_start, window_end, int(model_id)),
+    )[0][0])
+    db.execute(
+        """
+        INSERT INTO rescore_checkpoint
+          (model_id, window_days, window_start, window_end, last_ingested_at, last_text_id, rows_todo, rows_done,
+           started_at, finished_at)
+        VALUES (%s, %s, %s, %s, NULL, NULL, %s, 0, NOW(), NULL)
+        ON DUPLICATE KEY UPDATE
+          window_start=VALUES(window_start), window_end=VALUES(window_end),
+          last_ingested_at=NULL, last_text_id=NULL, rows_todo=VALUES(rows_todo), rows_done=0,
+          started_at=NOW(), finished_at=NULL
+        """,
+        (int(model_id), int(days), window_start, window_end, todo),
+    )
+    db.commit()
+    return {
+        "model_id": int(model_id),
+        "window_days": int(days),
+        "window_start": window_start,
+        "window_end": window_end,
+        "last_ingested_at": None,
+        "last_text_id": None,
+        "rows_todo": todo,
+        "rows_done": 0,
+        "resumed": False,
+    }
+
+
+def rescore_window(
+    db: MySQL,
+    model_id: int,
+    artifact_path: str,
+    model: Any,
+    days: int,
+    batch_size: int = 500,
+    max_seconds: float = 0.0,
+    max_rows: int = 0,
+) -> Dict[str, Any]:
+    """
+    Rescore texts ingested in the last `days` that the active model has not scored yet.
+    The window is frozen when a pass starts; each batch commits its write-back together with the
+    checkpoint cursor, so after a model swap every text in the window is scored exactly once,
+    even across interruptions. Texts ingested after the pass started are left to normal inference.
+    """
+    ck = _open_checkpoint(db, model_id, days)
+    cursor: Optional[Tuple[Any, int]] = None
+    if ck["last_text_id"] is not None:
+        cursor = (ck["last_ingested_at"], int(ck["last_text_id"]))
+    todo = int(ck["rows_todo"])
+    done_before = int(ck["rows_done"])
+    if ck["resumed"]:
+        print(f"[rescore] resuming model_id={model_id} window={days}d at {done_before}/{todo}")
+
+    start = time.perf_counter()
+    total = 0
+    batches = 0
+    stop_reason = "converged"
+    while True:
+        elapsed = time.perf_counter() - start
+        if max_seconds and elapsed >= max_seconds:
+            stop_reason = "max_seconds"
+            break
+        limit = int(batch_size)
+        if max_rows:
+            if total >= max_rows:
+                stop_reason = "max_rows"
+                break
+            limit = min(limit, int(max_rows) - total)
+
+        t0 = time.perf_counter()
+        with default_metrics.span("fetch"):
+            texts = fetch_stale(db, model_id, ck["window_start"], ck["window_end"], limit, after=cursor)
+        if not texts:
+            db.execute(
+                "UPDATE rescore_checkpoint SET finished_at = NOW() WHERE model_id = %s AND window_days = %s",
+                (int(model_id), int(days)),
+            )
+            db.commit()
+            break
+
+        default_metrics.inc("batches")
+        default_metrics.inc("rows_fetched", len(texts))
+        with default_metrics.span("score"):
+            scored = default_pred_cache.score(db, model_id, model, [t["raw_text"] for t in texts])
+        with default_metrics.span("write_back"):
+            n = write_back(db, model_id, artifact_path, texts, scored.labels, scored.scores)
+        default_metrics.inc("rows_scored", n)
+        cursor = (texts[-1]["ingested_at"], int(texts[-1]["text_id"]))
+        db.execute(
+            """
+            UPDATE rescore_checkpoint
+            SET last_ingested_at = %s, last_text_id = %s, rows_done = rows_done + %s
+            WHERE model_id = %s AND window_days = %s
+            """,
+            (cursor[0], cursor[1], n, int(model_id), int(days)),
+        )
+        db.log_event(
+            "RESCORE",
+            "MODEL",
+            model_id,
+            f"Rescore batch completed: model_id={model_id}, window_days={days}, texts_scored={n}, "
+            f"progress={done_before + total + n}/{todo}",
+            duration_ms=(time.perf_counter() - t0) * 1000.0,
+            rows_in=len(texts),
+            rows_out=n,
+            model_id=model_id,
+            batch_id=new_batch_id(),
+        )
+        with default_metrics.span("commit"):
+            db.commit()
+
+        total += n
+        batches += 1
+        elapsed = time.perf_counter() - start
+        rate = total / elapsed if elapsed > 0 else 0.0
+        done = done_before + total
+        eta = (max(todo - done, 0) / rate) if rate > 0 else 0.0
+        pct = (100.0 * done / todo) if todo else 100.0
+        print(f"[rescore] batch={batches} done={done}/{todo} ({pct:.1f}%) rate={rate:.1f} texts/sec eta={eta:.0f}s")
+
+    elapsed = time.perf_counter() - start
+    return {
+        "texts_scored": total,
+        "rows_done": done_before + total,
+        "rows_todo": todo,
+        "batches": batches,
+        "resumed": bool(ck["resumed"]),
+        "elapsed_s": elapsed,
+        "texts_per_sec": (total / elapsed) if elapsed > 0 else 0.0,
+        "stop_reason": stop_reason,
+    }
@@ -0,0 +1,305 @@
+# ml/retention.py
+# Retention for the partitioned history tables (db/partitioning.sql): month partitions older than
+# --keep_months are exported to zstd Parquet under ARCHIVE_DIR, then dropped (or exchanged out first).
+# The archive stays queryable with pyarrow (query_archive / `query` subcommand).
+from __future__ import annotations
+
+import argparse
+import json
+import os
+from datetime import date, datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from db import DBConfig, MySQL
+
+# history table -> (partitioning column, primary key id)
+TABLES: Dict[str, Tuple[str, str]] = {
+    "customer_risk_score": ("scored_at", "risk_score_id"),
+    "policy_premium_adjustment": ("created_at", "adjustment_id"),
+    "pipeline_event": ("event_time", "event_id"),
+}
+
+ARCHIVE_DIR = os.getenv("ARCHIVE_DIR", "artifacts/archive")
+EXPORT_CHUNK = 50000
+
+
+def _pyarrow():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise SystemExit(f"Archiving needs pyarrow (pip install pyarrow). Details: {e}")
+    return pa, pq
+
+
+def _month_start(d: date, add_months: int = 0) -> date:
+    m = d.year * 12 + (d.month - 1) + add_months
+    return date(m // 12, m % 12 + 1, 1)
+
+
+def _upper_bound(description: Optional[str]) -> Optional[date]:
+    # RANGE COLUMNS descriptions look like '2025-02-01' (quoted) or MAXVALUE
+    if not description or description.upper() == "MAXVALUE":
+        return None
+    return datetime.fromisoformat(description.strip("'\" ")[:19]).date()
+
+
+def list_partitions(db: MySQL, table: str) -> List[Dict[str, Any]]:
+    """Partitions in boundary order: name, upper (exclusive, None for MAXVALUE), approximate rows."""
+    rows = db.fetchall(
+        """
+        SELECT PARTITION_NAME, PARTITION_DESCRIPTION, TABLE_ROWS
+        FROM information_schema.PARTITIONS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND PARTITION_NAME IS NOT NULL
+        ORDER BY PARTITION_ORDINAL_POSITION
+        """,
+        (table,),
+    )
+    return [{"name": name, "upper": _upper_bound(desc), "rows": int(n or 0)} for name, desc, n in rows]
+
+
+def ensure_future_partitions(db: MySQL, table: str, months_ahead: int = 3) -> List[str]:
+    """Split pmax so month partitions exist through `months_ahead` months from now (DDL, commits)."""
+    parts = list_partitions(db, table)
+    bounded = [p["upper"] for p in parts if p["upper"] is not None]
+    if not parts or parts[-1]["upper"] is not None or not bounded:
+        return []
+    target = _month_start(date.today(), months_ahead + 1)
+    added, upper = [], bounded[-1]
+    defs = []
+    while upper < target:
+        nxt = _month_start(upper, 1)
+        name = f"p{upper.year}{upper.month:02d}"
+        defs.append(f"PARTITION {name} VALUES LESS THAN ('{nxt.isoformat()}')")
+        added.append(name)
+        upper = nxt
+    if defs:
+        db.execute(
+            f"ALTER TABLE {table} REORGANIZE PARTITION {parts[-1]['name']} INTO "
+            f"({', '.join(defs)}, PARTITION {parts[-1]['name']} VALUES LESS THAN (MAXVALUE))"
+        )
+    return added
+
+
+def expired_partitions(db: MySQL, table: str, keep_months: int) -> List[Dict[str, Any]]:
+    # whole partitions only: every row is older than the first day of (current month - keep_months)
+    cutoff = _month_start(date.today(), -int(keep_months))
+    return [p for p in list_partitions(db, table) if p["upper"] is not None and p["upper"] <= cutoff]
+
+
+def _arrow_schema(db: MySQL, table: str):
+    pa, _ = _pyarrow()
+    cols = db.fetchall(
+        """
+        SELECT COLUMN_NAME, DATA_TYPE, NUMERIC_PRECISION, NUMERIC_SCALE
+        FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s
+        ORDER BY ORDINAL_POSITION
+        """,
+        (table,),
+    )
+    fields = []
+    for name, dtype, prec, scale in cols:
+        dtype = str(dtype).lower()
+        if dtype in ("bigint", "int", "mediumint", "smallint", "tinyint"):
+            t = pa.int64()
+        elif dtype == "decimal":
+            t = pa.decimal128(int(prec), int(scale))
+        elif dtype in ("double", "float"):
+            t = pa.float64()
+        elif dtype in ("datetime", "timestamp"):
+            t = pa.timestamp("s")
+        elif dtype == "date":
+            t = pa.date32()
+        else:
+            t = pa.string()
+        fields.append(pa.field(str(name), t))
+    return pa.schema(fields)
+
+
+def export_query(db: MySQL, table: str, source: str, order_by: str, path: Path) -> int:
+    """Stream `SELECT cols FROM source` into one Parquet file (written to .tmp, renamed when complete)."""
+    pa, pq = _pyarrow()
+    schema = _arrow_schema(db, table)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".parquet.tmp")
+    n = 0
+    writer = pq.ParquetWriter(str(tmp), schema, compression="zstd")
+    try:
+        sql = f"SELECT {', '.join(schema.names)} FROM {source} ORDER BY {order_by}"
+        for chunk in db.iter_rows(sql, chunk_size=EXPORT_CHUNK):
+            columns = list(zip(*chunk))
+            writer.write_batch(pa.RecordBatch.from_arrays(
+                [pa.array(col, type=f.type) for col, f in zip(columns, schema)], schema=schema,
+            ))
+            n += len(chunk)
+    finally:
+        writer.close()
+    if pq.ParquetFile(str(tmp)).metadata.num_rows != n:
+        raise RuntimeError(f"Parquet row count mismatch for {path}")
+    os.replace(tmp, path)
+    return n
+
+
+def archive_partition(db: MySQL, table: str, partition: str, archive_dir: str = ARCHIVE_DIR,
+                      mode: str = "exchange") -> Dict[str, Any]:
+    """
+    Export one partition to <archive_dir>/<table>/<partition>.parquet and remove it from the hot table.
+    mode="drop": export straight from the partition, then DROP PARTITION.
+    mode="exchange": swap the partition with an empty <table>_retired table first (metadata-only, so the
+    hot table is locked only for the swap), export from that table, then drop it and the empty partition.
+    The rows are only deleted after the file is complete and its row count matches.
+    """
+    time_col, pk = TABLES[table]
+    path = Path(archive_dir) / table / f"{partition}.parquet"
+    expected = int(db.fetchall(f"SELECT COUNT(*) FROM {table} PARTITION ({partition})")[0][0])
+    if mode == "drop":
+        n = export_query(db, table, f"{table} PARTITION ({partition})", f"{time_col}, {pk}", path)
+        if n != expected:
+            raise RuntimeError(f"{table}.{partition}: exported {n} rows, expected {expected}")
+        db.execute(f"ALTER TABLE {table} DROP PARTITION {partition}")
+    elif mode == "exchange":
+        retired = f"{table}_retired"
+        left = db.fetchall(
+            "SELECT COUNT(*) FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+            (retired,),
+        )[0][0]
+        if left and db.fetchall(f"SELECT 1 FROM {retired} LIMIT 1"):
+            raise RuntimeError(f"{retired} still holds rows from an interrupted run; archive or drop it first")
+        db.execute(f"DROP TABLE IF EXISTS {retired}")
+        db.execute(f"CREATE TABLE {retired} LIKE {table}")
+        db.execute(f"ALTER TABLE {retired} REMOVE PARTITIONING")
+        db.execute(f"ALTER TABLE {table} EXCHANGE PARTITION {partition} WITH TABLE {retired}")
+        n = export_query(db, table, retired, f"{time_col}, {pk}", path)
+        if n != expected:
+            raise RuntimeError(f"{table}.{partition}: exported {n} rows, expected {expected}; rows kept in {retired}")
+        db.execute(f"DROP TABLE {retired}")
+        db.execute(f"ALTER TABLE {table} DROP PARTITION {partition}")
+    else:
+        raise ValueError(f"Unknown retention mode: {mode}")
+
+    info = {"table": table, "partition": partition, "rows": n, "file": str(path), "mode": mode}
+    db.log_event("ARCHIVE", "TABLE", None, json.dumps(info))
+    db.commit()
+    return info
+
+
+def run_retention(db: MySQL, keep_months: int, mode: str = "exchange", archive_dir: str = ARCHIVE_DIR,
+                  tables: Optional[List[str]] = None, months_ahead: int = 3,
+                  dry_run: bool = False) -> List[Dict[str, Any]]:
+    """Archive expired partitions of each table and pre-create upcoming months."""
+    done = []
+    for table in tables or list(TABLES):
+        if not list_partitions(db, table):
+            print(f"⚠️ {table} is not partitioned (run db/partitioning.sql); skipped")
+            continue
+        for p in expired_partitions(db, table, keep_months):
+            if dry_run:
+                print(f"would archive {table}.{p['name']} (< {p['upper']}, ~{p['rows']} rows)")
+                continue
+            info = archive_partition(db, table, p["name"], archive_dir, mode)
+            print(f"✅ Archived {table}.{p['name']}: {info['rows']} rows -> {info['file']}")
+            done.append(info)
+        if not dry_run:
+            added = ensure_future_partitions(db, table, months_ahead)
+            if added:
+                print(f"✅ {table}: added partitions {', '.join(added)}")
+    return done
+
+
+def query_archive(table: str, start: Optional[str] = None, end: Optional[str] = None,
+                  filters: Optional[Dict[str, Any]] = None, columns: Optional[List[str]] = None,
+                  archive_dir: str = ARCHIVE_DIR):
+    """
+    Read archived rows as a pandas DataFrame. [start, end) applies to the table's time column; filters are
+    column == value. Row-group statistics let pyarrow skip files and row groups outside the range.
+    """
+    _pyarrow()
+    import pyarrow.dataset as ds
+
+    time_col, pk = TABLES[table]
+    root = Path(archive_dir) / table
+    files = sorted(str(p) for p in root.glob("*.parquet"))
+    if not files:
+        return None
+    dataset = ds.dataset(files, format="parquet")
+    conds = []
+    if start:
+        conds.append(ds.field(time_col) >= datetime.fromisoformat(start))
+    if end:
+        conds.append(ds.field(time_col) < datetime.fromisoformat(end))
+    for col, val in (filters or {}).items():
+        conds.append(ds.field(col) == val)
+    expr = None
+    for c in conds:
+        expr = c if expr is None else expr & c
+    df = dataset.to_table(columns=columns, filter=expr).to_pandas()
+    sort_cols = [c for c in (time_col, pk) if c in df.columns]
+    return df.sort_values(sort_cols).reset_index(drop=True) if sort_cols else df
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    a = sub.add_parser("archive", help="Archive and remove partitions older than --keep_months")
+    a.add_argument("--keep_months", type=int, default=12)
+    a.add_argument("--mode", choices=["exchange", "drop"], default="exchange")
+    a.add_argument("--tables", nargs="*", choices=list(TABLES), default=None)
+    a.add_argument("--months_ahead", type=int, default=3, help="Also pre-create this many future months")
+    a.add_argument("--archive_dir", default=ARCHIVE_DIR)
+    a.add_argument("--dry_run", action="store_true")
+
+    e = sub.add_parser("extend", help="Split pmax so upcoming months have their own partitions")
+    e.add_argument("--months_ahead", type=int, default=3)
+
+    sub.add_parser("partitions", help="List partitions of the history tables")
+
+    q = sub.add_parser("query", help="Read archived rows")
+    q.add_argument("--table", choices=list(TABLES), required=True)
+    q.add_argument("--from", dest="start", default=None, help="Inclusive, e.g. 2025-01-01")
+    q.add_argument("--to", dest="end", default=None, help="Exclusive")
+    q.add_argument("--customer_id", type=int, default=0)
+    q.add_argument("--archive_dir", default=ARCHIVE_DIR)
+    q.add_argument("--out_csv", default=None, help="Write all matching rows here instead of printing")
+    args = ap.parse_args()
+
+    if args.cmd == "query":
+        filters = {"customer_id": args.customer_id} if args.customer_id else None
+        df = query_archive(args.table, args.start, args.end, filters, archive_dir=args.archive_dir)
+        if df is None:
+            print(f"No archive files for {args.table} under {args.archive_dir}")
+        elif args.out_csv:
+            df.to_csv(args.out_csv, index=False)
+            print(f"✅ Wrote {len(df)} archived rows to {args.out_csv}")
+        else:
+            print(df.head(50).to_string(index=False))
+            print(f"({len(df)} rows)")
+        return
+
+    db = MySQL(DBConfig.from_env())
+    try:
+        if args.cmd == "archive":
+            run_retention(db, args.keep_months, args.mode, args.archive_dir, args.tables,
+                          args.months_ahead, args.dry_run)
+        elif args.cmd == "extend":
+            for table in TABLES:
+                added = ensure_future_partitions(db, table, args.months_ahead)
+                print(f"{table}: {'added ' + ', '.join(added) if added else 'up to date'}")
+        else:
+            for table in TABLES:
+                parts = list_partitions(db, table)
+                if not parts:
+                    print(f"{table}: not partitioned")
+                for p in parts:
+                    print(f"{table}.{p['name']}: < {p['upper'] or 'MAXVALUE'} ~{p['rows']} rows")
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
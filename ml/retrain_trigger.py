@@ -2,32 +2,68 @@
 from __future__ import annotations
 
 import argparse
-import subprocess
-import sys
+from typing import Tuple
 
 from db import DBConfig, MySQL
+from trigger_signals import evaluate_trigger
+
+
+def check_retrain(
+    db: MySQL,
+    threshold_new_texts: int,
+    model_name: str = "risk_classifier",
+    psi_threshold: float = 0.2,
+    drift_window_days: int = 1,
+) -> Tuple[bool, int]:
+    """
+    Decide whether to retrain from the incremental counters (no table scans, cheap enough to run every minute):
+    texts ingested since the last training, and PSI of the active model's recent score/label histogram
+    against its first scoring window. Logs RETRAIN_START when triggered (caller commits).
+    """
+    model_id = db.get_active_model_id(model_name)
+    sig = evaluate_trigger(db, threshold_new_texts, model_id, psi_threshold, drift_window_days)
+    cnt = sig["ingested_since_last_train"]
+    drift = sig.get("drift") or {}
+    drift_msg = f", score_psi={drift['score_psi']}, label_psi={drift['label_psi']}" if drift else ""
+
+    if not sig["retrain"]:
+        print(f"No retrain. Ingested since last training={cnt} < threshold={threshold_new_texts}{drift_msg}")
+        return False, cnt
+
+    db.log_event(
+        "RETRAIN_START",
+        "MODEL" if model_id is not None else "SYSTEM",
+        model_id,
+        f"Trigger retrain: {'; '.join(sig['reasons'])}{drift_msg}",
+    )
+    return True, cnt
 
 
 def main():
     ap = argparse.ArgumentParser()
-    ap.add_argument("--threshold_new_texts", type=int, default=20, help="If unprocessed texts >= threshold, trigger retrain")
+    ap.add_argument("--threshold_new_texts", type=int, default=20, help="If texts ingested since last training >= threshold, trigger retrain")
+    ap.add_argument("--psi_threshold", type=float, default=0.2, help="Trigger retrain if score/label PSI >= threshold (0 = off)")
+    ap.add_argument("--drift_window_days", type=int, default=1, help="Recent window compared against the model's first window")
     ap.add_argument("--train_csv", required=True, help="Labeled training csv path")
     ap.add_argument("--activate", action="store_true", help="Activate new model after retraining")
     args = ap.parse_args()
 
     db = MySQL(DBConfig.from_env())
     try:
-        cnt = db.fetchall(
-            "SELECT COUNT(*) FROM unstructured_text WHERE is_processed=0"
-        )[0][0]
-        cnt = int(cnt)
-
-        if cnt < args.threshold_new_texts:
-            print(f"No retrain. Unprocessed texts={cnt} < threshold={args.threshold_new_texts}")
+        triggered, _ = check_retrain(
+            db, args.threshold_new_texts, psi_threshold=args.psi_threshold, drift_window_days=args.drift_window_days
+        )
+        if not triggered:
             return
+        db.commit()
 
-        db.log_event("RETRAIN_START", "SYSTEM", None, f"Trigger retrain: unprocessed_texts={cnt} >= {args.threshold_new_texts}")
+        # Train in-process on the same connection; imported here so a "no retrain"
+        # check does not pay for pandas/sklearn imports
+        from risk_model_training import train_model
+
+        res = train_model(db, args.train_csv, "risk_classifier", "artifacts", args.activate)
         db.commit()
+        print(f"✅ Retrain finished. model_id={res.model_id} version={res.version} artifact={res.artifact_path}")
 
     except Exception:
         db.rollback()
@@ -35,20 +71,6 @@ def main():
     finally:
         db.close()
 
-    # Trigger training script
-    cmd = [
-        sys.executable, "ml/risk_model_training.py",
-        "--train_csv", args.train_csv,
-        "--model_name", "risk_classifier",
-        "--artifacts_dir", "artifacts",
-    ]
-    if args.activate:
-        cmd.append("--activate")
-
-    print("Running:", " ".join(cmd))
-    subprocess.check_call(cmd)
-    print("✅ Retrain finished.")
-
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,108 @@
+# ml/risk_agg.py
+# Incrementally maintained risk aggregates:
+#   risk_label_daily_agg  (risk_label, model_id, score_day, slot) -> scored_cnt = customer_risk_score rows written that day
+#   risk_label_latest_agg (risk_label, model_id, slot)            -> latest_cnt = customers whose current latest
+#                                                                    score has that label/model
+# Each connection writes its own slot (CONNECTION_ID() mod AGG_SLOTS), so concurrent write-backs don't
+# queue on the same few rows for today's labels; reads SUM over the slots. The latest counter has no day
+# in its key, so reading the current distribution stays labels x models x slots however long it runs.
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, List, Optional
+
+from db import MySQL
+
+LABEL_ORDER = ("LOW", "MEDIUM", "HIGH")
+AGG_SLOTS = max(1, int(os.getenv("AGG_SLOTS", "16")))
+
+
+def _latest_delta(db: MySQL, stage_table: str, sign: int):
+    # +/- one per batch customer at the (label, model) of their current latest row
+    db.execute(
+        f"""
+        INSERT INTO risk_label_latest_agg (risk_label, model_id, slot, latest_cnt)
+        SELECT l.risk_label, l.model_id, MOD(CONNECTION_ID(), %s), %s * COUNT(*)
+        FROM customer_risk_score_latest l
+        WHERE l.customer_id IN (SELECT s.customer_id FROM {stage_table} s)
+        GROUP BY l.risk_label, l.model_id
+        ORDER BY l.risk_label, l.model_id
+        ON DUPLICATE KEY UPDATE latest_cnt = latest_cnt + VALUES(latest_cnt)
+        """,
+        (AGG_SLOTS, int(sign)),
+    )
+
+
+def remove_old_latest(db: MySQL, stage_table: str):
+    """Call before the latest-row upsert: retracts the batch customers' current latest rows."""
+    _latest_delta(db, stage_table, -1)
+
+
+def add_new_latest(db: MySQL, stage_table: str, model_id: int):
+    """Call after the latest-row upsert: counts the new latest rows and the new history rows."""
+    _latest_delta(db, stage_table, +1)
+    db.execute(
+        f"""
+        INSERT INTO risk_label_daily_agg (risk_label, model_id, score_day, slot, scored_cnt)
+        SELECT s.risk_label, %s, DATE(crs.scored_at), MOD(CONNECTION_ID(), %s), COUNT(*)
+        FROM {stage_table} s
+        JOIN customer_risk_score crs ON crs.risk_score_id = s.risk_score_id
+        GROUP BY s.risk_label, DATE(crs.scored_at)
+        ORDER BY s.risk_label, DATE(crs.scored_at)
+        ON DUPLICATE KEY UPDATE scored_cnt = scored_cnt + VALUES(scored_cnt)
+        """,
+        (int(model_id), AGG_SLOTS),
+    )
+
+
+def rebuild(db: MySQL) -> int:
+    """Recompute both tables from scratch (first deployment or after manual edits) into slot 0; caller commits."""
+    db.execute("DELETE FROM risk_label_daily_agg")
+    db.execute(
+        """
+        INSERT INTO risk_label_daily_agg (risk_label, model_id, score_day, scored_cnt)
+        SELECT risk_label, model_id, DATE(scored_at), COUNT(*)
+        FROM customer_risk_score
+        WHERE risk_label IS NOT NULL AND model_id IS NOT NULL
+        GROUP BY risk_label, model_id, DATE(scored_at)
+        """
+    )
+    db.execute("DELETE FROM risk_label_latest_agg")
+    db.execute(
+        """
+        INSERT INTO risk_label_latest_agg (risk_label, model_id, latest_cnt)
+        SELECT risk_label, model_id, COUNT(*)
+        FROM customer_risk_score_latest
+        WHERE risk_label IS NOT NULL AND model_id IS NOT NULL
+        GROUP BY risk_label, model_id
+        """
+    )
+    return int(db.fetchall("SELECT COUNT(*) FROM risk_label_daily_agg")[0][0])
+
+
+def latest_distribution(db: MySQL, model_id: Optional[int] = None) -> Dict[str, int]:
+    # current label distribution over customers (Q3b) without touching customer_risk_score_latest
+    where, params = ("WHERE model_id = %s", (int(model_id),)) if model_id else ("", ())
+    rows = db.fetchall(
+        f"SELECT risk_label, SUM(latest_cnt) FROM risk_label_latest_agg {where} GROUP BY risk_label",
+        params,
+    )
+    out = {lab: 0 for lab in LABEL_ORDER}
+    out.update({str(label): int(cnt or 0) for label, cnt in rows})
+    return out
+
+
+def scored_by_model(db: MySQL, days: int = 0) -> List[Dict[str, Any]]:
+    # history counts per model and label (Q3), optionally restricted to the last N days
+    where, params = ("WHERE a.score_day >= DATE_SUB(CURDATE(), INTERVAL %s DAY)", (int(days),)) if days else ("", ())
+    return db.fetchall_dict(
+        f"""
+        SELECT a.model_id, mm.model_version, a.risk_label, SUM(a.scored_cnt) AS scored_cnt
+        FROM risk_label_daily_agg a
+        LEFT JOIN ml_model_metadata mm ON mm.model_id = a.model_id
+        {where}
+        GROUP BY a.model_id, mm.model_version, a.risk_label
+        ORDER BY a.model_id, a.risk_label
+        """,
+        params,
+    )
@@ -2,253 +2,449 @@
 from __future__ import annotations
 
 import argparse
+import os
+import random
+import sys
+import time
 from pathlib import Path
-from typing import Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
-import joblib
+from db import DBConfig, MySQL, new_batch_id
+from metrics import default_metrics, profiled
+from model_cache import default_cache
+from prediction_cache import default_pred_cache
+from rescore import fetch_stale, rescore_window
+from writeback import write_back
 
-from db import DBConfig, MySQL
 
+def load_active_model(db: MySQL, model_name: str = "risk_classifier", artifact_override: str = "") -> Tuple[int, str, Any]:
+    model_id = db.get_active_model_id(model_name)
+    if model_id is None:
+        raise RuntimeError("No active model found in ml_model_metadata. Train & activate a model first.")
 
-def label_to_adjustment_pct(label: str) -> float:
-    # policy for demo/report
-    if label == "HIGH":
-        return 15.0
-    if label == "MEDIUM":
-        return 5.0
-    return 0.0
+    artifact_path = artifact_override.strip() or db.get_model_artifact_path(model_id)
+    if not artifact_path:
+        raise RuntimeError("Active model has empty artifact_path. Please set it in ml_model_metadata.")
 
+    if not Path(artifact_path).exists():
+        raise RuntimeError(f"Model artifact not found: {artifact_path}")
 
-def main():
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--batch_size", type=int, default=50)
-    ap.add_argument("--model_name", default="risk_classifier")
-    ap.add_argument("--artifact_override", default="", help="If provided, use this artifact path instead of active model")
-    ap.add_argument(
-        "--rescore_recent_days",
-        type=int,
-        default=0,
-        help="If >0, (re)score texts ingested within the last N days, even if already processed. "
-             "Unprocessed texts will still be marked processed; processed texts remain processed.",
-    )
-    args = ap.parse_args()
+    # MODEL_FORMAT=compact: score with the sklearn-free .npz export when one sits next to the artifact
+    if os.getenv("MODEL_FORMAT", "").strip().lower() == "compact" and not artifact_path.endswith(".npz"):
+        compact = str(Path(artifact_path).with_suffix(".npz"))
+        if Path(compact).exists():
+            artifact_path = compact
+
+    # LRU of loaded artifacts (memory-mapped arrays), keyed by model_id + artifact mtime/size
+    return model_id, artifact_path, default_cache.get(model_id, artifact_path)
 
-    db = MySQL(DBConfig.from_env())
-    try:
-        # 1) pick active model
-        model_id = db.get_active_model_id(args.model_name)
-        if model_id is None:
-            raise RuntimeError("No active model found in ml_model_metadata. Train & activate a model first.")
 
-        rows = db.fetchall_dict(
+def fetch_unprocessed(db: MySQL, batch_size: int, after: Optional[Tuple[Any, int]] = None) -> List[Dict[str, Any]]:
+    # Keyset page over ix_unstructured_text_processed_ingested: (is_processed, ingested_at) + implicit PK text_id
+    if after is None:
+        return db.fetchall_dict(
             """
-            SELECT model_id, artifact_path
-            FROM ml_model_metadata
-            WHERE model_id=%s
+            SELECT text_id, customer_id, raw_text, ingested_at
+            FROM unstructured_text
+            WHERE is_processed=0
+            ORDER BY ingested_at ASC, text_id ASC
+            LIMIT %s
             """,
-            (model_id,),
+            (int(batch_size),),
         )
-        artifact_path = args.artifact_override.strip() or rows[0]["artifact_path"]
-        if not artifact_path:
-            raise RuntimeError("Active model has empty artifact_path. Please set it in ml_model_metadata.")
+    last_ingested_at, last_text_id = after
+    if last_ingested_at is None:
+        # ingested_at is nullable and NULLs sort first: finish the NULL rows by text_id, then all dated rows
+        return db.fetchall_dict(
+            """
+            SELECT text_id, customer_id, raw_text, ingested_at
+            FROM unstructured_text
+            WHERE is_processed=0
+              AND ((ingested_at IS NULL AND text_id > %s) OR ingested_at IS NOT NULL)
+            ORDER BY ingested_at ASC, text_id ASC
+            LIMIT %s
+            """,
+            (int(last_text_id), int(batch_size)),
+        )
+    return db.fetchall_dict(
+        """
+        SELECT text_id, customer_id, raw_text, ingested_at
+        FROM unstructured_text
+        WHERE is_processed=0
+          AND (ingested_at > %s OR (ingested_at = %s AND text_id > %s))
+        ORDER BY ingested_at ASC, text_id ASC
+        LIMIT %s
+        """,
+        (last_ingested_at, last_ingested_at, int(last_text_id), int(batch_size)),
+    )
 
-        if not Path(artifact_path).exists():
-            raise RuntimeError(f"Model artifact not found: {artifact_path}")
 
-        model = joblib.load(artifact_path)
+def fetch_recent(db: MySQL, model_id: int, days: int, batch_size: int) -> List[Dict[str, Any]]:
+    # oldest texts in the window that the given model has not scored yet (repeat runs make progress)
+    window_start, window_end = db.fetchall("SELECT DATE_SUB(NOW(), INTERVAL %s DAY), NOW()", (int(days),))[0]
+    return fetch_stale(db, model_id, window_start, window_end, batch_size)
 
-        # 2) fetch texts to score
-        if args.rescore_recent_days and args.rescore_recent_days > 0:
-            texts = db.fetchall_dict(
-                """
-                SELECT text_id, customer_id, raw_text
-                FROM unstructured_text
-                WHERE ingested_at >= DATE_SUB(NOW(), INTERVAL %s DAY)
-                ORDER BY ingested_at ASC
-                LIMIT %s
-                """,
-                (int(args.rescore_recent_days), int(args.batch_size)),
-            )
-        else:
-            texts = db.fetchall_dict(
-                """
-                SELECT text_id, customer_id, raw_text
-                FROM unstructured_text
-                WHERE is_processed=0
-                ORDER BY ingested_at ASC
-                LIMIT %s
-                """,
-                (args.batch_size,),
-            )
 
-        if not texts:
-            if args.rescore_recent_days and args.rescore_recent_days > 0:
-                print(f"No recent texts found for rescore (last {args.rescore_recent_days} days). ✅ Nothing to do.")
-            else:
-                print("No unprocessed text found. ✅ Nothing to do.")
-            return
+def _score_and_write(db: MySQL, model_id: int, artifact_path: str, model: Any, texts: List[Dict[str, Any]]) -> int:
+    # shared per-batch step; spans/counters feed --metrics_json / --metrics_prom
+    default_metrics.inc("batches")
+    default_metrics.inc("rows_fetched", len(texts))
+    with default_metrics.span("score"):
+        scored = default_pred_cache.score(db, model_id, model, [t["raw_text"] for t in texts])
+    with default_metrics.span("write_back"):
+        n = write_back(db, model_id, artifact_path, texts, scored.labels, scored.scores)
+    default_metrics.inc("rows_scored", n)
+    return n
 
-        raw_list = [t["raw_text"] for t in texts]
-        preds = model.predict(raw_list)
 
-        # try to get probabilities for a score (0..1)
-        # if model supports predict_proba, use max class probability as risk_score
-        risk_scores = []
-        if hasattr(model, "predict_proba"):
-            proba = model.predict_proba(raw_list)
-            # max probability per sample as confidence proxy
-            risk_scores = [float(p.max()) for p in proba]
-        else:
-            risk_scores = [0.5 for _ in preds]
-
-        # 3) write back risk scores
-        inserts = []
-        for t, label, score in zip(texts, preds, risk_scores):
-            inserts.append((
-                int(t["customer_id"]),
-                int(t["text_id"]),
-                int(model_id),
-                str(label).upper(),
-                float(score),
-                f"artifact={Path(artifact_path).name}",
-            ))
-
-        db.executemany(
-            """
-            INSERT INTO customer_risk_score
-              (customer_id, text_id, model_id, risk_label, risk_score, explanation)
-            VALUES
-              (%s, %s, %s, %s, %s, %s)
-            """,
-            inserts
-        )
+def drain(
+    db: MySQL,
+    model_id: int,
+    artifact_path: str,
+    model: Any,
+    batch_size: int = 500,
+    max_seconds: float = 0.0,
+    max_rows: int = 0,
+) -> Dict[str, Any]:
+    """
+    Score unprocessed texts batch after batch until none are left or a budget is hit.
+    Each batch is written back and committed on its own; the (ingested_at, text_id)
+    keyset cursor moves forward so later batches never rescan already handled rows.
+    """
+    start = time.perf_counter()
+    cursor: Optional[Tuple[Any, int]] = None
+    total = 0
+    batches = 0
+    stop_reason = "drained"
 
-        # 3b) maintain "latest" risk per customer (optimization for dashboard/top)
-        # We keep history in customer_risk_score, and upsert the most recent record per customer.
-        latest_rows = []
-        for (customer_id, text_id, _model_id, risk_label, risk_score, explanation) in inserts:
-            rs = db.fetchall(
-                """
-                SELECT risk_score_id, scored_at
-                FROM customer_risk_score
-                WHERE customer_id=%s AND text_id=%s AND model_id=%s
-                ORDER BY scored_at DESC, risk_score_id DESC
-                LIMIT 1
-                """,
-                (int(customer_id), int(text_id), int(model_id)),
-            )
-            if not rs:
-                continue
-            risk_score_id = int(rs[0][0])
-            scored_at = rs[0][1]
-            latest_rows.append((
-                int(customer_id),
-                risk_score_id,
-                int(text_id),
-                int(model_id),
-                str(risk_label).upper(),
-                float(risk_score),
-                str(explanation),
-                scored_at,
-            ))
-
-        if latest_rows:
-            db.executemany(
-                """
-                INSERT INTO customer_risk_score_latest
-                  (customer_id, risk_score_id, text_id, model_id, risk_label, risk_score, explanation, scored_at)
-                VALUES
-                  (%s, %s, %s, %s, %s, %s, %s, %s)
-                ON DUPLICATE KEY UPDATE
-                  risk_score_id=VALUES(risk_score_id),
-                  text_id=VALUES(text_id),
-                  model_id=VALUES(model_id),
-                  risk_label=VALUES(risk_label),
-                  risk_score=VALUES(risk_score),
-                  explanation=VALUES(explanation),
-                  scored_at=VALUES(scored_at)
-                """,
-                latest_rows,
-            )
+    while True:
+        elapsed = time.perf_counter() - start
+        if max_seconds and elapsed >= max_seconds:
+            stop_reason = "max_seconds"
+            break
+        limit = int(batch_size)
+        if max_rows:
+            if total >= max_rows:
+                stop_reason = "max_rows"
+                break
+            limit = min(limit, int(max_rows) - total)
 
-        # mark unprocessed texts as processed (safe in both modes)
-        text_ids = [int(t["text_id"]) for t in texts]
-        # build IN (...) safely
-        placeholders = ",".join(["%s"] * len(text_ids))
-        db.execute(
-            f"""
-            UPDATE unstructured_text
-            SET is_processed=1, processed_at=NOW()
-            WHERE text_id IN ({placeholders}) AND is_processed=0
-            """,
-            tuple(text_ids),
-        )
+        t0 = time.perf_counter()
+        with default_metrics.span("fetch"):
+            texts = fetch_unprocessed(db, limit, after=cursor)
+        if not texts:
+            break
 
+        n = _score_and_write(db, model_id, artifact_path, model, texts)
         db.log_event(
-            event_type="RESCORE" if (args.rescore_recent_days and args.rescore_recent_days > 0) else "INFER",
+            event_type="INFER",
             entity_type="SYSTEM",
             entity_id=None,
             message=(
-                f"{'Rescore' if (args.rescore_recent_days and args.rescore_recent_days > 0) else 'Inference'} completed: "
-                f"model_id={model_id}, artifact={artifact_path}, texts_scored={len(text_ids)}, "
-                f"rescore_recent_days={int(args.rescore_recent_days)}"
+                f"Drain batch completed: model_id={model_id}, artifact={artifact_path}, "
+                f"texts_scored={n}, batch_no={batches + 1}"
             ),
+            duration_ms=(time.perf_counter() - t0) * 1000.0,
+            rows_in=len(texts),
+            rows_out=n,
+            model_id=model_id,
+            batch_id=new_batch_id(),
         )
+        with default_metrics.span("commit"):
+            db.commit()
+
+        cursor = (texts[-1]["ingested_at"], int(texts[-1]["text_id"]))
+        total += n
+        batches += 1
+        elapsed = time.perf_counter() - start
+        rate = total / elapsed if elapsed > 0 else 0.0
+        print(f"[drain] batch={batches} scored={n} total={total} elapsed={elapsed:.1f}s rate={rate:.1f} texts/sec")
+
+    elapsed = time.perf_counter() - start
+    return {
+        "texts_scored": total,
+        "batches": batches,
+        "elapsed_s": elapsed,
+        "texts_per_sec": (total / elapsed) if elapsed > 0 else 0.0,
+        "stop_reason": stop_reason,
+    }
+
+
+def claim_unprocessed(db: MySQL, batch_size: int) -> List[Dict[str, Any]]:
+    # Row locks are held until commit/rollback; concurrent workers skip them instead of waiting,
+    # and a crashed worker's locks vanish with its connection, so those rows are claimable again.
+    return db.fetchall_dict(
+        """
+        SELECT text_id, customer_id, raw_text, ingested_at
+        FROM unstructured_text
+        WHERE is_processed=0
+        ORDER BY ingested_at ASC, text_id ASC
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+        """,
+        (int(batch_size),),
+    )
+
+
+MAX_LOCK_RETRIES = 10  # consecutive deadlock / lock-wait failures before a worker gives up
+
+
+def worker_loop(
+    worker_no: int,
+    model_name: str = "risk_classifier",
+    artifact_override: str = "",
+    batch_size: int = 500,
+    max_seconds: float = 0.0,
+    max_rows: int = 0,
+) -> Dict[str, Any]:
+    """One scoring worker: claim a disjoint batch with SKIP LOCKED, score, write back, commit."""
+    db = MySQL(DBConfig.from_env())
+    start = time.perf_counter()
+    total = 0
+    batches = 0
+    retries = 0
+    consecutive = 0
+    try:
+        model_id, artifact_path, model = load_active_model(db, model_name, artifact_override)
+        db.commit()
+        while True:
+            if max_seconds and time.perf_counter() - start >= max_seconds:
+                break
+            limit = int(batch_size)
+            if max_rows:
+                if total >= max_rows:
+                    break
+                limit = min(limit, int(max_rows) - total)
+            try:
+                t0 = time.perf_counter()
+                with default_metrics.span("fetch"):
+                    texts = claim_unprocessed(db, limit)
+                if not texts:
+                    db.rollback()
+                    break
+                n = _score_and_write(db, model_id, artifact_path, model, texts)
+                db.log_event(
+                    event_type="INFER",
+                    entity_type="SYSTEM",
+                    entity_id=None,
+                    message=(
+                        f"Worker batch completed: worker={worker_no}, model_id={model_id}, "
+                        f"artifact={artifact_path}, texts_scored={n}"
+                    ),
+                    duration_ms=(time.perf_counter() - t0) * 1000.0,
+                    rows_in=len(texts),
+                    rows_out=n,
+                    model_id=model_id,
+                    batch_id=new_batch_id(),
+                )
+                with default_metrics.span("commit"):
+                    db.commit()
+            except Exception as e:
+                db.rollback()
+                # deadlock / lock wait timeout on shared latest rows: release the claim, back off with
+                # jitter so the colliding workers don't retry in lockstep, and retry
+                if getattr(e, "errno", None) in (1205, 1213) and consecutive < MAX_LOCK_RETRIES:
+                    retries += 1
+                    consecutive += 1
+                    time.sleep(min(2.0, 0.05 * 2 ** consecutive) * random.uniform(0.5, 1.0))
+                    continue
+                raise
+            total += n
+            batches += 1
+            consecutive = 0
+    finally:
+        db.close()
+
+    elapsed = time.perf_counter() - start
+    return {
+        "worker": worker_no,
+        "texts_scored": total,
+        "batches": batches,
+        "retries": retries,
+        "elapsed_s": elapsed,
+        "cache_hit_rate": default_pred_cache.stats()["hit_rate"],
+        "metrics": default_metrics.snapshot(),
+    }
+
 
-        # 4) create premium adjustment suggestions (for ACTIVE policies only)
-        # policy: based on latest risk per customer, update suggestion table
-        # (simple demo: insert suggestions; you can choose to prevent duplicates in app layer)
-        for t, label in zip(texts, preds):
-            customer_id = int(t["customer_id"])
-            pct = float(label_to_adjustment_pct(str(label).upper()))
-
-            # find customer's active policy
-            pol = db.fetchall_dict(
-                """
-                SELECT policy_id, base_premium
-                FROM policy
-                WHERE customer_id=%s AND status='ACTIVE'
-                ORDER BY policy_id ASC
-                LIMIT 1
-                """,
-                (customer_id,),
+def run_workers(
+    workers: int,
+    model_name: str = "risk_classifier",
+    artifact_override: str = "",
+    batch_size: int = 500,
+    max_seconds: float = 0.0,
+    max_rows: int = 0,
+) -> Dict[str, Any]:
+    # spawn: every worker opens its own connection and memory-maps the artifact
+    import multiprocessing as mp
+    from concurrent.futures import ProcessPoolExecutor
+
+    start = time.perf_counter()
+    per_worker_rows = -(-int(max_rows) // int(workers)) if max_rows else 0
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn")) as ex:
+        futures = [
+            ex.submit(worker_loop, i, model_name, artifact_override, batch_size, max_seconds, per_worker_rows)
+            for i in range(workers)
+        ]
+        results = [f.result() for f in futures]
+    for r in results:
+        default_metrics.merge(r.pop("metrics", {}))
+    elapsed = time.perf_counter() - start
+    total = sum(r["texts_scored"] for r in results)
+    return {
+        "workers": results,
+        "texts_scored": total,
+        "elapsed_s": elapsed,
+        "texts_per_sec": (total / elapsed) if elapsed > 0 else 0.0,
+    }
+
+
+def run_inference(
+    db: MySQL,
+    model_id: int,
+    artifact_path: str,
+    model: Any,
+    batch_size: int = 50,
+    rescore_recent_days: int = 0,
+) -> int:
+    """Score one batch (unprocessed texts, or a recent window when rescoring) and commit it."""
+    rescore = bool(rescore_recent_days and rescore_recent_days > 0)
+    t0 = time.perf_counter()
+
+    # 2) fetch texts to score
+    with default_metrics.span("fetch"):
+        if rescore:
+            texts = fetch_recent(db, model_id, rescore_recent_days, batch_size)
+        else:
+            texts = fetch_unprocessed(db, batch_size)
+
+    if not texts:
+        if rescore:
+            print(f"No texts left to rescore with model_id={model_id} (last {rescore_recent_days} days). ✅ Nothing to do.")
+        else:
+            print("No unprocessed text found. ✅ Nothing to do.")
+        return 0
+
+    # single transform + predict_proba per batch, then set-based write-back: risk history,
+    # latest-per-customer, premium suggestions, processed flag (constant number of round trips per batch)
+    n_scored = _score_and_write(db, model_id, artifact_path, model, texts)
+
+    db.log_event(
+        event_type="RESCORE" if rescore else "INFER",
+        entity_type="SYSTEM",
+        entity_id=None,
+        message=(
+            f"{'Rescore' if rescore else 'Inference'} completed: "
+            f"model_id={model_id}, artifact={artifact_path}, texts_scored={n_scored}, "
+            f"rescore_recent_days={int(rescore_recent_days)}"
+        ),
+        duration_ms=(time.perf_counter() - t0) * 1000.0,
+        rows_in=len(texts),
+        rows_out=n_scored,
+        model_id=model_id,
+        batch_id=new_batch_id(),
+    )
+
+    with default_metrics.span("commit"):
+        db.commit()
+    print(f"✅ Done. Scored {n_scored} text(s). Risk scores + suggestions written back to MySQL.")
+    print(f"Used model_id={model_id}, artifact={artifact_path}")
+    return n_scored
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--batch_size", type=int, default=50)
+    ap.add_argument("--model_name", default="risk_classifier")
+    ap.add_argument("--artifact_override", default="", help="If provided, use this artifact path instead of active model")
+    ap.add_argument(
+        "--rescore_recent_days",
+        type=int,
+        default=0,
+        help="If >0, rescore texts ingested within the last N days that the active model has not scored yet, "
+             "walking the window with a resumable checkpoint (--max_seconds/--max_rows bound one run).",
+    )
+    ap.add_argument("--drain", action="store_true", help="Keep scoring batches until no unprocessed texts remain")
+    ap.add_argument("--max_seconds", type=float, default=0.0, help="With --drain/--rescore_recent_days: stop after this many seconds (0 = no limit)")
+    ap.add_argument("--max_rows", type=int, default=0, help="With --drain/--rescore_recent_days: stop after scoring this many texts (0 = no limit)")
+    ap.add_argument(
+        "--workers",
+        type=int,
+        default=0,
+        help="If >0, drain with N parallel worker processes claiming disjoint batches (FOR UPDATE SKIP LOCKED)",
+    )
+    ap.add_argument("--metrics_json", default="", help="Write stage timings / row and DB round-trip counters as JSON here")
+    ap.add_argument("--metrics_prom", default="", help="Write the same metrics in Prometheus textfile format (node_exporter textfile collector)")
+    ap.add_argument("--profile", action="store_true", help="Capture cProfile + tracemalloc output for this run (adds overhead)")
+    ap.add_argument("--profile_dir", default="artifacts/profiles")
+    args = ap.parse_args()
+
+    try:
+        if args.profile:
+            with profiled(args.profile_dir, "inference"):
+                _run(args)
+        else:
+            _run(args)
+    finally:
+        print(default_metrics.report())
+        if args.metrics_json:
+            default_metrics.write_json(args.metrics_json, {"argv": sys.argv[1:]})
+        if args.metrics_prom:
+            default_metrics.write_prometheus(args.metrics_prom, {"job": "risk_inference"})
+
+
+def _run(args: argparse.Namespace):
+    if args.workers and args.workers > 0:
+        if args.rescore_recent_days and args.rescore_recent_days > 0:
+            raise SystemExit("--workers cannot be combined with --rescore_recent_days")
+        stats = run_workers(
+            args.workers, args.model_name, args.artifact_override, args.batch_size, args.max_seconds, args.max_rows
+        )
+        for w in stats["workers"]:
+            print(
+                f"[worker {w['worker']}] scored={w['texts_scored']} batches={w['batches']} retries={w['retries']} "
+                f"elapsed={w['elapsed_s']:.1f}s cache_hit_rate={w['cache_hit_rate']:.1%}"
             )
-            if not pol:
-                continue
-
-            policy_id = int(pol[0]["policy_id"])
-            base_premium = float(pol[0]["base_premium"])
-
-            # find latest risk_score_id for this customer and this text and model
-            rs = db.fetchall(
-                """
-                SELECT risk_score_id, risk_score
-                FROM customer_risk_score
-                WHERE customer_id=%s AND text_id=%s AND model_id=%s
-                ORDER BY scored_at DESC, risk_score_id DESC
-                LIMIT 1
-                """,
-                (customer_id, int(t["text_id"]), int(model_id)),
+        print(
+            f"✅ Workers finished. Scored {stats['texts_scored']} text(s) with {args.workers} worker(s) in "
+            f"{stats['elapsed_s']:.1f}s, {stats['texts_per_sec']:.1f} texts/sec."
+        )
+        return
+
+    db = MySQL(DBConfig.from_env())
+    try:
+        # 1) pick active model
+        with default_metrics.span("load_model"):
+            model_id, artifact_path, model = load_active_model(db, args.model_name, args.artifact_override)
+        st = default_cache.stats()
+        print(f"Model load: {st['last_load_s']:.3f}s, rss_delta={st['last_rss_delta_mb']:.1f}MB, mmap_mode={st['mmap_mode']}")
+
+        if args.drain:
+            if args.rescore_recent_days and args.rescore_recent_days > 0:
+                raise SystemExit("--drain cannot be combined with --rescore_recent_days")
+            stats = drain(db, model_id, artifact_path, model, args.batch_size, args.max_seconds, args.max_rows)
+            print(
+                f"✅ Drain finished ({stats['stop_reason']}). Scored {stats['texts_scored']} text(s) in "
+                f"{stats['batches']} batch(es), {stats['elapsed_s']:.1f}s, {stats['texts_per_sec']:.1f} texts/sec."
             )
-            if not rs:
-                continue
-
-            risk_score_id = int(rs[0][0])
-            suggested = round(base_premium * (1.0 + pct / 100.0), 2)
-
-            db.execute(
-                """
-                INSERT INTO policy_premium_adjustment
-                  (policy_id, customer_id, model_id, risk_score_id, adjustment_pct, suggested_premium, decision_status)
-                VALUES
-                  (%s, %s, %s, %s, %s, %s, 'SUGGESTED')
-                """,
-                (policy_id, customer_id, int(model_id), risk_score_id, pct, suggested),
+            print(f"Used model_id={model_id}, artifact={artifact_path}")
+            print(default_pred_cache.report())
+            return
+
+        if args.rescore_recent_days and args.rescore_recent_days > 0:
+            stats = rescore_window(
+                db, model_id, artifact_path, model, args.rescore_recent_days, args.batch_size, args.max_seconds, args.max_rows
             )
+            print(
+                f"✅ Rescore {stats['stop_reason']}. Scored {stats['texts_scored']} text(s) this run, "
+                f"{stats['rows_done']}/{stats['rows_todo']} in window, {stats['texts_per_sec']:.1f} texts/sec."
+            )
+            print(f"Used model_id={model_id}, artifact={artifact_path}")
+            print(default_pred_cache.report())
+            return
 
-        db.commit()
-        print(f"✅ Done. Scored {len(text_ids)} text(s). Risk scores + suggestions written back to MySQL.")
-        print(f"Used model_id={model_id}, artifact={artifact_path}")
+        run_inference(db, model_id, artifact_path, model, args.batch_size)
+        print(default_pred_cache.report())
 
     except Exception:
         db.rollback()
@@ -2,10 +2,13 @@
 from __future__ import annotations
 
 import argparse
+import json
 import os
 import uuid
+from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
+from typing import Any, Optional, Tuple
 
 import joblib
 import pandas as pd
@@ -16,38 +19,51 @@ from sklearn.model_selection import train_test_split
 from sklearn.metrics import f1_score
 
 from db import DBConfig, MySQL
+from prediction_cache import invalidate_inactive
 from text_prep import normalize_text
+from trigger_signals import mark_trained
 
 
 LABELS = {"LOW", "MEDIUM", "HIGH"}
 
 
-def build_pipeline() -> Pipeline:
+def build_pipeline(
+    ngram_range: Tuple[int, int] = (1, 2),
+    max_features: Optional[int] = 5000,
+    C: float = 1.0,
+    memory: Any = None,
+) -> Pipeline:
+    # memory: optional joblib cache for the fitted TF-IDF stage (used by the CV search)
     return Pipeline(
         steps=[
             ("tfidf", TfidfVectorizer(
                 preprocessor=normalize_text,
-                ngram_range=(1, 2),
+                ngram_range=tuple(ngram_range),
                 min_df=1,
-                max_features=5000,
+                max_features=max_features,
             )),
             ("clf", LogisticRegression(
                 max_iter=1000,
-                multi_class="auto",
+                C=C,
             )),
-        ]
+        ],
+        memory=memory,
     )
 
 
-def main():
-    ap = argparse.ArgumentParser()
-    ap.add_argument("--train_csv", required=True, help="CSV with columns: raw_text,label")
-    ap.add_argument("--model_name", default="risk_classifier")
-    ap.add_argument("--artifacts_dir", default="artifacts")
-    ap.add_argument("--activate", action="store_true", help="Set newly trained model active")
-    args = ap.parse_args()
+@dataclass
+class TrainResult:
+    model_id: int
+    model_name: str
+    version: str
+    artifact_path: str
+    f1: float
+    activated: bool
+    pipeline: Pipeline
 
-    df = pd.read_csv(args.train_csv)
+
+def load_training_data(train_csv: str) -> Tuple[pd.Series, pd.Series]:
+    df = pd.read_csv(train_csv)
     if "raw_text" not in df.columns or "label" not in df.columns:
         raise ValueError("Training CSV must have columns: raw_text,label")
 
@@ -56,8 +72,91 @@ def main():
     if not bad.empty:
         raise ValueError(f"Invalid labels found: {sorted(bad['label'].unique().tolist())}. Allowed: {sorted(LABELS)}")
 
-    X = df["raw_text"].astype(str)
-    y = df["label"].astype(str)
+    return df["raw_text"].astype(str), df["label"].astype(str)
+
+
+def save_artifact(pipe: Pipeline, artifacts_dir: str, model_name: str) -> Tuple[str, str]:
+    Path(artifacts_dir).mkdir(parents=True, exist_ok=True)
+    version = f"v{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
+    artifact_path = str(Path(artifacts_dir) / f"{model_name}_{version}.joblib")
+    # uncompressed so inference workers can load it with mmap_mode and share the arrays
+    joblib.dump(pipe, artifact_path, compress=0)
+    return version, artifact_path
+
+
+def register_model(
+    db: MySQL,
+    model_name: str,
+    version: str,
+    algorithm: str,
+    f1: float,
+    activate: bool,
+    artifact_path: str,
+    notes: str,
+    metric_name: str = "F1",
+) -> int:
+    # deactivate old if activating
+    if activate:
+        db.execute(
+            "UPDATE ml_model_metadata SET is_active=0 WHERE model_name=%s",
+            (model_name,),
+        )
+
+    db.execute(
+        """
+        INSERT INTO ml_model_metadata
+        (model_name, model_version, algorithm, trained_at,
+         trained_data_from, trained_data_to, eval_metric_name, eval_metric_value,
+         is_active, artifact_path, notes)
+        VALUES
+        (%s, %s, %s, NOW(), NULL, NULL, %s, %s, %s, %s, %s)
+        """,
+        (
+            model_name,
+            version,
+            algorithm,
+            metric_name,
+            float(f1),
+            1 if activate else 0,
+            artifact_path,
+            notes,
+        ),
+    )
+    model_id = int(db.fetchall("SELECT LAST_INSERT_ID()")[0][0])
+    # reset the "ingested since last training" trigger counter, but only when the new model serves:
+    # an inactive candidate leaves the baseline with the model that is still scoring
+    if activate:
+        mark_trained(db)
+    if activate:
+        db.log_event(
+            event_type="MODEL_ACTIVATE",
+            entity_type="MODEL",
+            entity_id=model_id,
+            message=f"Activated model {model_name} {version}",
+            model_id=model_id,
+        )
+        # cached predictions of the versions just deactivated are never served again
+        invalidate_inactive(db, model_name)
+    # log event
+    db.log_event(
+        event_type="RETRAIN_END",
+        entity_type="MODEL",
+        entity_id=model_id,
+        message=f"Trained {model_name} {version}; F1(macro)={f1:.4f}; activate={activate}; artifact={artifact_path}",
+        model_id=model_id,
+    )
+    return model_id
+
+
+def train_model(
+    db: MySQL,
+    train_csv: str,
+    model_name: str = "risk_classifier",
+    artifacts_dir: str = "artifacts",
+    activate: bool = False,
+) -> TrainResult:
+    """Fit, save and register a model on an open connection (caller commits)."""
+    X, y = load_training_data(train_csv)
 
     # If dataset is very small, train on full data to avoid stratification issues
     pipe = build_pipeline()
@@ -67,55 +166,87 @@ def main():
     f1 = 1.0
 
     # Save artifact
-    Path(args.artifacts_dir).mkdir(parents=True, exist_ok=True)
-    version = f"v{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
-    artifact_path = str(Path(args.artifacts_dir) / f"{args.model_name}_{version}.joblib")
-    joblib.dump(pipe, artifact_path)
+    version, artifact_path = save_artifact(pipe, artifacts_dir, model_name)
 
     # Write metadata to MySQL
+    model_id = register_model(
+        db,
+        model_name,
+        version,
+        "TFIDF+LogReg",
+        f1,
+        activate,
+        artifact_path,
+        f"Trained from CSV={os.path.basename(train_csv)}",
+    )
+    return TrainResult(model_id, model_name, version, artifact_path, f1, activate, pipe)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--train_csv", default="", help="CSV with columns: raw_text,label")
+    ap.add_argument("--train_query", default="", help="Incremental mode: SQL returning (raw_text, label) rows, streamed from MySQL")
+    ap.add_argument("--model_name", default="risk_classifier")
+    ap.add_argument("--artifacts_dir", default="artifacts")
+    ap.add_argument("--activate", action="store_true", help="Set newly trained model active")
+    ap.add_argument(
+        "--mode",
+        default="full",
+        choices=["full", "cv", "incremental"],
+        help="full: refit TF-IDF + LogReg; cv: parallel stratified-CV grid search, refit the best; "
+        "incremental: stream chunks into hashing + partial_fit SGD, warm-started",
+    )
+    ap.add_argument("--chunksize", type=int, default=50000, help="Incremental mode: rows per partial_fit chunk")
+    ap.add_argument("--no_warm_start", action="store_true", help="Incremental mode: do not continue from the active model")
+    ap.add_argument("--export_compact", action="store_true", help="Also write a NumPy-only .npz next to the artifact and verify it")
+    ap.add_argument("--prune_below", type=float, default=0.0, help="With --export_compact: drop n-grams with max |coef| below this")
+    ap.add_argument("--grid", default="", help='CV mode: JSON overriding grid keys, e.g. {"C": [0.5, 1, 2]}')
+    ap.add_argument("--cv_folds", type=int, default=5, help="CV mode: stratified folds (capped by the rarest label)")
+    ap.add_argument("--n_jobs", type=int, default=0, help="CV mode: worker processes (0 = all cores)")
+    ap.add_argument("--max_seconds", type=float, default=300.0, help="CV mode: hard wall-clock cutoff for the search, running fits are killed (0 = none)")
+    ap.add_argument("--cache_dir", default="", help="CV mode: keep the fitted TF-IDF cache here (default: temp dir)")
+    args = ap.parse_args()
+
+    if args.mode in ("full", "cv") and not args.train_csv:
+        raise SystemExit(f"--train_csv is required in {args.mode} mode")
+    if args.mode == "incremental" and not (args.train_csv or args.train_query):
+        raise SystemExit("incremental mode requires --train_csv or --train_query")
+
     db = MySQL(DBConfig.from_env())
     try:
-        # deactivate old if activating
-        if args.activate:
-            db.execute(
-                "UPDATE ml_model_metadata SET is_active=0 WHERE model_name=%s",
-                (args.model_name,),
+        if args.mode == "incremental":
+            from incremental_training import train_incremental
+
+            res = train_incremental(
+                db,
+                train_csv=args.train_csv,
+                train_query=args.train_query,
+                model_name=args.model_name,
+                artifacts_dir=args.artifacts_dir,
+                activate=args.activate,
+                chunksize=args.chunksize,
+                warm_start=not args.no_warm_start,
             )
+        elif args.mode == "cv":
+            from model_search import DEFAULT_GRID, train_cv
 
-        db.execute(
-            """
-            INSERT INTO ml_model_metadata
-            (model_name, model_version, algorithm, trained_at,
-             trained_data_from, trained_data_to, eval_metric_name, eval_metric_value,
-             is_active, artifact_path, notes)
-            VALUES
-            (%s, %s, %s, NOW(), NULL, NULL, %s, %s, %s, %s, %s)
-            """,
-            (
-                args.model_name,
-                version,
-                "TFIDF+LogReg",
-                "F1",
-                float(f1),
-                1 if args.activate else 0,
-                artifact_path,
-                f"Trained from CSV={os.path.basename(args.train_csv)}",
-            ),
-        )
-        if args.activate:
-            db.log_event(
-                event_type="MODEL_ACTIVATE",
-                entity_type="MODEL",
-                entity_id=None,
-                message=f"Activated model {args.model_name} {version}",
+            grid = dict(DEFAULT_GRID)
+            if args.grid:
+                grid.update({k: [tuple(v) if isinstance(v, list) else v for v in vals] for k, vals in json.loads(args.grid).items()})
+            res = train_cv(
+                db,
+                args.train_csv,
+                model_name=args.model_name,
+                artifacts_dir=args.artifacts_dir,
+                activate=args.activate,
+                grid=grid,
+                cv_folds=args.cv_folds,
+                n_jobs=args.n_jobs,
+                max_seconds=args.max_seconds,
+                cache_dir=args.cache_dir,
             )
-        # log event
-        db.log_event(
-            event_type="RETRAIN_END",
-            entity_type="MODEL",
-            entity_id=None,
-            message=f"Trained {args.model_name} {version}; F1(macro)={f1:.4f}; activate={args.activate}; artifact={artifact_path}",
-        )
+        else:
+            res = train_model(db, args.train_csv, args.model_name, args.artifacts_dir, args.activate)
         db.commit()
     except Exception:
         db.rollback()
@@ -124,10 +255,25 @@ def main():
         db.close()
 
     print("✅ Training complete")
-    print(f"Model version: {version}")
-    print(f"Artifact: {artifact_path}")
-    print(f"F1(macro): {f1:.4f}")
-    print(f"Activated: {args.activate}")
+    print(f"Model version: {res.version}")
+    print(f"Artifact: {res.artifact_path}")
+    print(f"F1(macro): {res.f1:.4f}")
+    print(f"Activated: {res.activated}")
+
+    if args.export_compact:
+        if args.mode == "incremental":
+            raise SystemExit("--export_compact supports TF-IDF models (full/cv modes), not hashing models")
+        from compact_model import compact_path_for, export_compact, load_compact, verify
+
+        out = compact_path_for(res.artifact_path)
+        st = export_compact(res.pipeline, out, args.prune_below)
+        X, _ = load_training_data(args.train_csv)
+        v = verify(res.pipeline, load_compact(out), X.tolist())
+        print(f"Compact export: {out} kept {st['kept']}/{st['terms']} terms, {st['bytes'] / 1024:.1f} KiB")
+        print(
+            f"Compact vs joblib on {v['n']} training texts: label_agreement={v['label_agreement']:.4f}, "
+            f"max_abs_proba_diff={v['max_abs_proba_diff']:.2e}"
+        )
 
 
 if __name__ == "__main__":
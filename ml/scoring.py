@@ -0,0 +1,58 @@
+# ml/scoring.py
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Optional, Sequence
+
+import numpy as np
+
+from metrics import default_metrics
+
+
+@dataclass
+class ScoreBatch:
+    labels: np.ndarray  # upper-case label per text (dtype object)
+    scores: np.ndarray  # float64 max class probability per text
+    proba: Optional[np.ndarray] = None  # (n_texts, n_classes), None if the model has no predict_proba
+
+    def __len__(self) -> int:
+        return int(self.labels.shape[0])
+
+
+def _split_pipeline(model: Any):
+    # sklearn Pipeline -> (feature stages, final estimator); anything else is scored directly
+    steps = getattr(model, "steps", None)
+    if steps:
+        return [s for _, s in steps[:-1] if s not in (None, "passthrough")], steps[-1][1]
+    return [], model
+
+
+def score_batch(model: Any, raw_list: Sequence[str]) -> ScoreBatch:
+    """
+    Vectorize-once scoring kernel: text normalization + TF-IDF run a single time per batch,
+    the sparse matrix is reused, and labels/scores come from one probability matrix with
+    vectorized argmax/max (equivalent to predict() + predict_proba().max()).
+    """
+    n = len(raw_list)
+    if n == 0:
+        return ScoreBatch(np.empty(0, dtype=object), np.empty(0, dtype=np.float64), None)
+
+    stages, clf = _split_pipeline(model)
+    X: Any = list(raw_list)
+    with default_metrics.span("tfidf"):
+        for stage in stages:
+            X = stage.transform(X)
+
+    if hasattr(clf, "predict_proba"):
+        with default_metrics.span("predict_proba"):
+            proba = np.asarray(clf.predict_proba(X))
+        idx = proba.argmax(axis=1)
+        labels = np.asarray(clf.classes_, dtype=object)[idx]
+        scores = proba[np.arange(n), idx].astype(np.float64)
+    else:
+        proba = None
+        labels = np.asarray(clf.predict(X), dtype=object)
+        scores = np.full(n, 0.5, dtype=np.float64)
+
+    labels = np.char.upper(labels.astype(str)).astype(object)
+    return ScoreBatch(labels, scores, proba)
@@ -0,0 +1,379 @@
+# ml/scoring_service.py
+# Long-running local scoring service: HTTP (TCP or Unix socket) + micro-batching.
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from db import DBConfig, MySQL, new_batch_id
+from metrics import default_metrics
+from risk_model_inference import load_active_model
+from prediction_cache import default_pred_cache
+from trigger_signals import INGESTED_TOTAL, bump_counter
+from writeback import write_back
+
+SOURCE_TYPES = {"CLAIM_DESCRIPTION", "CUSTOMER_REVIEW", "SUPPORT_CHAT", "OTHER"}
+
+
+@dataclass
+class ScoreRequest:
+    customer_id: int
+    raw_text: str
+    source_type: str = "OTHER"
+    text_id: Optional[int] = None  # already ingested text; otherwise the service ingests it
+    enqueued_at: float = field(default_factory=time.perf_counter)
+    future: Optional[asyncio.Future] = None
+
+
+class QueueFull(Exception):
+    pass
+
+
+class ServiceMetrics:
+    def __init__(self, window: int = 10000):
+        self.latencies_ms: Deque[float] = deque(maxlen=window)
+        self.requests = 0
+        self.rejected = 0
+        self.failed = 0
+        self.batches = 0
+        self.batch_rows = 0
+        self.started_at = time.time()
+
+    def snapshot(self, queue_depth: int) -> Dict[str, Any]:
+        lat = np.asarray(self.latencies_ms, dtype=np.float64)
+        out: Dict[str, Any] = {
+            "uptime_s": round(time.time() - self.started_at, 1),
+            "requests": self.requests,
+            "rejected": self.rejected,
+            "failed": self.failed,
+            "batches": self.batches,
+            "avg_batch_size": round(self.batch_rows / self.batches, 2) if self.batches else 0.0,
+            "queue_depth": queue_depth,
+        }
+        if lat.size:
+            out.update({
+                "latency_p50_ms": round(float(np.percentile(lat, 50)), 3),
+                "latency_p95_ms": round(float(np.percentile(lat, 95)), 3),
+                "latency_p99_ms": round(float(np.percentile(lat, 99)), 3),
+            })
+        return out
+
+
+class MicroBatcher:
+    """
+    Collects score requests into micro-batches (flush at max_batch rows or after max_wait_ms),
+    runs one vectorized predict per batch and writes results back through the usual tables.
+    The bounded queue is the backpressure point: when it is full, requests are rejected at once.
+    DB work happens on a single worker thread that owns the connection.
+    """
+
+    def __init__(self, db: MySQL, model_id: int, artifact_path: str, model: Any,
+                 max_batch: int = 256, max_wait_ms: float = 5.0, max_queue: int = 10000):
+        self.db = db
+        self.model_id = model_id
+        self.artifact_path = artifact_path
+        self.model = model
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait_s = max(0.0, float(max_wait_ms)) / 1000.0
+        self.queue: "asyncio.Queue[ScoreRequest]" = asyncio.Queue(maxsize=max(1, int(max_queue)))
+        self.metrics = ServiceMetrics()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="score-db")
+
+    async def submit(self, req: ScoreRequest) -> Dict[str, Any]:
+        return (await self.submit_many([req]))[0]
+
+    def _enqueue_all(self, reqs: List[ScoreRequest]) -> List["asyncio.Future"]:
+        # all-or-nothing: without an await between the room check and the puts, no item of a rejected
+        # request is ever queued (and so never ingested or scored)
+        if len(reqs) > self.queue.maxsize:
+            raise ValueError(f"request has {len(reqs)} items, more than the queue can hold ({self.queue.maxsize})")
+        if self.queue.maxsize - self.queue.qsize() < len(reqs):
+            self.metrics.rejected += len(reqs)
+            raise QueueFull()
+        loop = asyncio.get_running_loop()
+        for req in reqs:
+            req.future = loop.create_future()
+            self.queue.put_nowait(req)
+        self.metrics.requests += len(reqs)
+        return [req.future for req in reqs]
+
+    async def submit_many(self, reqs: List[ScoreRequest]) -> List[Any]:
+        """Queue every item or none (QueueFull); results are per item, failed items hold their exception."""
+        futures = self._enqueue_all(reqs)
+        return list(await asyncio.gather(*futures, return_exceptions=True))
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait_s
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                results = await loop.run_in_executor(self._executor, self._process, batch)
+            except Exception as e:
+                self.metrics.failed += len(batch)
+                for req in batch:
+                    if not req.future.done():
+                        req.future.set_exception(e)
+                continue
+            now = time.perf_counter()
+            self.metrics.batches += 1
+            self.metrics.batch_rows += len(batch)
+            for req, res in zip(batch, results):
+                if req.future.done():
+                    continue
+                if isinstance(res, Exception):
+                    self.metrics.failed += 1
+                    req.future.set_exception(res)
+                else:
+                    self.metrics.latencies_ms.append((now - req.enqueued_at) * 1000.0)
+                    req.future.set_result(res)
+
+    def _ingest(self, reqs: List[ScoreRequest]):
+        # one multi-row INSERT; a single simple INSERT gets consecutive auto-increment ids
+        values = ",".join(["(%s, %s, %s, 0)"] * len(reqs))
+        params: List[Any] = []
+        for r in reqs:
+            params.extend((r.customer_id, r.source_type, r.raw_text))
+        self.db.execute(
+            f"INSERT INTO unstructured_text(customer_id, source_type, raw_text, is_processed) VALUES {values}",
+            tuple(params),
+        )
+        bump_counter(self.db, INGESTED_TOTAL, len(reqs))
+        first_id, step = self.db.fetchall("SELECT LAST_INSERT_ID(), @@auto_increment_increment")[0]
+        for i, r in enumerate(reqs):
+            r.text_id = int(first_id) + i * int(step)
+
+    def _validate(self, batch: List[ScoreRequest]) -> List[Optional[Exception]]:
+        """Per-request errors for unknown customers and client text_ids that are missing or belong to someone else."""
+        db = self.db
+        cids = sorted({r.customer_id for r in batch})
+        known = {int(c) for (c,) in db.fetchall(
+            f"SELECT customer_id FROM customer WHERE customer_id IN ({','.join(['%s'] * len(cids))})", tuple(cids)
+        )}
+        tids = sorted({r.text_id for r in batch if r.text_id is not None})
+        owner: Dict[int, int] = {}
+        if tids:
+            owner = {int(t): int(c) for t, c in db.fetchall(
+                f"SELECT text_id, customer_id FROM unstructured_text WHERE text_id IN ({','.join(['%s'] * len(tids))})",
+                tuple(tids),
+            )}
+        errors: List[Optional[Exception]] = []
+        for r in batch:
+            if r.customer_id not in known:
+                errors.append(ValueError(f"unknown customer_id {r.customer_id}"))
+            elif r.text_id is not None and owner.get(r.text_id) != r.customer_id:
+                errors.append(ValueError(f"text_id {r.text_id} does not exist for customer_id {r.customer_id}"))
+            else:
+                errors.append(None)
+        return errors
+
+    def _process(self, batch: List[ScoreRequest]) -> List[Any]:
+        """
+        Results aligned with batch; invalid requests get their own ValueError. If the valid part still fails
+        as a whole, its requests are retried one per transaction so a single bad row fails only itself.
+        """
+        out: List[Any] = self._validate(batch)
+        valid = [i for i, e in enumerate(out) if e is None]
+        if not valid:
+            self.db.rollback()
+            return out
+        try:
+            for i, res in zip(valid, self._score_commit([batch[i] for i in valid])):
+                out[i] = res
+        except Exception as e:
+            if len(valid) == 1:
+                out[valid[0]] = e
+                return out
+            for i in valid:
+                try:
+                    out[i] = self._score_commit([batch[i]])[0]
+                except Exception as e:
+                    out[i] = e
+        return out
+
+    def _score_commit(self, batch: List[ScoreRequest]) -> List[Dict[str, Any]]:
+        db = self.db
+        t0 = time.perf_counter()
+        new = [r for r in batch if r.text_id is None]
+        try:
+            if new:
+                self._ingest(new)
+            texts = [{"text_id": r.text_id, "customer_id": r.customer_id, "raw_text": r.raw_text} for r in batch]
+            scored = default_pred_cache.score(db, self.model_id, self.model, [r.raw_text for r in batch])
+            write_back(db, self.model_id, self.artifact_path, texts, scored.labels, scored.scores)
+            db.log_event(
+                "INFER",
+                "SYSTEM",
+                None,
+                f"Service micro-batch completed: model_id={self.model_id}, texts_scored={len(batch)}, ingested={len(new)}",
+                duration_ms=(time.perf_counter() - t0) * 1000.0,
+                rows_in=len(batch),
+                rows_out=len(batch),
+                model_id=self.model_id,
+                batch_id=new_batch_id(),
+            )
+            db.commit()
+        except Exception:
+            db.rollback()
+            # ids assigned by the rolled-back ingest do not exist; a retry ingests again
+            for r in new:
+                r.text_id = None
+            raise
+        return [
+            {
+                "text_id": r.text_id,
+                "customer_id": r.customer_id,
+                "risk_label": str(label),
+                "risk_score": round(float(score), 6),
+                "model_id": self.model_id,
+            }
+            for r, label, score in zip(batch, scored.labels, scored.scores)
+        ]
+
+
+# ---------- Minimal HTTP/1.1 front end ----------
+
+def _parse_request(obj: Dict[str, Any]) -> ScoreRequest:
+    customer_id = int(obj["customer_id"])
+    raw_text = str(obj["raw_text"])
+    source_type = str(obj.get("source_type") or "OTHER").upper()
+    if customer_id <= 0 or not raw_text.strip() or source_type not in SOURCE_TYPES:
+        raise ValueError("customer_id, raw_text and a valid source_type are required")
+    text_id = obj.get("text_id")
+    return ScoreRequest(customer_id, raw_text, source_type, int(text_id) if text_id is not None else None)
+
+
+async def _read_http(reader: asyncio.StreamReader) -> Tuple[str, str, bytes]:
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.decode("latin-1").split("\r\n")
+    method, path, _ = lines[0].split(" ", 2)
+    length = 0
+    for line in lines[1:]:
+        if line.lower().startswith("content-length:"):
+            length = int(line.split(":", 1)[1].strip())
+    body = await reader.readexactly(length) if length else b""
+    return method, path, body
+
+
+def _http_response(status: int, payload: Any, content_type: str = "application/json") -> bytes:
+    reason = {200: "OK", 400: "Bad Request", 404: "Not Found", 500: "Internal Server Error", 503: "Service Unavailable"}
+    body = payload if isinstance(payload, bytes) else json.dumps(payload, default=str).encode()
+    head = (
+        f"HTTP/1.1 {status} {reason.get(status, '')}\r\n"
+        f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\nConnection: close\r\n\r\n"
+    )
+    return head.encode() + body
+
+
+def make_handler(batcher: MicroBatcher):
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            method, path, body = await _read_http(reader)
+            if method == "POST" and path == "/score":
+                obj = json.loads(body or b"{}")
+                items = obj if isinstance(obj, list) else [obj]
+                reqs = [_parse_request(o) for o in items]
+                results = await batcher.submit_many(reqs)
+                if isinstance(obj, list):
+                    # per-item status: failed items carry "error", the others were scored and committed
+                    resp = _http_response(200, [
+                        {"customer_id": r.customer_id, "error": str(res)} if isinstance(res, Exception) else res
+                        for r, res in zip(reqs, results)
+                    ])
+                elif isinstance(results[0], Exception):
+                    raise results[0]
+                else:
+                    resp = _http_response(200, results[0])
+            elif method == "GET" and path == "/metrics":
+                resp = _http_response(
+                    200,
+                    {
+                        **batcher.metrics.snapshot(batcher.queue.qsize()),
+                        "prediction_cache": default_pred_cache.stats(),
+                        "stages": default_metrics.snapshot(),
+                    },
+                )
+            elif method == "GET" and path == "/metrics/prometheus":
+                resp = _http_response(
+                    200, default_metrics.to_prometheus({"job": "scoring_service"}).encode(), "text/plain; version=0.0.4"
+                )
+            elif method == "GET" and path == "/healthz":
+                resp = _http_response(200, {"ok": True, "model_id": batcher.model_id})
+            else:
+                resp = _http_response(404, {"error": "not found"})
+        except QueueFull:
+            resp = _http_response(503, {"error": "scoring queue full, retry later"})
+        except (ValueError, KeyError, json.JSONDecodeError) as e:
+            resp = _http_response(400, {"error": str(e)})
+        except (asyncio.IncompleteReadError, ConnectionError):
+            writer.close()
+            return
+        except Exception as e:
+            resp = _http_response(500, {"error": str(e)})
+        writer.write(resp)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    return handle
+
+
+async def serve(args):
+    db = MySQL(DBConfig.from_env())
+    model_id, artifact_path, model = load_active_model(db, args.model_name, args.artifact_override)
+    db.commit()
+    batcher = MicroBatcher(db, model_id, artifact_path, model, args.max_batch, args.max_wait_ms, args.max_queue)
+    worker = asyncio.create_task(batcher.run())
+
+    handler = make_handler(batcher)
+    if args.unix_socket:
+        server = await asyncio.start_unix_server(handler, path=args.unix_socket)
+        where = f"unix:{args.unix_socket}"
+    else:
+        server = await asyncio.start_server(handler, host=args.host, port=args.port)
+        where = f"http://{args.host}:{args.port}"
+    print(f"✅ Scoring service on {where} model_id={model_id} max_batch={args.max_batch} max_wait_ms={args.max_wait_ms}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        worker.cancel()
+        db.close()
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--unix_socket", default="", help="Serve on a Unix socket path instead of TCP")
+    ap.add_argument("--model_name", default="risk_classifier")
+    ap.add_argument("--artifact_override", default="")
+    ap.add_argument("--max_batch", type=int, default=256, help="Flush a micro-batch at this many requests")
+    ap.add_argument("--max_wait_ms", type=float, default=5.0, help="Flush a micro-batch after this many ms")
+    ap.add_argument("--max_queue", type=int, default=10000, help="Pending requests before new ones get 503")
+    args = ap.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+# ml/top_risk.py
+# Top-N high-risk customers: index-ordered keyset pages over customer_risk_score_latest,
+# plus an optional in-process top-K cache that write-back keeps current.
+from __future__ import annotations
+
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from db import MySQL
+
+Cursor = Tuple[float, int]  # (risk_score, customer_id) of the last row of the previous page
+
+
+def fetch_top_page(
+    db: MySQL,
+    limit: int,
+    after: Optional[Cursor] = None,
+    risk_label: Optional[str] = None,
+    product_type: Optional[str] = None,
+    since_days: int = 730,
+) -> List[Dict[str, Any]]:
+    """
+    One page in (risk_score DESC, customer_id ASC) order. The order is read straight off
+    ix_crsl_score_customer / ix_crsl_label_score_customer, so LIMIT stops the index walk early
+    instead of sorting every matching customer; `after` continues from the previous page.
+    """
+    where = ["crs.scored_at >= DATE_SUB(CURDATE(), INTERVAL %s DAY)"]
+    params: List[Any] = [int(since_days)]
+    if risk_label:
+        where.append("crs.risk_label = %s")
+        params.append(risk_label.upper())
+    if after is not None:
+        where.append("(crs.risk_score < %s OR (crs.risk_score = %s AND crs.customer_id > %s))")
+        params += [after[0], after[0], int(after[1])]
+    if product_type:
+        where.append(
+            "EXISTS (SELECT 1 FROM policy p WHERE p.customer_id = crs.customer_id AND p.product_type = %s)"
+        )
+        params.append(product_type.upper())
+    params.append(int(limit))
+    return db.fetchall_dict(
+        f"""
+        SELECT c.customer_id, c.full_name, crs.risk_label, crs.risk_score, crs.scored_at
+        FROM customer_risk_score_latest crs
+        JOIN customer c ON c.customer_id = crs.customer_id
+        WHERE {' AND '.join(where)}
+        ORDER BY crs.risk_score DESC, crs.customer_id ASC
+        LIMIT %s
+        """,
+        tuple(params),
+    )
+
+
+def next_cursor(rows: List[Dict[str, Any]]) -> Optional[Cursor]:
+    return (float(rows[-1]["risk_score"]), int(rows[-1]["customer_id"])) if rows else None
+
+
+class TopKCache:
+    """
+    Exact top-K per label filter (None = all labels), held in memory.
+    Invariant per filter: every customer not in `entries` has risk_score <= `floor`. Entries above the
+    floor are updated in place by write-back; a member whose score drops to or below the floor leaves,
+    and once fewer than k members remain the filter is reloaded from the index on the next read.
+    ttl_s bounds staleness from write-backs running in other processes.
+    """
+
+    def __init__(self, k: int = 100, slack: int = 100, ttl_s: float = 30.0, since_days: int = 730):
+        self.k = max(1, int(k))
+        self.capacity = self.k + max(0, int(slack))
+        self.ttl_s = float(ttl_s)
+        self.since_days = int(since_days)
+        self._lock = threading.Lock()
+        # filter -> {"entries": {cid: row}, "floor": float, "loaded_at": float}
+        self._views: Dict[Optional[str], Dict[str, Any]] = {}
+        self._names: Dict[int, str] = {}
+        self.hits = 0
+        self.reloads = 0
+
+    def _load(self, db: MySQL, label: Optional[str]) -> Dict[str, Any]:
+        rows = fetch_top_page(db, self.capacity, risk_label=label, since_days=self.since_days)
+        self.reloads += 1
+        entries = {int(r["customer_id"]): r for r in rows}
+        for r in rows:
+            self._names[int(r["customer_id"])] = r["full_name"]
+        # fewer rows than capacity: every qualifying customer is cached, nothing hides below the floor
+        floor = float(rows[-1]["risk_score"]) if len(rows) >= self.capacity else float("-inf")
+        return {"entries": entries, "floor": floor, "loaded_at": time.monotonic()}
+
+    def _serve(self, view: Dict[str, Any], n: int) -> Optional[List[Dict[str, Any]]]:
+        # rows strictly above the floor are exact (ties at the floor may have unseen peers)
+        rows = sorted(view["entries"].values(), key=lambda r: (-float(r["risk_score"]), int(r["customer_id"])))
+        if view["floor"] != float("-inf"):
+            rows = [r for r in rows if float(r["risk_score"]) > view["floor"]]
+            if len(rows) < n:
+                return None
+        return [dict(r) for r in rows[:n]]
+
+    def top(self, db: MySQL, n: int, risk_label: Optional[str] = None) -> List[Dict[str, Any]]:
+        label = risk_label.upper() if risk_label else None
+        if n > self.k:
+            return fetch_top_page(db, n, risk_label=label, since_days=self.since_days)
+        rows = None
+        with self._lock:
+            view = self._views.get(label)
+            if view is not None and time.monotonic() - view["loaded_at"] < self.ttl_s:
+                rows = self._serve(view, n)
+        if rows is not None:
+            self.hits += 1
+        else:
+            view = self._load(db, label)
+            with self._lock:
+                self._views[label] = view
+                rows = self._serve(view, n) or []
+        self.fill_names(db, rows)
+        return rows
+
+    def apply(self, updates: Iterable[Tuple[int, str, float, Any]]):
+        """Fold committed latest-score changes (customer_id, label, score, scored_at) into every view."""
+        with self._lock:
+            for cid, label, score, scored_at in updates:
+                for key, view in self._views.items():
+                    entries = view["entries"]
+                    matches = key is None or key == label
+                    if matches and score > view["floor"]:
+                        entries[cid] = {
+                            "customer_id": cid,
+                            "full_name": self._names.get(cid),
+                            "risk_label": label,
+                            "risk_score": score,
+                            "scored_at": scored_at,
+                        }
+                    else:
+                        entries.pop(cid, None)
+                    if len(entries) > self.capacity:
+                        # drop the lowest; the floor rises to it, keeping the invariant
+                        low = min(entries.values(), key=lambda r: (float(r["risk_score"]), -int(r["customer_id"])))
+                        del entries[int(low["customer_id"])]
+                        view["floor"] = max(view["floor"], float(low["risk_score"]))
+                    if len(entries) < self.k and view["floor"] != float("-inf"):
+                        view["loaded_at"] = float("-inf")  # too few exact members left: reload on next read
+
+    def fill_names(self, db: MySQL, rows: List[Dict[str, Any]]):
+        # customers that entered via write-back have no cached name yet: one PK lookup for all of them
+        missing = sorted({int(r["customer_id"]) for r in rows if r.get("full_name") is None})
+        if missing:
+            found = db.fetchall(
+                f"SELECT customer_id, full_name FROM customer WHERE customer_id IN ({','.join(['%s'] * len(missing))})",
+                tuple(missing),
+            )
+            with self._lock:
+                for cid, name in found:
+                    self._names[int(cid)] = name
+        for r in rows:
+            if r.get("full_name") is None:
+                r["full_name"] = self._names.get(int(r["customer_id"]))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "views": {str(k): len(v["entries"]) for k, v in self._views.items()},
+            "hits": self.hits,
+            "reloads": self.reloads,
+        }
+
+
+def register_writeback(db: MySQL, rows: List[Tuple[Any, ...]]):
+    """
+    write_back hook: staged rows are (seq, customer_id, text_id, label, score, ...); the last row per
+    customer is their new latest score. Applied to the cache only after the transaction commits.
+    """
+    if default_topk is None or not rows:
+        return
+    latest: Dict[int, Tuple[int, str, float, Any]] = {}
+    now = datetime.now()
+    for r in rows:
+        latest[int(r[1])] = (int(r[1]), str(r[3]), round(float(r[4]), 6), now)
+    updates = list(latest.values())
+    db.after_commit(lambda: default_topk.apply(updates))
+
+
+def _env_topk() -> Optional[TopKCache]:
+    if os.getenv("TOPK_CACHE", "0").strip().lower() in ("0", "false", "no", "off", ""):
+        return None
+    return TopKCache(
+        k=int(os.getenv("TOPK_SIZE", "100")),
+        slack=int(os.getenv("TOPK_SLACK", "100")),
+        ttl_s=float(os.getenv("TOPK_TTL_S", "30")),
+    )
+
+
+default_topk = _env_topk()
@@ -0,0 +1,149 @@
+# ml/trigger_signals.py
+# Cheap retrain-trigger signals from incrementally maintained counters (no scans of unstructured_text).
+from __future__ import annotations
+
+import math
+import os
+from typing import Any, Dict, List, Optional, Sequence
+
+from db import MySQL
+
+INGESTED_TOTAL = "texts_ingested_total"
+INGESTED_AT_LAST_TRAIN = "texts_ingested_at_last_train"
+SCORE_BUCKETS = 10
+LABEL_ORDER = ("LOW", "MEDIUM", "HIGH")
+COUNTER_SLOTS = max(1, int(os.getenv("COUNTER_SLOTS", "16")))
+
+
+def bump_counter(db: MySQL, name: str, delta: int):
+    # caller's transaction: the counter moves atomically with the rows it counts. Each connection adds
+    # to its own slot row (readers SUM), so concurrent ingests don't queue on one locked row until commit.
+    if not delta:
+        return
+    db.execute(
+        """
+        INSERT INTO pipeline_counter (counter_name, slot, counter_value)
+        VALUES (%s, MOD(CONNECTION_ID(), %s), %s)
+        ON DUPLICATE KEY UPDATE counter_value = counter_value + VALUES(counter_value)
+        """,
+        (name, COUNTER_SLOTS, int(delta)),
+    )
+
+
+def mark_trained(db: MySQL):
+    # snapshot the ingest total so "ingested since last training" is one subtraction
+    db.execute(
+        """
+        INSERT INTO pipeline_counter (counter_name, slot, counter_value)
+        SELECT %s, 0, COALESCE(SUM(counter_value), 0) FROM pipeline_counter WHERE counter_name = %s
+        ON DUPLICATE KEY UPDATE counter_value = VALUES(counter_value)
+        """,
+        (INGESTED_AT_LAST_TRAIN, INGESTED_TOTAL),
+    )
+
+
+def record_score_histogram(db: MySQL, model_id: int, stage_table: str):
+    # one grouped upsert per write-back batch: (model, day, label, score decile) -> count, into this
+    # connection's slot like bump_counter, so parallel workers don't wait on today's rows
+    db.execute(
+        f"""
+        INSERT INTO model_score_histogram (model_id, window_start, risk_label, score_bucket, slot, cnt)
+        SELECT %s, CURDATE(), s.risk_label, LEAST(FLOOR(s.risk_score * {SCORE_BUCKETS}), {SCORE_BUCKETS - 1}),
+               MOD(CONNECTION_ID(), %s), COUNT(*)
+        FROM {stage_table} s
+        GROUP BY s.risk_label, LEAST(FLOOR(s.risk_score * {SCORE_BUCKETS}), {SCORE_BUCKETS - 1})
+        ORDER BY s.risk_label, LEAST(FLOOR(s.risk_score * {SCORE_BUCKETS}), {SCORE_BUCKETS - 1})
+        ON DUPLICATE KEY UPDATE cnt = cnt + VALUES(cnt)
+        """,
+        (int(model_id), COUNTER_SLOTS),
+    )
+
+
+def ingested_since_last_train(db: MySQL) -> int:
+    rows = db.fetchall(
+        "SELECT counter_name, SUM(counter_value) FROM pipeline_counter WHERE counter_name IN (%s, %s) GROUP BY counter_name",
+        (INGESTED_TOTAL, INGESTED_AT_LAST_TRAIN),
+    )
+    vals = {name: int(v) for name, v in rows}
+    return max(0, vals.get(INGESTED_TOTAL, 0) - vals.get(INGESTED_AT_LAST_TRAIN, 0))
+
+
+def psi(expected: Sequence[float], actual: Sequence[float], eps: float = 1e-4) -> float:
+    """Population stability index between two count vectors over the same bins."""
+    te, ta = float(sum(expected)), float(sum(actual))
+    if te <= 0 or ta <= 0:
+        return 0.0
+    total = 0.0
+    for e, a in zip(expected, actual):
+        pe = max(e / te, eps)
+        pa = max(a / ta, eps)
+        total += (pa - pe) * math.log(pa / pe)
+    return total
+
+
+def drift_signals(db: MySQL, model_id: int, window_days: int = 1) -> Dict[str, Any]:
+    """
+    Compare the model's first scoring window (reference) with its most recent window_days.
+    Reads at most 2 x labels x buckets x slots aggregated rows from the (model_id, window_start, ...) primary key.
+    """
+    ref_rows = db.fetchall(
+        """
+        SELECT risk_label, score_bucket, SUM(cnt)
+        FROM model_score_histogram
+        WHERE model_id = %s
+          AND window_start = (SELECT MIN(window_start) FROM model_score_histogram WHERE model_id = %s)
+        GROUP BY risk_label, score_bucket
+        """,
+        (int(model_id), int(model_id)),
+    )
+    cur_rows = db.fetchall(
+        """
+        SELECT risk_label, score_bucket, SUM(cnt)
+        FROM model_score_histogram
+        WHERE model_id = %s AND window_start >= DATE_SUB(CURDATE(), INTERVAL %s DAY)
+        GROUP BY risk_label, score_bucket
+        """,
+        (int(model_id), max(0, int(window_days) - 1)),
+    )
+
+    def vectors(rows: List[tuple]):
+        scores = [0.0] * SCORE_BUCKETS
+        labels = {lab: 0.0 for lab in LABEL_ORDER}
+        for label, bucket, cnt in rows:
+            scores[int(bucket)] += float(cnt)
+            labels[str(label)] = labels.get(str(label), 0.0) + float(cnt)
+        return scores, [labels[lab] for lab in LABEL_ORDER]
+
+    ref_scores, ref_labels = vectors(ref_rows)
+    cur_scores, cur_labels = vectors(cur_rows)
+    return {
+        "reference_n": int(sum(ref_scores)),
+        "current_n": int(sum(cur_scores)),
+        "score_psi": round(psi(ref_scores, cur_scores), 6),
+        "label_psi": round(psi(ref_labels, cur_labels), 6),
+        "current_label_dist": dict(zip(LABEL_ORDER, cur_labels)),
+    }
+
+
+def evaluate_trigger(
+    db: MySQL,
+    threshold_new_texts: int,
+    model_id: Optional[int],
+    psi_threshold: float = 0.2,
+    window_days: int = 1,
+    min_window_rows: int = 100,
+) -> Dict[str, Any]:
+    new_texts = ingested_since_last_train(db)
+    out: Dict[str, Any] = {"ingested_since_last_train": new_texts, "reasons": []}
+    if new_texts >= threshold_new_texts:
+        out["reasons"].append(f"ingested_since_last_train={new_texts} >= {threshold_new_texts}")
+    if model_id is not None and psi_threshold > 0:
+        drift = drift_signals(db, model_id, window_days)
+        out["drift"] = drift
+        # small windows make PSI noisy; only trust it with enough rows on both sides
+        if min(drift["reference_n"], drift["current_n"]) >= min_window_rows:
+            worst = max(drift["score_psi"], drift["label_psi"])
+            if worst >= psi_threshold:
+                out["reasons"].append(f"psi={worst:.4f} >= {psi_threshold}")
+    out["retrain"] = bool(out["reasons"])
+    return out
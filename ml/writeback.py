@@ -0,0 +1,164 @@
+# ml/writeback.py
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, List, Sequence
+
+from dashboard_cache import invalidate_staged
+from db import MySQL
+from metrics import default_metrics
+from premium_rules import suggest_premiums
+from risk_agg import add_new_latest, remove_old_latest
+from top_risk import register_writeback as update_topk
+from trigger_signals import record_score_histogram
+
+
+STAGE_TABLE = "tmp_risk_writeback"
+
+
+def _stage_batch(db: MySQL, rows: List[Sequence[Any]]):
+    # Session-scoped staging table; CREATE/DROP TEMPORARY do not commit the open transaction.
+    db.execute(f"DROP TEMPORARY TABLE IF EXISTS {STAGE_TABLE}")
+    db.execute(
+        f"""
+        CREATE TEMPORARY TABLE {STAGE_TABLE} (
+          seq INT PRIMARY KEY,
+          customer_id BIGINT NOT NULL,
+          text_id BIGINT NOT NULL,
+          risk_label ENUM('LOW','MEDIUM','HIGH'),
+          risk_score DECIMAL(10,6),
+          explanation VARCHAR(500),
+          risk_score_id BIGINT NULL,
+          KEY ix_stage_text (text_id)
+        ) ENGINE=InnoDB
+        """
+    )
+    # one multi-row INSERT for the whole batch
+    values = ",".join(["(%s, %s, %s, %s, %s, %s)"] * len(rows))
+    params: List[Any] = []
+    for r in rows:
+        params.extend(r)
+    db.execute(
+        f"""
+        INSERT INTO {STAGE_TABLE}
+          (seq, customer_id, text_id, risk_label, risk_score, explanation)
+        VALUES {values}
+        """,
+        tuple(params),
+    )
+
+
+def write_back(
+    db: MySQL,
+    model_id: int,
+    artifact_path: str,
+    texts: List[Dict[str, Any]],
+    labels: Sequence[Any],
+    scores: Sequence[float],
+) -> int:
+    """
+    Set-based write-back of one scored batch (caller commits).
+    Stages the batch once, then fills customer_risk_score, customer_risk_score_latest,
+    policy_premium_adjustment, risk aggregates, the processed flag, dashboard snapshots and the
+    drift histogram with INSERT ... SELECT statements,
+    so the number of round trips does not depend on the batch size.
+    """
+    if not texts:
+        return 0
+
+    explanation = f"artifact={Path(artifact_path).name}"
+    rows = []
+    for seq, (t, label, score) in enumerate(zip(texts, labels, scores)):
+        label = str(label).upper()
+        rows.append((
+            seq,
+            int(t["customer_id"]),
+            int(t["text_id"]),
+            label,
+            float(score),
+            explanation,
+        ))
+    with default_metrics.span("wb_stage"):
+        _stage_batch(db, rows)
+
+    # 1) history rows
+    with default_metrics.span("wb_history"):
+        db.execute(
+            f"""
+            INSERT INTO customer_risk_score
+              (customer_id, text_id, model_id, risk_label, risk_score, explanation)
+            SELECT s.customer_id, s.text_id, %s, s.risk_label, s.risk_score, s.explanation
+            FROM {STAGE_TABLE} s
+            ORDER BY s.seq
+            """,
+            (int(model_id),),
+        )
+
+    # 2) resolve generated risk_score_id per staged row (served by ix_crs_customer_text_model_scored)
+    with default_metrics.span("wb_resolve_ids"):
+        db.execute(
+            f"""
+            UPDATE {STAGE_TABLE} s
+            SET s.risk_score_id = (
+              SELECT MAX(crs.risk_score_id)
+              FROM customer_risk_score crs
+              WHERE crs.customer_id = s.customer_id AND crs.text_id = s.text_id AND crs.model_id = %s
+            )
+            """,
+            (int(model_id),),
+        )
+
+    # 3) maintain "latest" risk per customer; rows apply in batch order so the last text wins.
+    #    risk_label_latest_agg gets -1 for each replaced latest row here and +1 for its successor below,
+    #    both in this connection's slot.
+    with default_metrics.span("wb_latest"):
+        remove_old_latest(db, STAGE_TABLE)
+        db.execute(
+            f"""
+            INSERT INTO customer_risk_score_latest
+              (customer_id, risk_score_id, text_id, model_id, risk_label, risk_score, explanation, scored_at)
+            SELECT s.customer_id, s.risk_score_id, s.text_id, crs.model_id,
+                   s.risk_label, s.risk_score, s.explanation, crs.scored_at
+            FROM {STAGE_TABLE} s
+            JOIN customer_risk_score crs ON crs.risk_score_id = s.risk_score_id
+            ORDER BY s.seq
+            ON DUPLICATE KEY UPDATE
+              risk_score_id=VALUES(risk_score_id),
+              text_id=VALUES(text_id),
+              model_id=VALUES(model_id),
+              risk_label=VALUES(risk_label),
+              risk_score=VALUES(risk_score),
+              explanation=VALUES(explanation),
+              scored_at=VALUES(scored_at)
+            """
+        )
+        add_new_latest(db, STAGE_TABLE, model_id)
+        update_topk(db, rows)
+
+    # 4) premium adjustment suggestions: premium_adjustment_rule applied to every ACTIVE policy,
+    #    skipping policies whose open suggestion is unchanged
+    with default_metrics.span("wb_premium"):
+        suggest_premiums(db, STAGE_TABLE, model_id)
+
+    # 5) mark unprocessed texts as processed (safe in both infer and rescore modes)
+    with default_metrics.span("wb_processed"):
+        db.execute(
+            f"""
+            UPDATE unstructured_text ut
+            JOIN {STAGE_TABLE} s ON s.text_id = ut.text_id
+            SET ut.is_processed=1, ut.processed_at=NOW()
+            WHERE ut.is_processed=0
+            """
+        )
+
+    # 6) drop cached dashboards of the batch customers (same transaction as the new scores)
+    with default_metrics.span("wb_invalidate"):
+        invalidate_staged(db, STAGE_TABLE, (r[1] for r in rows))
+
+    # 7) per-model score/label histogram for the retrain trigger (drift signals)
+    with default_metrics.span("wb_histogram"):
+        record_score_histogram(db, model_id, STAGE_TABLE)
+
+    db.execute(f"DROP TEMPORARY TABLE IF EXISTS {STAGE_TABLE}")
+    default_metrics.inc("rows_written", len(rows))
+    return len(rows)